@@ -0,0 +1,575 @@
+"""
+Author: Marios Yiannakou
+
+Microbenchmarks for the physics primitives of 'Doggo Heaven'.
+
+Times `add_vectors`, `Sprite.apply_gravity`, `Tennis_Ball.bounce`,
+`Tennis_Ball.alive` and a full per-ball update, the way the game used to on plain
+`pygame.Rect` backed sprites (as well as the batched `Particle_System.step` for
+comparison) at increasing particle counts. The same per-ball update through the
+`Tennis_Ball` compatibility wrappers, which run `numpy` on a single particle at a
+time, is timed separately, as it is not what the game used to cost. A dummy SDL
+video driver is used, so no window is opened. The results are written as JSON so
+that runs can be compared across changes.
+
+Colliding the tennis balls with the player's pixels (`Particle_System.collide_rect`
+with the player's precomputed collision mask) is timed with every ball near the
+player.
+
+The renderers are timed drawing a whole frame of tennis balls, `pygame` blits
+against a single instanced OpenGL draw call (offscreen, e.g. on Mesa's llvmpipe).
+
+With `--parallel`, the multi-process `Parallel_Particle_System.step` is also timed
+at every given worker count, along with its speedup over `Particle_System.step`.
+
+Usage:
+    $ python doggo_heaven/benchmark.py --output bench.json
+    $ python doggo_heaven/benchmark.py --benchmarks Particle_System.step --parallel 1 2 4
+"""
+# Never open a window, and remove the pygame welcome message ...
+from os import environ
+
+environ["SDL_VIDEODRIVER"] = "dummy"
+environ["PYGAME_HIDE_SUPPORT_PROMPT"] = "1"
+
+import argparse
+import json
+import numpy as np
+import os
+import platform
+import pygame
+
+from libraries.Emitters import Point_Emitter
+from libraries.globals import *
+from libraries.Masks import Collision_Masks
+from libraries.Parallel import Parallel_Particle_System
+from libraries.Particles import Particle_System
+from libraries.Renderer import Renderer
+from libraries.Sprites import *
+from random import Random
+from time import perf_counter_ns, time_ns
+
+SIZES = (10 ** 2, 10 ** 3, 10 ** 4, 10 ** 5)
+
+
+def make_balls(image, count, seed=0):
+    """
+    Create tennis balls at random positions and velocities, sharing one store.
+
+    :param image: The tennis ball image.
+    :param count: The number of tennis balls to create.
+    :param seed: The seed of the random number generator.
+    :returns: A tuple of the `Particle_System` and the list of `Tennis_Ball`s.
+    """
+    rng = Random(seed)
+    particles = Particle_System(count, image.get_width(), image.get_height())
+    balls = [
+        Tennis_Ball(
+            image,
+            image.get_width(),
+            image.get_height(),
+            rng.randint(0, WINDOW_WIDTH),
+            rng.randint(0, WINDOW_HEIGHT - image.get_height()),
+            rng.uniform(-pi, pi),
+            rng.uniform(0, 10),
+            0.8,
+            rng.randint(0, 5),
+            particles,
+        )
+        for _ in range(count)
+    ]
+
+    return (particles, balls)
+
+
+class Rect_Ball(Sprite):
+    """
+    Represents a tennis ball as the game used to store it, on its own
+    `pygame.Rect`, with the per-ball bounce and lifetime logic it used to have.
+
+    :param image: The tennis ball image.
+    :param x_coord: The x-coordinate of the images top-left corner.
+    :param y_coord: The y-coordinate of the images top-left corner.
+    :param angle: The initial angle (in radians) of the tennis ball.
+    :param speed: The initial speed of the tennis ball.
+    :param elasticity: The elasticity of the tennis ball.
+    :param lifetime: The amount of time (in seconds) the ball remains in the game,
+        or 0 for ever.
+    """
+
+    def __init__(self, image, x_coord, y_coord, angle, speed, elasticity, lifetime):
+        super().__init__(
+            image,
+            image.get_width(),
+            image.get_height(),
+            x_coord,
+            y_coord,
+            angle,
+            speed,
+        )
+        self.elasticity = elasticity
+        self.lifetime = lifetime
+        self.born = time_ns()
+
+    def bounce(self):
+        """
+        Bounce the tennis ball off the screen edges.
+
+        :returns: The updated rectangle of the tennis ball.
+        """
+        if self.rect.x >= WINDOW_WIDTH:
+            self.rect.x = 2 * WINDOW_WIDTH - self.rect.x
+            self.angle = -self.angle
+            self.speed *= self.elasticity
+        elif self.rect.x <= 0:
+            self.rect.x -= 2 * self.rect.x
+            self.angle = -self.angle
+            self.speed *= self.elasticity
+
+        if self.rect.y >= (WINDOW_HEIGHT - self.height):
+            self.rect.y = 2 * WINDOW_HEIGHT - (self.rect.y + self.height)
+            self.angle = pi - self.angle
+            self.speed *= self.elasticity
+        elif self.rect.y <= 0:
+            self.rect.y -= 2 * self.rect.y
+            self.angle = pi - self.angle
+            self.speed *= self.elasticity
+
+        return self.rect
+
+    def alive(self):
+        """
+        :returns: True if the tennis ball has an infinite lifetime, or its lifetime
+            has not run out yet. False otherwise.
+        """
+        if self.lifetime == 0:
+            return True
+
+        return time_ns() - self.born < (self.lifetime * 1000 * 1000 * 1000)
+
+
+def make_rect_balls(image, count, seed=0):
+    """
+    Create `Rect_Ball`s at the same positions and velocities as `make_balls`.
+
+    :param image: The tennis ball image.
+    :param count: The number of tennis balls to create.
+    :param seed: The seed of the random number generator.
+    :returns: The list of `Rect_Ball`s.
+    """
+    rng = Random(seed)
+    return [
+        Rect_Ball(
+            image,
+            rng.randint(0, WINDOW_WIDTH),
+            rng.randint(0, WINDOW_HEIGHT - image.get_height()),
+            rng.uniform(-pi, pi),
+            rng.uniform(0, 10),
+            0.8,
+            rng.randint(0, 5),
+        )
+        for _ in range(count)
+    ]
+
+
+def make_sprites(image, count, seed=0):
+    """
+    Create plain (`pygame.Rect` backed) sprites at random positions and velocities.
+
+    :param image: The sprite image.
+    :param count: The number of sprites to create.
+    :param seed: The seed of the random number generator.
+    :returns: The list of `Sprite`s.
+    """
+    rng = Random(seed)
+    return [
+        Sprite(
+            image,
+            image.get_width(),
+            image.get_height(),
+            rng.randint(0, WINDOW_WIDTH),
+            rng.randint(0, WINDOW_HEIGHT - image.get_height()),
+            rng.uniform(-pi, pi),
+            rng.uniform(0, 10),
+        )
+        for _ in range(count)
+    ]
+
+
+def bench_add_vectors(image, count):
+    """Add gravity to `count` random vectors with `add_vectors`."""
+    rng = Random(0)
+    vectors = [
+        (rng.uniform(-pi, pi), rng.uniform(0, 10), GRAVITY_ANGLE, GRAVITY_MAGN)
+        for _ in range(count)
+    ]
+
+    def run():
+        for vector in vectors:
+            add_vectors(*vector)
+
+    return run
+
+
+def bench_apply_gravity(image, count):
+    """Call `Sprite.apply_gravity` on `count` sprites."""
+    sprites = make_sprites(image, count)
+
+    def run():
+        for sprite in sprites:
+            sprite.apply_gravity(GRAVITY_MAGN)
+
+    return run
+
+
+def bench_bounce(image, count):
+    """
+    Call `Tennis_Ball.bounce` (a compatibility wrapper over the particle store) on
+    `count` tennis balls.
+    """
+    (_, balls) = make_balls(image, count)
+
+    def run():
+        for ball in balls:
+            ball.bounce()
+
+    return run
+
+
+def bench_alive(image, count):
+    """Call `Tennis_Ball.alive` on `count` tennis balls."""
+    (_, balls) = make_balls(image, count)
+
+    def run():
+        for ball in balls:
+            ball.alive()
+
+    return run
+
+
+def bench_ball_update(image, count):
+    """
+    Update `count` tennis balls one at a time, as the game used to, on plain
+    `pygame.Rect` backed sprites.
+    """
+    balls = make_rect_balls(image, count)
+
+    def run():
+        for ball in balls:
+            if ball.alive():
+                ball.rect = ball.apply_gravity(GRAVITY_MAGN)
+                ball.rect = ball.bounce()
+
+    return run
+
+
+def bench_wrapper_update(image, count):
+    """
+    Update `count` tennis balls one at a time through the `Tennis_Ball`
+    compatibility wrappers, each running `numpy` on a single particle.
+    """
+    (_, balls) = make_balls(image, count)
+
+    def run():
+        for ball in balls:
+            if ball.alive():
+                ball.apply_gravity(GRAVITY_MAGN)
+                ball.bounce()
+
+    return run
+
+
+def bench_particle_step(image, count):
+    """Update `count` tennis balls with a single `Particle_System.step`."""
+    (particles, _) = make_balls(image, count)
+
+    def run():
+        particles.step(GRAVITY_MAGN)
+
+    return run
+
+
+def bench_ball_spawn(image, count):
+    """Spawn `count` tennis balls one constructor call at a time."""
+    particles = Particle_System(count, image.get_width(), image.get_height())
+    rng = Random(0)
+
+    def run():
+        particles.clear()
+        for _ in range(count):
+            Tennis_Ball(
+                image,
+                image.get_width(),
+                image.get_height(),
+                WINDOW_WIDTH / 2,
+                WINDOW_HEIGHT / 2,
+                rng.uniform(0, 2 * pi),
+                rng.uniform(2, 8),
+                0.8,
+                rng.randint(1, 3),
+                particles,
+            )
+
+    return run
+
+
+def bench_emitter_burst(image, count):
+    """Spawn `count` tennis balls in a single burst of a `Point_Emitter`."""
+    particles = Particle_System(count, image.get_width(), image.get_height())
+    emitter = Point_Emitter(
+        WINDOW_WIDTH / 2,
+        WINDOW_HEIGHT / 2,
+        speed=(2, 8),
+        angle=(0, 2 * pi),
+        lifetime=(1, 3),
+    )
+    rng = Random(0)
+
+    def run():
+        particles.clear()
+        emitter.emit(particles, count, rng, born=0)
+
+    return run
+
+
+def bench_collide_player(image, count):
+    """
+    Collide `count` tennis balls, around the player, with the player's pixels.
+    """
+    (particles, _) = make_balls(image, count)
+    player = pygame.image.load("assets/images/models/dog/dog_left.png").convert_alpha()
+    masks = Collision_Masks(image, [player])
+    rect = player.get_rect(center=(WINDOW_WIDTH / 2, WINDOW_HEIGHT / 2))
+    # Put the balls where the rectangle pre-test lets them through
+    rng = np.random.default_rng(0)
+    particles.x[:count] = rng.uniform(rect.left - image.get_width(), rect.right, count)
+    particles.y[:count] = rng.uniform(rect.top - image.get_height(), rect.bottom, count)
+
+    def run():
+        particles.collide_rect(rect, 0, 0, masks.get(player))
+
+    return run
+
+
+def bench_draw(image, count):
+    """Draw a frame of `count` tennis balls with `pygame` blits."""
+    (particles, _) = make_balls(image, count)
+    renderer = Renderer(pygame.Surface(SCREEN), pygame.Surface(SCREEN))
+
+    def run():
+        renderer.begin()
+        renderer.draw_particles(image, particles)
+        renderer.end()
+
+    return run
+
+
+def bench_gl_draw(image, count):
+    """Draw a frame of `count` tennis balls with an instanced OpenGL draw call."""
+    # Only loaded for this benchmark (see `main.Doggo_Heaven.main`)
+    from libraries.GL_Renderer import GL_Renderer
+
+    (particles, _) = make_balls(image, count)
+    renderer = GL_Renderer(SCREEN, pygame.Surface(SCREEN), offscreen=True)
+
+    def run():
+        renderer.begin()
+        renderer.draw_particles(image, particles)
+        renderer.end()
+
+    return run
+
+
+# Every benchmark takes the tennis ball image and a particle count, does its setup,
+# and returns a callable that runs one timed iteration.
+BENCHMARKS = {
+    "add_vectors": bench_add_vectors,
+    "Sprite.apply_gravity": bench_apply_gravity,
+    "Tennis_Ball.bounce": bench_bounce,
+    "Tennis_Ball.alive": bench_alive,
+    "ball_update": bench_ball_update,
+    "Tennis_Ball wrappers": bench_wrapper_update,
+    "Particle_System.step": bench_particle_step,
+    "Tennis_Ball.__init__": bench_ball_spawn,
+    "Point_Emitter.emit": bench_emitter_burst,
+    "Particle_System.collide_rect": bench_collide_player,
+    "Renderer.draw_particles": bench_draw,
+    "GL_Renderer.draw_particles": bench_gl_draw,
+}
+
+
+def time_benchmark(run, repeat):
+    """
+    Time a benchmark.
+
+    :param run: A callable running one iteration of the benchmark.
+    :param repeat: The number of times to run it.
+    :returns: A list of the time (in ns) each run took.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = perf_counter_ns()
+        run()
+        timings.append(perf_counter_ns() - start)
+
+    return timings
+
+
+def run_parallel(sizes, workers, repeat, seed=0):
+    """
+    Time `Parallel_Particle_System.step` against `Particle_System.step`.
+
+    :param sizes: The particle counts to run at.
+    :param workers: The worker counts to run at.
+    :param repeat: The number of timed runs per particle and worker count.
+    :param seed: The seed of the random number generator.
+    :returns: A list of JSON serialisable results.
+    """
+    results = []
+    for count in sizes:
+        rng = np.random.default_rng(seed)
+        state = (
+            rng.uniform(0, WINDOW_WIDTH, count),
+            rng.uniform(0, WINDOW_HEIGHT - BALL_HEIGHT, count),
+            rng.uniform(-pi, pi, count),
+            rng.uniform(0, 10, count),
+        )
+
+        particles = Particle_System(count)
+        for ball in zip(*state):
+            particles.add(*ball)
+        particles.step(GRAVITY_MAGN)
+        baseline = min(time_benchmark(lambda: particles.step(GRAVITY_MAGN), repeat))
+
+        for worker_count in workers:
+            with Parallel_Particle_System(count, workers=worker_count) as parallel:
+                for ball in zip(*state):
+                    parallel.add(*ball)
+                # Warm up (and start the worker processes)
+                parallel.step(GRAVITY_MAGN)
+                best = min(time_benchmark(lambda: parallel.step(GRAVITY_MAGN), repeat))
+                handovers = parallel.handovers
+
+            results.append(
+                {
+                    "name": "Parallel_Particle_System.step",
+                    "particles": count,
+                    "workers": worker_count,
+                    "repeat": repeat,
+                    "best_ns": best,
+                    "baseline_ns": baseline,
+                    "speedup": baseline / best,
+                    "handovers": handovers,
+                }
+            )
+            print(
+                f"{'Parallel_Particle_System.step':<30} {count:>7} particles, "
+                f"{worker_count} workers: {best / 1000 / 1000:10.3f} ms "
+                f"({baseline / best:.2f}x)"
+            )
+
+    return results
+
+
+def run_benchmarks(names, sizes, repeat, workers=()):
+    """
+    Run the requested benchmarks at every particle count.
+
+    :param names: The names (keys of `BENCHMARKS`) of the benchmarks to run.
+    :param sizes: The particle counts to run each benchmark at.
+    :param repeat: The number of timed runs per benchmark and particle count.
+    :param workers: The worker counts to time `Parallel_Particle_System.step` at.
+        Empty to skip it.
+    :returns: A JSON serialisable dictionary of the environment and results.
+    """
+    pygame.display.init()
+    pygame.display.set_mode((1, 1))
+    image = pygame.image.load(
+        "assets/images/models/tennis_ball/tennis_ball_25x25.png"
+    ).convert_alpha()
+
+    results = []
+    for name in names:
+        for count in sizes:
+            run = BENCHMARKS[name](image, count)
+            # Warm up
+            run()
+            timings = time_benchmark(run, repeat)
+            best = min(timings)
+            results.append(
+                {
+                    "name": name,
+                    "particles": count,
+                    "repeat": repeat,
+                    "best_ns": best,
+                    "mean_ns": sum(timings) // repeat,
+                    "best_ns_per_particle": best / count,
+                }
+            )
+            print(f"{name:<22} {count:>7} particles: {best / 1000 / 1000:10.3f} ms")
+
+    pygame.display.quit()
+
+    if workers:
+        results.extend(run_parallel(sizes, workers, repeat))
+
+    report = {
+        "python": platform.python_version(),
+        "pygame": pygame.version.ver,
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "results": results,
+    }
+
+    return report
+
+
+def main(args=None):
+    """
+    Run the benchmarks and write the results as JSON.
+
+    :param args: The list of command line arguments. Defaults to `sys.argv`.
+    """
+    parser = argparse.ArgumentParser(
+        description="Benchmark the Doggo Heaven physics primitives."
+    )
+    parser.add_argument(
+        "--benchmarks",
+        nargs="+",
+        choices=list(BENCHMARKS),
+        default=list(BENCHMARKS),
+        help="The benchmarks to run.",
+    )
+    parser.add_argument(
+        "--sizes",
+        nargs="+",
+        type=int,
+        default=list(SIZES),
+        help="The particle counts to run each benchmark at.",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="Number of timed runs per benchmark."
+    )
+    parser.add_argument(
+        "--parallel",
+        nargs="+",
+        type=int,
+        default=[],
+        help="Worker counts to time the multi-process physics step at.",
+    )
+    parser.add_argument(
+        "--output", default=None, help="File to write the JSON results to."
+    )
+    args = parser.parse_args(args)
+
+    report = run_benchmarks(args.benchmarks, args.sizes, args.repeat, args.parallel)
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
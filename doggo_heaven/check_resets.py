@@ -0,0 +1,203 @@
+"""
+Author: Marios Yiannakou
+
+A regression check of resetting 'Doggo Heaven' through the game loop.
+
+A recording is written in which the player, over and over, holds down the '+' key
+and blows a burst of tennis balls for a frame, then holds down the 'r' key for the
+next one. It is replayed through `Doggo_Heaven.main`, with a dummy SDL video driver
+so that no window is opened, and the depth of the stack, the memory in use, and the
+number of tennis balls and of sprites are measured on every reset. The check fails
+(with a non-zero exit status) if any of them grows from one reset to the next.
+
+Usage:
+    $ python doggo_heaven/check_resets.py
+    $ python doggo_heaven/check_resets.py --resets 5000
+"""
+# Never open a window, and remove the pygame welcome message ...
+from os import environ
+
+environ["SDL_VIDEODRIVER"] = "dummy"
+environ["PYGAME_HIDE_SUPPORT_PROMPT"] = "1"
+
+import argparse
+import gc
+import inspect
+import json
+import numpy as np
+import os
+import pygame
+import sys
+import tempfile
+import tracemalloc
+
+from libraries.globals import *
+from libraries.Input import (
+    EVENT,
+    EVENT_TYPES,
+    FRAME,
+    HEADER,
+    KEY_INDICES,
+    MAGIC,
+    Input_Replay,
+)
+from main import Doggo_Heaven
+
+RESETS = 200
+# How much (in bytes) the memory in use may grow from the first resets (once the
+# caches are allocated) to the last one
+MEMORY_GROWTH = 16 * 1024
+# The time (in ms) of the frames spent adding tennis balls, and of the ones reset on
+SPAWN_FRAME_TIME = 100
+RESET_FRAME_TIME = round(1000 / PHYSICS_FPS)
+
+
+def write_recording(path, resets, seed=0):
+    """
+    Write an input recording (see `libraries.Input`) that adds tennis balls, and
+    then resets the game, `resets` times.
+
+    :param path: The path of the recording. Overwritten if it exists.
+    :param resets: The number of times to reset the game.
+    :param seed: The seed of the game's random number generator.
+    """
+    spawn = 1 << KEY_INDICES[pygame.K_EQUALS]
+    burst = EVENT.pack(EVENT_TYPES.index(pygame.KEYUP), KEY_INDICES[pygame.K_b])
+    reset = 1 << KEY_INDICES[pygame.K_r]
+    with open(path, "wb") as file:
+        file.write(MAGIC + HEADER.pack(seed))
+        for _ in range(resets):
+            file.write(FRAME.pack(SPAWN_FRAME_TIME, 0, spawn, 0, 1) + burst)
+            file.write(FRAME.pack(RESET_FRAME_TIME, 0, reset, 0, 0))
+
+
+def count_sprites():
+    """
+    :returns: The number of `pygame.sprite.Sprite` objects alive.
+    """
+    return sum(isinstance(obj, pygame.sprite.Sprite) for obj in gc.get_objects())
+
+
+def check_resets(resets=RESETS, growth=MEMORY_GROWTH):
+    """
+    Replay a recording that resets the game many times, adding tennis balls in
+    between, and check that neither the memory in use, the depth of the stack,
+    nor the number of tennis balls or sprites grows from one reset to the next.
+
+    :param resets: The number of times to reset the game.
+    :param growth: How much (in bytes) the memory in use may grow.
+    :returns: A JSON serialisable dictionary of the results, with "failures"
+        listing every check that failed (empty if they all passed).
+    """
+    (handle, path) = tempfile.mkstemp(suffix=".rec")
+    os.close(handle)
+    try:
+        write_recording(path, resets)
+        source = Input_Replay(path)
+    finally:
+        os.remove(path)
+
+    # Preallocated, so that recording the measurements does not use more memory
+    depths = np.zeros(resets, dtype=np.int64)
+    memory = np.zeros(resets, dtype=np.int64)
+    balls = np.zeros(resets, dtype=np.int64)
+    sprites = np.zeros(resets, dtype=np.int64)
+    count = [0]
+    game = Doggo_Heaven()
+    reset = game._reset
+
+    def traced_reset():
+        depths[count[0]] = len(inspect.stack(0))
+        memory[count[0]] = tracemalloc.get_traced_memory()[0]
+        reset()
+        balls[count[0]] = len(game.world.particles)
+        sprites[count[0]] = count_sprites()
+        count[0] += 1
+
+    game._reset = traced_reset
+    pygame.init()
+    tracemalloc.start()
+    game.main(source)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    source.close()
+    pygame.quit()
+
+    failures = []
+    if count[0] != resets:
+        failures.append(f"the game was reset {count[0]} times, not {resets}")
+        resets = max(count[0], 1)
+    # The first few resets allocate the caches that later ones reuse
+    settled = min(10, resets - 1)
+    last = resets - 1
+    if memory[last] - memory[settled] > growth:
+        failures.append(
+            f"memory grew by {memory[last] - memory[settled]} bytes over {resets} "
+            f"resets (more than {growth})"
+        )
+    for name, values in (
+        ("stack depth", depths),
+        ("tennis balls", balls),
+        ("sprites", sprites),
+    ):
+        if values[last] != values[0]:
+            failures.append(
+                f"{name} went from {values[0]} to {values[last]} over {resets} resets"
+            )
+    print(
+        f"{resets} resets: memory {memory[settled]} -> {memory[last]} bytes, stack "
+        f"depth {depths[0]} -> {depths[last]}, tennis balls {balls[0]} -> "
+        f"{balls[last]}, sprites {sprites[0]} -> {sprites[last]}"
+    )
+
+    return {
+        "resets": resets,
+        "memory_settled_bytes": int(memory[settled]),
+        "memory_last_bytes": int(memory[last]),
+        "memory_peak_bytes": peak,
+        "stack_first": int(depths[0]),
+        "stack_last": int(depths[last]),
+        "balls_first": int(balls[0]),
+        "balls_last": int(balls[last]),
+        "sprites_first": int(sprites[0]),
+        "sprites_last": int(sprites[last]),
+        "failures": failures,
+    }
+
+
+def main(args=None):
+    """
+    Run the reset check, and print its results as JSON.
+
+    :param args: The list of command line arguments. Defaults to `sys.argv`.
+    :returns: The exit status, 1 if anything grew over the resets, 0 otherwise.
+    """
+    parser = argparse.ArgumentParser(
+        description="Check that resetting Doggo Heaven does not leak."
+    )
+    parser.add_argument(
+        "--resets",
+        type=int,
+        default=RESETS,
+        help="Number of times to reset the game.",
+    )
+    parser.add_argument(
+        "--growth",
+        type=int,
+        default=MEMORY_GROWTH,
+        help="How much (in bytes) the memory in use may grow over the resets.",
+    )
+    args = parser.parse_args(args)
+    if args.resets < 1:
+        parser.error("--resets must be at least 1")
+
+    result = check_resets(args.resets, args.growth)
+    print(json.dumps(result, indent=2))
+    for failure in result["failures"]:
+        print(f"Reset check failed: {failure}")
+
+    return 1 if result["failures"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,151 @@
+"""
+Author: Marios Yiannakou
+
+Runs the 'Doggo Heaven' tennis ball simulation without a window.
+
+No display is opened and nothing is rendered, so the physics (gravity, drag, wall
+bounces, ball-ball collisions and lifetimes) can be run as fast as possible, e.g. on
+a build or compute node, and timed on its own.
+
+Usage:
+    $ python doggo_heaven/headless.py --balls 10000 --steps 600 --seed 42
+"""
+import argparse
+import numpy as np
+
+from libraries.Broadphase import Spatial_Hash
+from libraries.globals import *
+from libraries.Parallel import Parallel_Particle_System
+from libraries.Particles import Particle_System
+from libraries.Timestep import Fixed_Timestep
+from time import perf_counter
+
+
+def parse_args(args=None):
+    """
+    Parse the command line arguments of the headless simulation.
+
+    :param args: The list of arguments to parse. Defaults to `sys.argv`.
+    :returns: The parsed arguments as an `argparse.Namespace`.
+    """
+    parser = argparse.ArgumentParser(
+        description="Run the Doggo Heaven simulation without a display."
+    )
+    parser.add_argument(
+        "--balls", type=int, default=NUM_OF_BALLS, help="Number of tennis balls."
+    )
+    parser.add_argument(
+        "--gravity", type=float, default=GRAVITY_MAGN, help="Gravity magnitude."
+    )
+    parser.add_argument(
+        "--elasticity", type=float, default=0.8, help="Tennis ball elasticity."
+    )
+    parser.add_argument(
+        "--lifetime",
+        type=int,
+        default=LIFETIME,
+        help="Tennis ball lifetime in seconds of simulated time. 0 for infinite.",
+    )
+    parser.add_argument(
+        "--steps", type=int, default=1000, help="Number of steps to simulate."
+    )
+    parser.add_argument(
+        "--seed", type=int, default=None, help="Seed of the random number generator."
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="Number of worker processes to step the physics with. 0 for none.",
+    )
+
+    return parser.parse_args(args)
+
+
+def spawn(particles, balls, gravity, elasticity, lifetime, seed=None):
+    """
+    Add tennis balls at random positions near the top of the window, the same way
+    the '+' key does in the game.
+
+    :param particles: The `Particle_System` to add the balls to.
+    :param balls: The number of balls to add.
+    :param gravity: The gravity magnitude, used as the initial speed of each ball.
+    :param elasticity: The elasticity of each ball.
+    :param lifetime: The lifetime (in seconds) of each ball.
+    :param seed: The seed of the random number generator.
+    """
+    rng = np.random.default_rng(seed)
+    x_coords = rng.integers(
+        particles.width, WINDOW_WIDTH - particles.width, balls, endpoint=True
+    )
+    y_coords = rng.integers(particles.height, 200, balls, endpoint=True)
+    particles.add_many(
+        x_coords, y_coords, *to_cartesian(pi, gravity), elasticity, lifetime, born=0
+    )
+
+
+def simulate(particles, steps, gravity, broadphase=None):
+    """
+    Step the simulation as fast as possible. Each step advances the simulated clock
+    by one physics step at `PHYSICS_FPS`, the same as the game's fixed timestep.
+
+    :param particles: The `Particle_System` to simulate.
+    :param steps: The number of steps to simulate.
+    :param gravity: The gravity magnitude.
+    :param broadphase: The `Spatial_Hash` used for ball-ball collisions.
+    :returns: A tuple of the total number of particle updates performed (of the
+        particles awake at each step), and of the updates skipped (of the ones
+        asleep).
+    """
+    if broadphase is None:
+        broadphase = Spatial_Hash(max(particles.width, particles.height))
+    step_ns = Fixed_Timestep().step_ns
+
+    (updates, skipped) = (0, 0)
+    for step in range(steps):
+        awake = particles.awake().shape[0]
+        updates += awake
+        skipped += len(particles) - awake
+        particles.step(gravity)
+        particles.expire((step + 1) * step_ns)
+        broadphase.rebuild(particles)
+        particles.collide(*broadphase.pairs())
+
+    return (updates, skipped)
+
+
+def main(args=None):
+    """
+    Run the headless simulation and report its throughput.
+
+    :param args: The list of command line arguments. Defaults to `sys.argv`.
+    """
+    args = parse_args(args)
+    if args.workers:
+        particles = Parallel_Particle_System(args.balls, workers=args.workers)
+    else:
+        particles = Particle_System(args.balls)
+    spawn(
+        particles, args.balls, args.gravity, args.elasticity, args.lifetime, args.seed
+    )
+
+    start = perf_counter()
+    try:
+        (updates, skipped) = simulate(particles, args.steps, args.gravity)
+        elapsed = max(perf_counter() - start, 1e-9)
+        (alive, asleep) = (len(particles), particles.sleeping())
+    finally:
+        if args.workers:
+            particles.close()
+
+    print(f"Balls: {args.balls} ({alive} alive, {asleep} asleep at the end)")
+    if args.workers:
+        print(f"Workers: {args.workers} ({particles.handovers} strip handovers)")
+    print(f"Steps: {args.steps} in {elapsed:.3f}s")
+    print(f"Steps per second: {args.steps / elapsed:.1f}")
+    print(f"Particle updates per second: {updates / elapsed:.1f}")
+    print(f"Particle updates skipped (asleep): {skipped}")
+
+
+if __name__ == "__main__":
+    main()
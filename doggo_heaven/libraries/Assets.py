@@ -0,0 +1,119 @@
+"""
+Author: Marios Yiannakou
+
+Loads the game's images once, and keeps them for the lifetime of the program.
+
+Every image is loaded and converted (to the pixel format of the window) the first
+time it is asked for, and both the decoded image and the converted surface are
+cached, so that resetting the game or switching backgrounds never loads the same
+file twice.
+
+Images can also be prefetched, in which case they are read from disk and decoded on
+a background thread, so that the frame asking for them later does not have to wait.
+Only the (cheap) conversion is left to the main thread, as it needs the display.
+"""
+import pygame
+
+from os import path
+from queue import Queue
+from threading import Event, Lock, Thread
+
+
+class Asset_Manager:
+    """
+    Represents a cache of converted image surfaces, keyed by file name.
+
+    :param root: The directory the images are loaded from.
+    """
+
+    def __init__(self, root="assets/images"):
+        self.root = root
+        # Converted surfaces, by (name, alpha)
+        self.surfaces = {}
+        # Decoded (but not converted) images, by name, and the events set once each
+        # image being prefetched is decoded
+        self.decoded = {}
+        self.pending = {}
+        self.lock = Lock()
+        self.queue = Queue()
+        self.thread = None
+
+    def __contains__(self, name):
+        return name in self.decoded
+
+    def path(self, name):
+        """
+        :param name: The name of an image, relative to the root directory.
+        :returns: The path to the image.
+        """
+        return path.join(self.root, name)
+
+    def prefetch(self, *names):
+        """
+        Load and decode images on a background thread, so that they are ready by the
+        time they are needed. Images already loaded, or being loaded, are skipped.
+
+        :param names: The names of the images, relative to the root directory.
+        """
+        with self.lock:
+            for name in names:
+                if name in self or name in self.pending:
+                    continue
+                self.pending[name] = Event()
+                self.queue.put(name)
+
+        if self.thread is None:
+            self.thread = Thread(target=self._prefetch, daemon=True)
+            self.thread.start()
+
+    def _prefetch(self):
+        """Decode every image put on the queue. Run by the prefetch thread."""
+        while True:
+            name = self.queue.get()
+            try:
+                surface = pygame.image.load(self.path(name))
+            except (pygame.error, OSError) as error:
+                # Raised again on the main thread, once the image is asked for
+                surface = error
+
+            with self.lock:
+                self.decoded[name] = surface
+                self.pending.pop(name).set()
+
+    def get(self, name, alpha=False):
+        """
+        Get an image, converted to the pixel format of the window. The image is only
+        loaded from disk if it is neither cached nor prefetched.
+
+        :param name: The name of the image, relative to the root directory.
+        :param alpha: True to keep the per-pixel transparency of the image.
+        :returns: The converted `pygame.Surface`.
+        """
+        surface = self.surfaces.get((name, alpha))
+        if surface is not None:
+            return surface
+
+        with self.lock:
+            event = self.pending.get(name)
+        if event is not None:
+            event.wait()
+
+        with self.lock:
+            image = self.decoded.get(name)
+        if image is None:
+            image = pygame.image.load(self.path(name))
+            with self.lock:
+                self.decoded[name] = image
+        elif isinstance(image, Exception):
+            raise image
+
+        surface = image.convert_alpha() if alpha else image.convert()
+        self.surfaces[(name, alpha)] = surface
+
+        return surface
+
+    def clear(self):
+        """Remove every cached image and surface."""
+        with self.lock:
+            self.surfaces.clear()
+            self.decoded.clear()
@@ -0,0 +1,166 @@
+"""
+Author: Marios Yiannakou
+
+A uniform grid (spatial hash) broadphase for particle-particle collisions.
+
+Every particle is hashed into a grid cell the size of a particle, so two particles
+can only overlap if they share a cell or sit in neighbouring cells. This keeps the
+cost of finding colliding pairs roughly linear in the number of particles, rather
+than testing every particle against every other particle.
+
+Particles asleep are hashed too, so that moving particles can still find (and wake)
+them, but pairs are only looked for around the particles that are awake. A settled
+pile costs nothing beyond being hashed.
+"""
+import numpy as np
+
+from libraries.globals import *
+
+# Neighbouring cells visited per cell (column, row offsets). Only half of the
+# neighbourhood is visited, so that every pair of cells is looked at exactly once.
+NEIGHBOURS = ((0, 0), (1, 0), (-1, 1), (0, 1), (1, 1))
+# Every neighbouring cell, visited when only some of the particles look for pairs
+ALL_NEIGHBOURS = tuple((column, row) for row in (-1, 0, 1) for column in (-1, 0, 1))
+
+
+class Spatial_Hash:
+    """
+    Represents a uniform grid spanning the game window.
+
+    Rebuild the grid once per frame with `rebuild`, and fetch the colliding pairs
+    with `pairs`.
+
+    :param cell_size: The width and height (in pixels) of a grid cell. This should
+        be at least as large as the largest particle.
+    :param width: The width (in pixels) of the area covered by the grid.
+    :param height: The height (in pixels) of the area covered by the grid.
+    """
+
+    def __init__(
+        self,
+        cell_size=max(BALL_WIDTH, BALL_HEIGHT),
+        width=WINDOW_WIDTH,
+        height=WINDOW_HEIGHT,
+    ):
+        self.cell_size = cell_size
+        self.columns = int(width // cell_size) + 1
+        self.rows = int(height // cell_size) + 1
+
+        # Particle indices sorted by cell, whether they are awake, and their cell
+        # coordinates
+        self.ids = np.empty(0, dtype=np.intp)
+        self.awake = np.empty(0, dtype=bool)
+        self.column = np.empty(0, dtype=np.intp)
+        self.row = np.empty(0, dtype=np.intp)
+        # Range of `ids` belonging to each cell
+        self.starts = np.zeros(self.columns * self.rows, dtype=np.intp)
+        self.ends = np.zeros(self.columns * self.rows, dtype=np.intp)
+
+        self.x = None
+        self.y = None
+        self.width = 0
+        self.height = 0
+
+    def rebuild(self, particles):
+        """
+        Hash every alive particle of a `Particle_System` into the grid.
+
+        :param particles: The `Particle_System` to hash.
+        """
+        ids = particles.indices()
+        if particles.sleeping() == ids.shape[0]:
+            # Nothing is awake, so there are no pairs to look for
+            ids = ids[:0]
+        self.x = particles.x
+        self.y = particles.y
+        self.width = particles.width
+        self.height = particles.height
+
+        column = (particles.x[ids] // self.cell_size).astype(np.intp)
+        row = (particles.y[ids] // self.cell_size).astype(np.intp)
+        np.clip(column, 0, self.columns - 1, out=column)
+        np.clip(row, 0, self.rows - 1, out=row)
+        keys = column + row * self.columns
+
+        order = np.argsort(keys, kind="stable")
+        keys = keys[order]
+        self.ids = ids[order]
+        self.awake = ~particles.asleep[self.ids]
+        self.column = column[order]
+        self.row = row[order]
+
+        cells = np.arange(self.columns * self.rows)
+        self.starts = np.searchsorted(keys, cells, side="left")
+        self.ends = np.searchsorted(keys, cells, side="right")
+
+    def candidate_pairs(self):
+        """
+        Find every pair of particles sharing a cell or sitting in neighbouring
+        cells, where at least one of the two is awake. Each pair is returned once.
+
+        :returns: A tuple of two index arrays, where the particles at the same
+            position in both arrays form a candidate pair.
+        """
+        positions = np.arange(self.ids.shape[0])
+        everyone = bool(self.awake.all())
+        if everyone:
+            neighbours = NEIGHBOURS
+        else:
+            # Particles awake look all around them, so that they find the ones
+            # asleep in any direction
+            positions = positions[self.awake]
+            neighbours = ALL_NEIGHBOURS
+
+        first = []
+        second = []
+        for column_offset, row_offset in neighbours:
+            column = self.column[positions] + column_offset
+            row = self.row[positions] + row_offset
+            valid = (
+                (column >= 0) & (column < self.columns) & (row >= 0) & (row < self.rows)
+            )
+            source = positions[valid]
+            cells = column[valid] + row[valid] * self.columns
+
+            if everyone and column_offset == 0 and row_offset == 0:
+                # Only pair with the particles after this one in the same cell
+                begin = source + 1
+            else:
+                begin = self.starts[cells]
+            counts = self.ends[cells] - begin
+            total = int(counts.sum())
+            if total == 0:
+                continue
+
+            # Expand every [begin, end) range into one entry per candidate
+            offsets = np.repeat(np.cumsum(counts) - counts, counts)
+            first.append(np.repeat(source, counts))
+            second.append(np.repeat(begin, counts) + np.arange(total) - offsets)
+
+        if not first:
+            empty = np.empty(0, dtype=np.intp)
+            return (empty, empty)
+
+        first = np.concatenate(first)
+        second = np.concatenate(second)
+        if not everyone:
+            # Pairs of two particles awake are found from both sides, so only
+            # keep one of them (which also drops pairing a particle with itself)
+            keep = ~self.awake[second] | (first < second)
+            (first, second) = (first[keep], second[keep])
+
+        return (self.ids[first], self.ids[second])
+
+    def pairs(self):
+        """
+        Find every pair of particles whose rectangles overlap.
+
+        :returns: A tuple of two index arrays, where the particles at the same
+            position in both arrays collide.
+        """
+        (first, second) = self.candidate_pairs()
+        overlap = (np.abs(self.x[first] - self.x[second]) < self.width) & (
+            np.abs(self.y[first] - self.y[second]) < self.height
+        )
+
+        return (first[overlap], second[overlap])
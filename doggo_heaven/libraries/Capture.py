@@ -0,0 +1,261 @@
+"""
+Author: Marios Yiannakou
+
+Captures the frames of the game to disk, encoded in the background.
+
+Every finished frame is copied once, straight from the window (or the OpenGL
+framebuffer), into a free slot of a fixed pool of preallocated frame buffers, and
+the slot is put on a queue. Worker threads take the slots off the queue, encode
+them to a numbered PNG file, or write them to a raw frame file, and hand them back.
+The game only waits when every slot is still queued or being encoded, or drops the
+frame instead if asked to.
+
+PNG files are compressed with `zlib`, which lets go of the GIL, so the workers run
+alongside the game.
+
+Raw frame format (little-endian):
+    - `RAW_MAGIC`, `RAW_HEADER` (width and height of the frames)
+    - Per frame: the frame number (uint64) and its RGB pixels, top row first (see
+      `raw_frame`)
+Every frame takes the same number of bytes, so a raw frame file is read back as a
+single memory-mapped array (see `Frame_File`).
+"""
+import numpy as np
+import os
+import queue
+import struct
+import threading
+import zlib
+
+from libraries.globals import *
+from time import perf_counter_ns
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# Fast rather than small, so that the workers keep up with the game
+PNG_COMPRESSION = 1
+
+RAW_MAGIC = b"DOGGOFRAMES1"
+RAW_HEADER = struct.Struct("<II")
+
+
+def raw_frame(width, height):
+    """
+    :param width: The width of the frames.
+    :param height: The height of the frames.
+    :returns: The `numpy.dtype` of a frame of a raw frame file.
+    """
+    return np.dtype([("frame", "<u8"), ("pixels", np.uint8, (height, width, 3))])
+
+
+def encode_png(pixels):
+    """
+    :param pixels: A (height, width, 3) array of RGB pixels, top row first.
+    :returns: The bytes of the pixels as an (unfiltered) PNG file.
+    """
+    (height, width, _) = pixels.shape
+    # Every row starts with its filter type, 0 for none
+    rows = np.zeros((height, width * 3 + 1), dtype=np.uint8)
+    rows[:, 1:] = pixels.reshape(height, width * 3)
+
+    def chunk(kind, data):
+        return (
+            struct.pack(">I", len(data))
+            + kind
+            + data
+            + struct.pack(">I", zlib.crc32(kind + data))
+        )
+
+    return (
+        PNG_SIGNATURE
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(rows.tobytes(), PNG_COMPRESSION))
+        + chunk(b"IEND", b"")
+    )
+
+
+class Frame_Capture:
+    """
+    Represents the capture of the frames of a game.
+
+    Call `capture` once per frame, before the frame is shown, and `close` at the end.
+
+    :param path: The directory the numbered PNG files are written to, or the path
+        of the raw frame file. Created, or overwritten, if needed.
+    :param size: The (width, height) of the frames.
+    :param raw: True to write a raw frame file, False to write PNG files.
+    :param slots: The number of frames that can be queued or being encoded at once.
+    :param workers: The number of threads encoding the frames.
+    :param drop: True to drop frames while every slot is in use, False to wait for
+        a free slot.
+    """
+
+    def __init__(
+        self,
+        path,
+        size=SCREEN,
+        raw=False,
+        slots=CAPTURE_SLOTS,
+        workers=CAPTURE_WORKERS,
+        drop=False,
+    ):
+        self.path = path
+        self.raw = raw
+        self.drop = drop
+        (width, height) = size
+        self.buffers = np.empty((slots, height, width, 3), dtype=np.uint8)
+        self.free = queue.Queue()
+        for slot in range(slots):
+            self.free.put(slot)
+        # (frame number, position in the raw file, slot, pixels) of queued frames
+        self.queue = queue.Queue(slots)
+
+        if raw:
+            self.frame_type = raw_frame(width, height)
+            self.file = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC)
+            os.write(self.file, RAW_MAGIC + RAW_HEADER.pack(width, height))
+        else:
+            os.makedirs(path, exist_ok=True)
+
+        # Frames shown, captured, dropped and written, and time (in ns) the game
+        # waited for a free slot
+        self.frames = 0
+        self.captured = 0
+        self.dropped = 0
+        self.written = 0
+        self.waited = 0
+        self.start = perf_counter_ns()
+        self.stop = None
+        self.lock = threading.Lock()
+        self.workers = [
+            threading.Thread(target=self._work, daemon=True) for _ in range(workers)
+        ]
+        for worker in self.workers:
+            worker.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def capture(self, renderer):
+        """
+        Copy the frame a renderer last finished into a free slot, and queue it.
+        Called before the frame is shown, as an OpenGL frame can only be read back
+        until then.
+
+        :param renderer: The `Renderer` or `GL_Renderer` that drew the frame.
+        :returns: True if the frame was captured, False if it was dropped.
+        """
+        frame = self.frames
+        self.frames += 1
+        try:
+            slot = self.free.get_nowait()
+        except queue.Empty:
+            if self.drop:
+                self.dropped += 1
+                return False
+            start = perf_counter_ns()
+            slot = self.free.get()
+            self.waited += perf_counter_ns() - start
+
+        pixels = renderer.read_pixels(self.buffers[slot])
+        self.queue.put((frame, self.captured, slot, pixels))
+        self.captured += 1
+
+        return True
+
+    def _work(self):
+        """Encode queued frames until told to stop (by a `None`)."""
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            (frame, position, slot, pixels) = item
+
+            if self.raw:
+                offset = len(RAW_MAGIC) + RAW_HEADER.size
+                offset += position * self.frame_type.itemsize
+                os.pwrite(self.file, struct.pack("<Q", frame), offset)
+                os.pwrite(self.file, np.ascontiguousarray(pixels), offset + 8)
+            else:
+                with open(
+                    os.path.join(self.path, f"frame_{frame:06d}.png"), "wb"
+                ) as file:
+                    file.write(encode_png(pixels))
+
+            with self.lock:
+                self.written += 1
+            self.free.put(slot)
+
+    def close(self):
+        """Wait for every queued frame to be written, and stop the workers."""
+        for _ in self.workers:
+            self.queue.put(None)
+        for worker in self.workers:
+            worker.join()
+        self.workers = []
+        self.stop = perf_counter_ns()
+        if self.raw and self.file is not None:
+            os.close(self.file)
+            self.file = None
+
+    def report(self):
+        """
+        :returns: A JSON serialisable dictionary of how many frames were captured
+            and dropped, how long the game waited for free slots, and how many
+            frames per second were written (up to `close`).
+        """
+        stop = perf_counter_ns() if self.stop is None else self.stop
+        seconds = (stop - self.start) / (1000 * 1000 * 1000)
+
+        return {
+            "frames": self.frames,
+            "captured": self.captured,
+            "dropped": self.dropped,
+            "written": self.written,
+            "waited_ms": self.waited / (1000 * 1000),
+            "seconds": seconds,
+            "written_fps": self.written / max(seconds, 1e-9),
+        }
+
+
+class Frame_File:
+    """
+    Represents a raw frame file being read, through a memory map.
+
+    :param path: The path of a raw frame file written by `Frame_Capture`.
+    """
+
+    def __init__(self, path):
+        data = np.memmap(path, dtype=np.uint8, mode="r")
+        if bytes(data[: len(RAW_MAGIC)]) != RAW_MAGIC:
+            raise ValueError(f"'{path}' is not a Doggo Heaven frame file")
+
+        offset = len(RAW_MAGIC)
+        (self.width, self.height) = RAW_HEADER.unpack_from(data, offset)
+        offset += RAW_HEADER.size
+        frame_type = raw_frame(self.width, self.height)
+        # A frame cut short (e.g. by a crash) is left out
+        count = (data.shape[0] - offset) // frame_type.itemsize
+        self.frames = np.ndarray(count, dtype=frame_type, buffer=data, offset=offset)
+
+    def __len__(self):
+        """
+        :returns: The number of frames.
+        """
+        return self.frames.shape[0]
+
+    def __getitem__(self, position):
+        """
+        :param position: The position of the frame (not its frame number).
+        :returns: A tuple of the frame number and a read-only (height, width, 3)
+            array of its RGB pixels.
+        """
+        frame = self.frames[position]
+
+        return (int(frame["frame"]), frame["pixels"])
+
+    def __iter__(self):
+        for position in range(len(self)):
+            yield self[position]
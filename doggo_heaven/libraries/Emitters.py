@@ -0,0 +1,183 @@
+"""
+Author: Marios Yiannakou
+
+Particle emitters, spawning batches of tennis balls straight into a
+`Particle_System`.
+
+An emitter decides where its particles appear (a point, a line or an area), how
+many it spawns per second, and the distributions their speed, direction and
+lifetime are drawn from. Every batch is drawn as whole arrays and added with a
+single `Particle_System.add_many`, so a burst of thousands of balls costs one
+vectorised allocation rather than a constructor call per ball.
+
+Random numbers are drawn from a `numpy` generator seeded from the game's seeded
+`random.Random`, so emitting stays deterministic for a given seed (see
+`libraries.Input`).
+"""
+import numpy as np
+
+from libraries.globals import *
+
+
+class Emitter:
+    """
+    Represents a source of particles. Subclasses decide where the particles appear,
+    by implementing `positions`.
+
+    Distributions are given as (low, high) tuples, and values are drawn uniformly
+    between the two. A single number stands for a fixed value.
+
+    :param rate: The number of particles spawned per second by `update`.
+    :param speed: The distribution of the initial speed (in pixels per step).
+    :param angle: The distribution of the initial direction (in radians). 0 being
+        up, math.pi down.
+    :param lifetime: The distribution of the lifetime (in seconds). Zero for
+        particles that do not expire.
+    :param elasticity: The elasticity of the particles.
+    """
+
+    def __init__(
+        self, rate=0, speed=GRAVITY_MAGN, angle=pi, lifetime=0, elasticity=0.8
+    ):
+        self.rate = rate
+        self.speed = speed
+        self.angle = angle
+        self.lifetime = lifetime
+        self.elasticity = elasticity
+        # Fraction of a particle owed by `update`, carried over between calls
+        self.owed = 0.0
+
+    @staticmethod
+    def draw(distribution, count, generator):
+        """
+        :param distribution: A (low, high) tuple, or a single value.
+        :param count: The number of values to draw.
+        :param generator: The `numpy.random.Generator` to draw with.
+        :returns: An array of `count` values, or the single value.
+        """
+        if isinstance(distribution, tuple):
+            return generator.uniform(*distribution, count)
+
+        return distribution
+
+    def positions(self, count, generator):
+        """
+        :param count: The number of positions to draw.
+        :param generator: The `numpy.random.Generator` to draw with.
+        :returns: A tuple of the x and y coordinate arrays of the particles top-left
+            corners.
+        """
+        raise NotImplementedError
+
+    def emit(self, particles, count, rng, born=None):
+        """
+        Spawn a batch of particles.
+
+        :param particles: The `Particle_System` to add the particles to.
+        :param count: The number of particles to spawn.
+        :param rng: The `random.Random` to seed the batch's random numbers from.
+        :param born: The time (in ns) the particles were created. Defaults to now.
+        :returns: An array of the indices of the new particles.
+        """
+        if count <= 0:
+            return np.empty(0, dtype=np.intp)
+
+        generator = np.random.default_rng(rng.getrandbits(64))
+        (x_coords, y_coords) = self.positions(count, generator)
+        angle = self.draw(self.angle, count, generator)
+        speed = self.draw(self.speed, count, generator)
+        lifetime = self.draw(self.lifetime, count, generator)
+
+        return particles.add_many(
+            x_coords,
+            y_coords,
+            np.sin(angle) * speed,
+            -np.cos(angle) * speed,
+            self.elasticity,
+            lifetime,
+            born,
+        )
+
+    def update(self, particles, elapsed_ms, rng, born=None, limit=None):
+        """
+        Spawn the particles due since the last update, at the emitter's rate.
+
+        :param particles: The `Particle_System` to add the particles to.
+        :param elapsed_ms: The time (in ms) since the last update.
+        :param rng: The `random.Random` to seed the batch's random numbers from.
+        :param born: The time (in ns) the particles were created. Defaults to now.
+        :param limit: The most particles to spawn. Any more that are due are
+            dropped, rather than spawned by a later update. `None` for no limit.
+        :returns: An array of the indices of the new particles.
+        """
+        self.owed += self.rate * elapsed_ms / 1000
+        due = int(self.owed)
+        self.owed -= due
+        count = due if limit is None else min(due, limit)
+
+        return self.emit(particles, count, rng, born)
+
+
+class Point_Emitter(Emitter):
+    """
+    Represents an emitter spawning every particle at the same point, e.g. for an
+    explosion.
+
+    :param x_coord: The x-coordinate of the particles top-left corners.
+    :param y_coord: The y-coordinate of the particles top-left corners.
+    """
+
+    def __init__(self, x_coord, y_coord, **kwargs):
+        super().__init__(**kwargs)
+        self.x_coord = x_coord
+        self.y_coord = y_coord
+
+    def positions(self, count, generator):
+        return (np.full(count, self.x_coord), np.full(count, self.y_coord))
+
+
+class Line_Emitter(Emitter):
+    """
+    Represents an emitter spawning particles at random points along a line segment.
+
+    :param start: The (x, y) coordinates of one end of the line.
+    :param end: The (x, y) coordinates of the other end of the line.
+    :param evenly: Whether to space the particles of a batch evenly along the line
+        instead, the first at `start` and the gap after the last one ending at
+        `end`.
+    """
+
+    def __init__(self, start, end, evenly=False, **kwargs):
+        super().__init__(**kwargs)
+        self.start = start
+        self.end = end
+        self.evenly = evenly
+
+    def positions(self, count, generator):
+        if self.evenly:
+            along = np.arange(count) / count
+        else:
+            along = generator.random(count)
+        x_coords = self.start[0] + (self.end[0] - self.start[0]) * along
+        y_coords = self.start[1] + (self.end[1] - self.start[1]) * along
+
+        return (x_coords, y_coords)
+
+
+class Area_Emitter(Emitter):
+    """
+    Represents an emitter spawning particles at random points within a rectangle.
+
+    :param rect: The (x, y, width, height) of the rectangle.
+    """
+
+    def __init__(self, rect, **kwargs):
+        super().__init__(**kwargs)
+        self.rect = rect
+
+    def positions(self, count, generator):
+        (x_coord, y_coord, width, height) = self.rect
+        x_coords = generator.uniform(x_coord, x_coord + width, count)
+        y_coords = generator.uniform(y_coord, y_coord + height, count)
+
+        return (x_coords, y_coords)
@@ -0,0 +1,374 @@
+"""
+Author: Marios Yiannakou
+
+Draws the game world with OpenGL, as an alternative to the `pygame` `Renderer`.
+
+Every tennis ball is drawn with a single instanced draw call. The positions of the
+alive balls are uploaded as one instance buffer per frame, and a vertex shader
+places a quad textured with the tennis ball image at each of them, so the cost on
+the CPU is one copy of the positions however many balls there are.
+
+Single images (the background and the player) are drawn as textured quads, each
+image being uploaded as a texture once. Everything else the game draws with
+`pygame` (the HUD, the hitboxes and the frame profiler) is drawn onto a transparent
+overlay surface, `window`, which is drawn on top of the frame. Only the areas of
+the overlay marked as drawn to on the last two frames are uploaded again.
+
+The renderer draws either:
+    - On screen, to a window opened by `pygame` with the `pygame.OPENGL` flag.
+    - Offscreen, with no window or display at all, to a framebuffer object of an
+      EGL context without a surface (e.g. on Mesa's llvmpipe software rasteriser).
+      The frame can be read back with `read_pixels`, as with the window.
+"""
+import numpy as np
+import pygame
+
+from ctypes import pointer
+from OpenGL import EGL, GL
+from OpenGL.GL import shaders
+from OpenGL.raw.GL.VERSION import GL_2_0
+from os import environ
+
+VERTEX_SHADER = """
+#version 330 core
+// Top-left corner of the quad, in pixels (per instance)
+layout(location = 0) in vec2 offset;
+uniform vec2 screen;
+uniform vec2 size;
+// The (x, y, width, height) of the area of the texture drawn, in texture units
+uniform vec4 source;
+out vec2 uv;
+
+void main() {
+    // The corners of a triangle strip: (0, 0), (1, 0), (0, 1), (1, 1)
+    vec2 corner = vec2(gl_VertexID & 1, gl_VertexID >> 1);
+    uv = source.xy + corner * source.zw;
+    vec2 position = floor(offset) + corner * size;
+    gl_Position = vec4(
+        position.x / screen.x * 2.0 - 1.0, 1.0 - position.y / screen.y * 2.0, 0.0, 1.0
+    );
+}
+"""
+
+FRAGMENT_SHADER = """
+#version 330 core
+in vec2 uv;
+uniform sampler2D image;
+out vec4 color;
+
+void main() {
+    color = texture(image, uv);
+}
+"""
+
+
+class Offscreen_Context:
+    """
+    Represents an OpenGL 3.3 core context with no window or display, created with
+    EGL (Mesa's surfaceless platform).
+    """
+
+    def __init__(self):
+        # Only read by Mesa when the display is first opened
+        environ.setdefault("EGL_PLATFORM", "surfaceless")
+        self.display = EGL.eglGetDisplay(EGL.EGL_DEFAULT_DISPLAY)
+        EGL.eglInitialize(self.display, None, None)
+        EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+
+        config = EGL.EGLConfig()
+        found = EGL.EGLint()
+        # The default surface type is a window, which there is none of
+        attributes = (EGL.EGLint * 5)(
+            EGL.EGL_SURFACE_TYPE,
+            EGL.EGL_PBUFFER_BIT,
+            EGL.EGL_RENDERABLE_TYPE,
+            EGL.EGL_OPENGL_BIT,
+            EGL.EGL_NONE,
+        )
+        EGL.eglChooseConfig(
+            self.display, attributes, pointer(config), 1, pointer(found)
+        )
+        if not found.value:
+            raise RuntimeError("No EGL config supports OpenGL")
+
+        attributes = (EGL.EGLint * 7)(
+            EGL.EGL_CONTEXT_MAJOR_VERSION,
+            3,
+            EGL.EGL_CONTEXT_MINOR_VERSION,
+            3,
+            EGL.EGL_CONTEXT_OPENGL_PROFILE_MASK,
+            EGL.EGL_CONTEXT_OPENGL_CORE_PROFILE_BIT,
+            EGL.EGL_NONE,
+        )
+        self.context = EGL.eglCreateContext(
+            self.display, config, EGL.EGL_NO_CONTEXT, attributes
+        )
+        self.make_current()
+
+    def make_current(self):
+        """Make the context the current one of the calling thread."""
+        EGL.eglMakeCurrent(
+            self.display, EGL.EGL_NO_SURFACE, EGL.EGL_NO_SURFACE, self.context
+        )
+
+    def close(self):
+        """Destroy the context."""
+        EGL.eglMakeCurrent(
+            self.display, EGL.EGL_NO_SURFACE, EGL.EGL_NO_SURFACE, EGL.EGL_NO_CONTEXT
+        )
+        EGL.eglDestroyContext(self.display, self.context)
+        EGL.eglTerminate(self.display)
+
+
+class GL_Renderer:
+    """
+    Represents a renderer drawing the game world with OpenGL. It is used the same
+    way as the `pygame` `Renderer`.
+
+    Call `begin` at the start of every frame, draw with `draw`, `draw_particles` and
+    `mark` (drawing with `pygame` to `window`), and call `end` to show the frame.
+
+    :param size: The (width, height) of the frame.
+    :param background: The background surface, drawn under everything else.
+    :param dirty: Kept for compatibility with `Renderer`. The whole frame is always
+        redrawn, as redrawing is cheap on the GPU.
+    :param offscreen: True to draw to an offscreen context, False to draw to the
+        `pygame.OPENGL` window.
+    """
+
+    def __init__(self, size, background, dirty=False, offscreen=False):
+        self.size = size
+        self.background = background
+        self.dirty = dirty
+        self.offscreen = offscreen
+        self.context = Offscreen_Context() if offscreen else None
+        # The overlay `pygame` draws to, and the areas drawn to on the previous and
+        # current frame
+        self.window = pygame.Surface(size, pygame.SRCALPHA)
+        self.previous_rects = []
+        self.rects = []
+        # The texture of every image drawn so far
+        self.textures = {}
+
+        GL.glViewport(0, 0, *size)
+        GL.glEnable(GL.GL_BLEND)
+        GL.glBlendFunc(GL.GL_SRC_ALPHA, GL.GL_ONE_MINUS_SRC_ALPHA)
+        # Core profiles cannot draw, or validate a program, without a vertex array
+        self.vertex_array = GL.glGenVertexArrays(1)
+        GL.glBindVertexArray(self.vertex_array)
+        self.program = shaders.compileProgram(
+            shaders.compileShader(VERTEX_SHADER, GL.GL_VERTEX_SHADER),
+            shaders.compileShader(FRAGMENT_SHADER, GL.GL_FRAGMENT_SHADER),
+        )
+        GL.glUseProgram(self.program)
+        GL.glUniform2f(GL.glGetUniformLocation(self.program, "screen"), *size)
+        GL.glUniform1i(GL.glGetUniformLocation(self.program, "image"), 0)
+        self.size_uniform = GL.glGetUniformLocation(self.program, "size")
+        self.source_uniform = GL.glGetUniformLocation(self.program, "source")
+
+        # The instance buffer of tennis ball positions
+        self.instances = GL.glGenBuffers(1)
+        GL.glBindBuffer(GL.GL_ARRAY_BUFFER, self.instances)
+        # The raw call, as the wrapped one keeps the pointer in the data of the
+        # current context, which is only found for contexts made by the platform
+        # `PyOpenGL` picked (e.g. GLX, not EGL)
+        GL_2_0.glVertexAttribPointer(0, 2, GL.GL_FLOAT, GL.GL_FALSE, 0, None)
+        GL.glVertexAttribDivisor(0, 1)
+
+        self.overlay = self.texture(self.window)
+        self.framebuffer = None
+        if offscreen:
+            self.framebuffer = GL.glGenFramebuffers(1)
+            GL.glBindFramebuffer(GL.GL_FRAMEBUFFER, self.framebuffer)
+            colour = GL.glGenRenderbuffers(1)
+            GL.glBindRenderbuffer(GL.GL_RENDERBUFFER, colour)
+            GL.glRenderbufferStorage(GL.GL_RENDERBUFFER, GL.GL_RGBA8, *size)
+            GL.glFramebufferRenderbuffer(
+                GL.GL_FRAMEBUFFER,
+                GL.GL_COLOR_ATTACHMENT0,
+                GL.GL_RENDERBUFFER,
+                colour,
+            )
+
+    def texture(self, image):
+        """
+        :param image: A `pygame.Surface`.
+        :returns: The texture of the image, uploading it on first use.
+        """
+        texture = self.textures.get(image)
+        if texture is None:
+            texture = GL.glGenTextures(1)
+            GL.glBindTexture(GL.GL_TEXTURE_2D, texture)
+            GL.glTexParameteri(
+                GL.GL_TEXTURE_2D, GL.GL_TEXTURE_MIN_FILTER, GL.GL_NEAREST
+            )
+            GL.glTexParameteri(
+                GL.GL_TEXTURE_2D, GL.GL_TEXTURE_MAG_FILTER, GL.GL_NEAREST
+            )
+            GL.glTexImage2D(
+                GL.GL_TEXTURE_2D,
+                0,
+                GL.GL_RGBA8,
+                *image.get_size(),
+                0,
+                GL.GL_RGBA,
+                GL.GL_UNSIGNED_BYTE,
+                # Opaque and colour keyed images get an alpha channel
+                pygame.image.tostring(image.convert_alpha(), "RGBA"),
+            )
+            self.textures[image] = texture
+
+        return texture
+
+    def _draw_quad(self, image, position, area=None):
+        """
+        Draw a single textured quad.
+
+        :param image: The surface to draw.
+        :param position: The (x, y) position, or `pygame.Rect`, to draw it at.
+        :param area: The `pygame.Rect` of the part of the surface to draw. Defaults
+            to the whole surface.
+        """
+        (width, height) = image.get_size()
+        area = area or pygame.Rect(0, 0, width, height)
+        GL.glBindTexture(GL.GL_TEXTURE_2D, self.texture(image))
+        GL.glUniform2f(self.size_uniform, area.width, area.height)
+        GL.glUniform4f(
+            self.source_uniform,
+            area.x / width,
+            area.y / height,
+            area.width / width,
+            area.height / height,
+        )
+        GL.glVertexAttrib2f(0, position[0] + area.x, position[1] + area.y)
+        GL.glDrawArrays(GL.GL_TRIANGLE_STRIP, 0, 4)
+
+    def begin(self):
+        """Clear the frame, and the overlay drawn to on the last frame."""
+        if self.context is not None:
+            self.context.make_current()
+        for rect in self.rects:
+            self.window.fill((0, 0, 0, 0), rect)
+        self.previous_rects = self.rects
+        self.rects = []
+
+        GL.glBindFramebuffer(GL.GL_FRAMEBUFFER, self.framebuffer or 0)
+        # The background is opaque, so there is nothing to blend it with
+        GL.glDisable(GL.GL_BLEND)
+        self._draw_quad(self.background, (0, 0))
+        GL.glEnable(GL.GL_BLEND)
+
+    def mark(self, rects):
+        """
+        Mark areas of the overlay as drawn to this frame (e.g. by the HUD or by
+        `pygame.draw`), so that they are uploaded.
+
+        :param rects: A list of `pygame.Rect`s.
+        """
+        self.rects.extend(rects)
+
+    def draw(self, image, position):
+        """
+        Draw a single surface.
+
+        :param image: The surface to draw.
+        :param position: The (x, y) position, or `pygame.Rect`, to draw it at.
+        """
+        self._draw_quad(image, position)
+
+    def draw_particles(self, image, particles, alpha=1.0, stride=1):
+        """
+        Draw every alive particle of a `Particle_System` with a single instanced
+        draw call.
+
+        :param image: The surface to draw for every particle.
+        :param particles: The `Particle_System` to draw.
+        :param alpha: How far to interpolate between the previous and current
+            position of every particle (see `Particle_System.interpolate`).
+        :param stride: Only draw one in every `stride` particles.
+        """
+        (x, y) = particles.interpolate(alpha)
+        alive = particles.indices()[::stride]
+        positions = np.empty((alive.shape[0], 2), dtype=np.float32)
+        positions[:, 0] = x[alive]
+        positions[:, 1] = y[alive]
+
+        GL.glBindTexture(GL.GL_TEXTURE_2D, self.texture(image))
+        GL.glUniform2f(self.size_uniform, *image.get_size())
+        GL.glUniform4f(self.source_uniform, 0, 0, 1, 1)
+        GL.glBufferData(
+            GL.GL_ARRAY_BUFFER, positions.nbytes, positions, GL.GL_STREAM_DRAW
+        )
+        GL.glEnableVertexAttribArray(0)
+        GL.glDrawArraysInstanced(GL.GL_TRIANGLE_STRIP, 0, 4, alive.shape[0])
+        GL.glDisableVertexAttribArray(0)
+
+    def end(self):
+        """Finish the frame, and show it."""
+        self.finish()
+        self.show()
+
+    def finish(self):
+        """Draw the overlay on top of the frame."""
+        bounds = self.window.get_rect()
+        rects = self.previous_rects + self.rects
+        if rects:
+            # Upload the area of the overlay changed on either frame, in one go
+            area = pygame.Rect(rects[0]).unionall(rects[1:]).clip(bounds)
+            GL.glBindTexture(GL.GL_TEXTURE_2D, self.overlay)
+            GL.glTexSubImage2D(
+                GL.GL_TEXTURE_2D,
+                0,
+                area.x,
+                area.y,
+                area.width,
+                area.height,
+                GL.GL_RGBA,
+                GL.GL_UNSIGNED_BYTE,
+                pygame.image.tostring(self.window.subsurface(area), "RGBA"),
+            )
+        if self.rects:
+            # Only draw the area of the overlay drawn to this frame
+            area = pygame.Rect(self.rects[0]).unionall(self.rects[1:]).clip(bounds)
+            self._draw_quad(self.window, (0, 0), area)
+
+    def show(self):
+        """Show the finished frame, by swapping the buffers."""
+        if self.offscreen:
+            # Finish the frame, as there is no buffer swap to wait for it
+            GL.glFinish()
+        else:
+            pygame.display.flip()
+
+    def read_pixels(self, out=None):
+        """
+        Read back the last frame finished, before it is shown (afterwards, the
+        contents of the back buffer are undefined).
+
+        :param out: A (height, width, 3) array to read the pixels into. Defaults to
+            a new array.
+        :returns: A (height, width, 3) array of the RGB pixels of the frame, top row
+            first (a view of `out`).
+        """
+        (width, height) = self.size
+        if out is None:
+            out = np.empty((height, width, 3), dtype=np.uint8)
+        GL.glBindFramebuffer(GL.GL_FRAMEBUFFER, self.framebuffer or 0)
+        if not self.offscreen:
+            GL.glReadBuffer(GL.GL_BACK)
+        GL.glPixelStorei(GL.GL_PACK_ALIGNMENT, 1)
+        GL.glReadPixels(0, 0, width, height, GL.GL_RGB, GL.GL_UNSIGNED_BYTE, out)
+
+        # OpenGL reads the bottom row first
+        return out[::-1]
+
+    def close(self):
+        """Free the textures and buffers, and the offscreen context."""
+        GL.glDeleteTextures(list(self.textures.values()))
+        GL.glDeleteBuffers(1, [self.instances])
+        GL.glDeleteVertexArrays(1, [self.vertex_array])
+        GL.glDeleteProgram(self.program)
+        self.textures = {}
+        if self.context is not None:
+            self.context.close()
+            self.context = None
@@ -0,0 +1,132 @@
+"""
+Author: Marios Yiannakou
+
+An adaptive quality governor, holding the game to its frame-time budget.
+
+The governor watches how long recent frames took to process (not counting the time
+spent waiting for the next frame) against the budget of the FPS setting. While
+frames run over budget it steps the quality down one level at a time, each level
+giving up one more thing, in order of how little it is missed:
+    1. Refresh the changing HUD lines less often
+    2. Stop drawing the hitboxes
+    3. Only collide the tennis balls with each other every other physics step
+    4. Stop spawning tennis balls beyond the number alive on reaching this level
+    5. Only draw every other tennis ball
+Once frames have plenty of headroom again, it steps back up the same way.
+
+Levels only change after a full window of frames at the current level, so that the
+effect of a change is measured before the next one.
+"""
+import numpy as np
+
+from libraries.globals import *
+
+# The name of every quality level, from full quality down
+LEVELS = (
+    "full",
+    "slow HUD",
+    "no hitboxes",
+    "fewer collision steps",
+    "spawning capped",
+    "partial drawing",
+)
+
+
+class Quality_Governor:
+    """
+    Represents the quality governor.
+
+    Call `update` once per frame, and read the current settings from its
+    properties.
+
+    :param window: The number of frames averaged before changing level.
+    :param headroom: The fraction of the budget frames have to stay under to step
+        the quality back up.
+    """
+
+    def __init__(self, window=GOVERNOR_WINDOW, headroom=GOVERNOR_HEADROOM):
+        self.headroom = headroom
+        self.level = 0
+        # Busy times (in ms) of the frames since the last change of level
+        self.times = np.zeros(window)
+        self.count = 0
+        # Number of tennis balls spawning is capped at (see `allowed_spawns`)
+        self.cap = None
+
+    @property
+    def degraded(self):
+        """
+        :returns: True if the quality is below full, False otherwise.
+        """
+        return self.level > 0
+
+    @property
+    def hud_updates(self):
+        """
+        :returns: The maximum number of times per second the changing HUD lines are
+            rendered again.
+        """
+        return GOVERNOR_HUD_UPDATES if self.level >= 1 else HUD_FPS_UPDATES
+
+    @property
+    def hitboxes(self):
+        """
+        :returns: True if the hitboxes may be drawn, False otherwise.
+        """
+        return self.level < 2
+
+    @property
+    def collision_every(self):
+        """
+        :returns: The number of physics steps between two tennis ball collision
+            passes.
+        """
+        return 2 if self.level >= 3 else 1
+
+    @property
+    def draw_stride(self):
+        """
+        :returns: Draw one in every this many tennis balls.
+        """
+        return 2 if self.level >= 5 else 1
+
+    def allowed_spawns(self, count, alive):
+        """
+        :param count: The number of tennis balls asked to be spawned.
+        :param alive: The number of tennis balls alive.
+        :returns: The number of tennis balls that may be spawned.
+        """
+        if self.cap is None:
+            return count
+
+        return max(0, min(count, self.cap - alive))
+
+    def update(self, busy_ms, budget_ms, alive):
+        """
+        Record the busy time of a frame, and change the quality level if needed.
+
+        :param busy_ms: The time (in ms) the frame took to process.
+        :param budget_ms: The time (in ms) a frame is allowed to take.
+        :param alive: The number of tennis balls alive.
+        :returns: True if the quality level changed, False otherwise.
+        """
+        self.times[self.count] = busy_ms
+        self.count += 1
+        if self.count < self.times.shape[0]:
+            return False
+        average = self.times.mean()
+        self.count = 0
+
+        if average > budget_ms and self.level < len(LEVELS) - 1:
+            self.level += 1
+        elif average < budget_ms * self.headroom and self.level > 0:
+            self.level -= 1
+        else:
+            return False
+
+        if self.level < 4:
+            self.cap = None
+        elif self.cap is None:
+            self.cap = alive
+
+        return True
@@ -0,0 +1,109 @@
+"""
+Author: Marios Yiannakou
+
+A heads-up display (HUD) that caches its rendered text.
+
+Rendering text is one of the most expensive parts of drawing a frame, yet most HUD
+lines never change. Every line keeps the surface it was last rendered to, and is
+only rendered again when its text or the font color changes.
+"""
+from libraries import colors
+from time import time_ns
+
+
+class HUD:
+    """
+    Represents the lines of text drawn in the top-left corner of the window.
+
+    Lines are drawn in the order they were first set.
+
+    :param font: The `pygame.font.Font` to render the text with.
+    :param color: The color of the text.
+    :param position: The (x, y) position of the top-left corner of the first line.
+    :param line_height: The vertical distance (in pixels) between two lines.
+    """
+
+    def __init__(self, font, color=colors.BLACK, position=(10, 5), line_height=15):
+        self.font = font
+        self.position = position
+        self.line_height = line_height
+        self._color = color
+
+        self.text = {}
+        self.surfaces = {}
+        # Minimum time (in ns) between two updates of a line, and its last update
+        self.intervals = {}
+        self.updated = {}
+
+    @property
+    def color(self):
+        return self._color
+
+    @color.setter
+    def color(self, color):
+        if color != self._color:
+            self._color = color
+            self.surfaces.clear()
+
+    def set(self, key, text, now=None):
+        """
+        Update the text of a line. The line is only rendered again if its text has
+        changed, and it is not throttled (see `throttle`).
+
+        :param key: The name of the line.
+        :param text: The new text of the line.
+        :param now: The current time in ns. Defaults to now. Only needed for
+            throttled lines.
+        """
+        if self.text.get(key) == text:
+            return
+
+        interval = self.intervals.get(key)
+        if interval and key in self.text:
+            now = time_ns() if now is None else now
+            if now - self.updated.get(key, 0) < interval:
+                return
+            self.updated[key] = now
+
+        self.text[key] = text
+        self.surfaces.pop(key, None)
+
+    def throttle(self, key, updates_per_second):
+        """
+        Limit how often a line can change (e.g. an FPS counter).
+
+        :param key: The name of the line.
+        :param updates_per_second: The maximum number of times per second the line
+            is rendered again. 0 to remove the limit.
+        """
+        if updates_per_second:
+            self.intervals[key] = (1000 * 1000 * 1000) // updates_per_second
+        else:
+            self.intervals.pop(key, None)
+
+    def render(self):
+        """
+        Render every line that is not cached.
+
+        :returns: A list of (surface, position) tuples, one per line.
+        """
+        (start_x, start_y) = self.position
+        blits = []
+        for key, text in self.text.items():
+            surface = self.surfaces.get(key)
+            if surface is None:
+                surface = self.font.render(text, True, self._color)
+                self.surfaces[key] = surface
+            blits.append((surface, (start_x, start_y)))
+            start_y += self.line_height
+
+        return blits
+
+    def draw(self, window):
+        """
+        Draw the HUD.
+
+        :param window: The surface to draw the HUD on.
+        :returns: A list of the rectangles drawn to.
+        """
+        return window.blits(self.render())
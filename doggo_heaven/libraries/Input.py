@@ -0,0 +1,278 @@
+"""
+Author: Marios Yiannakou
+
+The sources of the per-frame input of the game, and its recording and replay.
+
+Every frame, the game reads a `Frame_Input` from an input source: the time elapsed
+since the previous frame, how much of it the game was busy for, the keys held down,
+the modifier keys, and the events to handle. `Live_Input` reads it from `pygame`.
+`Input_Recorder` additionally writes it, along with the seed of the game, to a
+compact binary file, which `Input_Replay` then feeds back into the same key
+handlers, without a window or a frame limit.
+
+Since the physics only ever advance by the recorded frame times, the quality
+governor only ever acts on the recorded busy times (see `libraries.Governor`), and
+every random choice is drawn from the seeded generator of the `World`, a replay ends
+in exactly the same state as the recorded session.
+
+File format (little-endian):
+    - Header: `MAGIC`, the seed (uint64)
+    - Per frame: the frame time and busy time in ms (uint16 each), the held keys
+      as a bitmask over `TRACKED_KEYS` (uint32), the modifiers (uint8, see
+      `MODIFIERS`), and the number of events (uint8), followed by each event's type
+      (uint8, see `EVENT_TYPES`) and key (uint8, the index into `TRACKED_KEYS`, or
+      255 if the key is not tracked)
+"""
+import pygame
+import struct
+
+from random import randrange
+
+MAGIC = b"DOGGOREC2"
+HEADER = struct.Struct("<Q")
+FRAME = struct.Struct("<HHIBB")
+EVENT = struct.Struct("<BB")
+UNTRACKED = 255
+# The most events, and the longest frame and busy times (in ms), a frame can record
+MAX_EVENTS = 0xFF
+MAX_TIME = 0xFFFF
+# The number of seeds a recording can hold (from 0 to `SEEDS` - 1)
+SEEDS = 2 ** 64
+
+# Every key the game reacts to, in the order of their bits in the held key mask
+TRACKED_KEYS = (
+    pygame.K_w,
+    pygame.K_a,
+    pygame.K_s,
+    pygame.K_d,
+    pygame.K_SPACE,
+    pygame.K_PLUS,
+    pygame.K_EQUALS,
+    pygame.K_MINUS,
+    pygame.K_e,
+    pygame.K_g,
+    pygame.K_t,
+    pygame.K_f,
+    pygame.K_h,
+    pygame.K_u,
+    pygame.K_p,
+    pygame.K_r,
+    pygame.K_q,
+    pygame.K_ESCAPE,
+    pygame.K_F5,
+    pygame.K_F9,
+    pygame.K_b,
+)
+KEY_INDICES = {key: index for index, key in enumerate(TRACKED_KEYS)}
+# Modifier flags, and the `pygame` modifiers they stand for
+MODIFIERS = (
+    (1, pygame.KMOD_SHIFT, pygame.KMOD_LSHIFT),
+    (2, pygame.KMOD_CTRL, pygame.KMOD_LCTRL),
+)
+# Event types recorded (anything else is recorded as 0)
+EVENT_TYPES = (None, pygame.KEYDOWN, pygame.KEYUP, pygame.QUIT)
+
+
+class Key_State:
+    """
+    Represents the keys held down during a frame. Indexed with a `pygame` key
+    constant, like the result of `pygame.key.get_pressed`.
+
+    :param mask: The held keys, as a bitmask over `TRACKED_KEYS`.
+    """
+
+    __slots__ = ("mask",)
+
+    def __init__(self, mask=0):
+        self.mask = mask
+
+    def __getitem__(self, key):
+        index = KEY_INDICES.get(key)
+        return index is not None and bool(self.mask >> index & 1)
+
+    @classmethod
+    def from_pressed(cls, pressed):
+        """
+        :param pressed: The result of `pygame.key.get_pressed`.
+        :returns: The `Key_State` of the tracked keys.
+        """
+        mask = 0
+        for index, key in enumerate(TRACKED_KEYS):
+            if pressed[key]:
+                mask |= 1 << index
+
+        return cls(mask)
+
+
+class Frame_Input:
+    """
+    Represents the input of a single frame.
+
+    :param frame_time: The time (in ms) elapsed since the previous frame.
+    :param busy_time: The time (in ms) the game spent processing the previous
+        frame, not counting any time spent waiting to limit the frame rate.
+    :param keys: The `Key_State` of the keys held down.
+    :param mods: The modifier keys held down, as `pygame.key.get_mods` returns them.
+    :param events: The list of `pygame.event.Event`s to handle.
+    """
+
+    __slots__ = ("frame_time", "busy_time", "keys", "mods", "events")
+
+    def __init__(self, frame_time, busy_time, keys, mods, events):
+        self.frame_time = frame_time
+        self.busy_time = busy_time
+        self.keys = keys
+        self.mods = mods
+        self.events = events
+
+
+class Live_Input:
+    """
+    Represents the input of the player, read from `pygame`.
+
+    :param seed: The seed of the game's random number generator. Defaults to a
+        random seed.
+    """
+
+    def __init__(self, seed=None):
+        self.seed = randrange(SEEDS) if seed is None else seed
+
+    def poll(self, clock, fps):
+        """
+        Wait for the next frame, and read its input.
+
+        :param clock: The `pygame.time.Clock` limiting the frame rate.
+        :param fps: The frame rate to limit the game to.
+        :returns: The `Frame_Input` of the frame.
+        """
+        frame_time = clock.tick(fps)
+        events = pygame.event.get()
+
+        return Frame_Input(
+            frame_time,
+            clock.get_rawtime(),
+            Key_State.from_pressed(pygame.key.get_pressed()),
+            pygame.key.get_mods(),
+            events,
+        )
+
+    def close(self):
+        """Stop reading input."""
+
+
+class Input_Recorder(Live_Input):
+    """
+    Represents the input of the player, read from `pygame` and written to a file.
+
+    :param path: The path of the file to record to. Overwritten if it exists.
+    :param seed: The seed of the game's random number generator. Defaults to a
+        random seed.
+    """
+
+    def __init__(self, path, seed=None):
+        super().__init__(seed)
+        self.file = open(path, "wb")
+        self.file.write(MAGIC + HEADER.pack(self.seed))
+        self.frames = 0
+
+    def poll(self, clock, fps):
+        frame = super().poll(clock, fps)
+        # Only what fits in the recording is handled, so that a replay of it plays
+        # out the same way
+        frame.frame_time = min(frame.frame_time, MAX_TIME)
+        frame.busy_time = min(frame.busy_time, MAX_TIME)
+        frame.events = frame.events[:MAX_EVENTS]
+
+        mods = 0
+        for flag, modifier, _ in MODIFIERS:
+            if frame.mods & modifier:
+                mods |= flag
+        events = [
+            (
+                EVENT_TYPES.index(event.type) if event.type in EVENT_TYPES else 0,
+                KEY_INDICES.get(getattr(event, "key", None), UNTRACKED),
+            )
+            for event in frame.events
+        ]
+
+        self.file.write(
+            FRAME.pack(
+                frame.frame_time,
+                frame.busy_time,
+                frame.keys.mask,
+                mods,
+                len(events),
+            )
+        )
+        for event in events:
+            self.file.write(EVENT.pack(*event))
+        self.frames += 1
+
+        return frame
+
+    def close(self):
+        """Stop recording, and close the file."""
+        self.file.close()
+
+
+class Input_Replay:
+    """
+    Represents input read back from a file written by `Input_Recorder`. Once every
+    recorded frame has been read, a `pygame.QUIT` event is returned.
+
+    :param path: The path of the recording.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as file:
+            self.data = file.read()
+        if not self.data.startswith(MAGIC):
+            raise ValueError(f"'{path}' is not a Doggo Heaven input recording")
+
+        (self.seed,) = HEADER.unpack_from(self.data, len(MAGIC))
+        self.offset = len(MAGIC) + HEADER.size
+        self.frames = 0
+
+    def poll(self, clock, fps):
+        """
+        Read the input of the next recorded frame. Does not wait, however fast the
+        game runs.
+
+        :param clock: The `pygame.time.Clock` of the game (only used to keep
+            counting the frame rate).
+        :param fps: Ignored, as the recorded frame times are used instead.
+        :returns: The `Frame_Input` of the frame.
+        """
+        clock.tick()
+        if self.offset >= len(self.data):
+            return Frame_Input(0, 0, Key_State(), 0, [pygame.event.Event(pygame.QUIT)])
+
+        (frame_time, busy_time, mask, flags, count) = FRAME.unpack_from(
+            self.data, self.offset
+        )
+        self.offset += FRAME.size
+
+        mods = 0
+        for flag, _, modifier in MODIFIERS:
+            if flags & flag:
+                mods |= modifier
+        events = []
+        for _ in range(count):
+            (event_type, key) = EVENT.unpack_from(self.data, self.offset)
+            self.offset += EVENT.size
+            if EVENT_TYPES[event_type] is None:
+                events.append(pygame.event.Event(pygame.USEREVENT))
+            elif key == UNTRACKED:
+                events.append(pygame.event.Event(EVENT_TYPES[event_type], key=0))
+            else:
+                events.append(
+                    pygame.event.Event(
+                        EVENT_TYPES[event_type], key=TRACKED_KEYS[key], mod=mods
+                    )
+                )
+        self.frames += 1
+
+        return Frame_Input(frame_time, busy_time, Key_State(mask), mods, events)
+
+    def close(self):
+        """Stop replaying."""
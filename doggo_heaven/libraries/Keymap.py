@@ -0,0 +1,129 @@
+"""
+Author: Marios Yiannakou
+
+The key bindings of the game, as tables of keys and the actions they trigger.
+
+There are two kinds of bindings:
+    - Key releases (e.g. 'f' to switch the FPS setting), which trigger their action
+      once per `pygame.KEYUP` event.
+    - Held keys (e.g. the movement keys), whose state is read once per frame.
+      Their action is repeated at a fixed rate (or once per frame) for as long as
+      the key is held down, however many (or few) events the frame had, so holding
+      '+' spawns tennis balls in one batch per frame rather than one ball per key
+      repeat event.
+
+Actions are names of methods of the game (see `main.Doggo_Heaven`), so that adding a
+binding means adding a row to a table and a method, rather than another `if` to a
+chain every event goes through.
+"""
+import pygame
+
+from libraries.globals import *
+from math import ceil
+
+# The only events the game handles. Everything else is kept off the event queue.
+ALLOWED_EVENTS = (pygame.QUIT, pygame.KEYDOWN, pygame.KEYUP)
+
+# (key, modifier) of a key release, and its action. A modifier of 0 matches a key
+# released with any modifier that has no binding of its own.
+KEY_RELEASES = {
+    (pygame.K_SPACE, 0): "jump",
+    (pygame.K_f, 0): "cycle_fps",
+    (pygame.K_e, pygame.KMOD_SHIFT): "decrease_elasticity",
+    (pygame.K_e, pygame.KMOD_CTRL): "increase_elasticity",
+    (pygame.K_g, pygame.KMOD_SHIFT): "decrease_gravity",
+    (pygame.K_g, pygame.KMOD_CTRL): "increase_gravity",
+    (pygame.K_t, pygame.KMOD_SHIFT): "decrease_lifetime",
+    (pygame.K_t, pygame.KMOD_CTRL): "increase_lifetime",
+    (pygame.K_h, 0): "toggle_hitboxes",
+    (pygame.K_p, 0): "toggle_profiler",
+    (pygame.K_p, pygame.KMOD_CTRL): "toggle_profiler_csv",
+    (pygame.K_u, 0): "toggle_dirty_rendering",
+    (pygame.K_F5, 0): "save",
+    (pygame.K_F9, 0): "load",
+    (pygame.K_b, 0): "burst",
+}
+# Modifiers looked up, in order of priority
+MODIFIER_ORDER = (pygame.KMOD_CTRL, pygame.KMOD_SHIFT)
+
+# Keys acting for as long as they are held down, their action, and how many times
+# per second the action repeats (`None` for once per frame)
+KEY_HOLDS = (
+    ((pygame.K_w,), "move_up", KEY_REPEAT_RATE),
+    ((pygame.K_s,), "move_down", KEY_REPEAT_RATE),
+    ((pygame.K_a,), "move_left", KEY_REPEAT_RATE),
+    ((pygame.K_d,), "move_right", KEY_REPEAT_RATE),
+    ((pygame.K_r,), "reset", None),
+    # Spawns at the rate of `World.spawner`
+    ((pygame.K_PLUS, pygame.K_EQUALS), "spawn", None),
+    ((pygame.K_MINUS,), "despawn", SPAWN_RATE),
+    ((pygame.K_q, pygame.K_ESCAPE), "quit", None),
+)
+
+
+class Keymap:
+    """
+    Represents the key bindings of the game.
+
+    :param releases: The bindings of key releases (see `KEY_RELEASES`).
+    :param holds: The bindings of held keys (see `KEY_HOLDS`).
+    """
+
+    def __init__(self, releases=KEY_RELEASES, holds=KEY_HOLDS):
+        self.releases = releases
+        self.holds = holds
+        # Repeats owed to every held key's action, carried over between frames
+        # (`None` while the key is not held down)
+        self.owed = [None] * len(holds)
+
+    @staticmethod
+    def allow_events():
+        """Keep every event the game does not handle off the event queue."""
+        pygame.event.set_blocked(None)
+        pygame.event.set_allowed(ALLOWED_EVENTS)
+
+    def released(self, key, mods):
+        """
+        :param key: The `pygame` key released.
+        :param mods: The modifier keys held down.
+        :returns: The action bound to the key release, or `None` if there is none.
+        """
+        for modifier in MODIFIER_ORDER:
+            if mods & modifier and (key, modifier) in self.releases:
+                return self.releases[(key, modifier)]
+
+        return self.releases.get((key, 0))
+
+    def held(self, keys, frame_time):
+        """
+        Work out the actions of the keys held down during a frame.
+
+        A key starts repeating its action straight away when pressed, and the number
+        of repeats per frame is capped at what a frame at `LOW_FPS` would get, so a
+        stall does not turn into a burst.
+
+        :param keys: The `Key_State` of the frame.
+        :param frame_time: The time (in ms) elapsed since the previous frame.
+        :returns: A list of (action, number of repeats) tuples, in table order.
+        """
+        actions = []
+        for position, (bound, action, rate) in enumerate(self.holds):
+            if not any(keys[key] for key in bound):
+                self.owed[position] = None
+                continue
+            if rate is None:
+                actions.append((action, 1))
+                continue
+
+            if self.owed[position] is None:
+                # Just pressed
+                owed = 1.0
+            else:
+                owed = self.owed[position] + rate * frame_time / 1000
+            repeats = min(int(owed), ceil(rate / LOW_FPS))
+            # Only the fraction of a repeat is carried over
+            self.owed[position] = (owed - repeats) % 1
+            if repeats:
+                actions.append((action, repeats))
+
+        return actions
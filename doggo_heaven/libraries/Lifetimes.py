@@ -0,0 +1,79 @@
+"""
+Author: Marios Yiannakou
+
+Schedules the expiry of particles with a limited lifetime.
+
+Rather than checking the age of every particle on every frame, the time each
+particle is due to expire (its deadline) is kept in a min-heap. Expiring particles
+then only means popping the deadlines that have passed, so the cost depends on how
+many particles expire, not on how many are alive.
+"""
+from heapq import heapify, heappop, heappush
+
+
+class Expiry_Scheduler:
+    """
+    Represents a min-heap of (deadline, index) entries.
+
+    Entries are never removed from the middle of the heap. When a particle is
+    removed, or its lifetime changes, its old entry is left behind and skipped once
+    popped, since it no longer matches the particle's current deadline.
+    """
+
+    def __init__(self):
+        self.heap = []
+
+    def __len__(self):
+        return len(self.heap)
+
+    def clear(self):
+        """Remove every entry."""
+        self.heap = []
+
+    def schedule(self, index, deadline):
+        """
+        Schedule a particle to expire.
+
+        :param index: The index of the particle.
+        :param deadline: The time (in ns) the particle expires at.
+        """
+        heappush(self.heap, (deadline, index))
+
+    def schedule_many(self, indices, deadlines):
+        """
+        Schedule a batch of particles to expire.
+
+        :param indices: The indices of the particles.
+        :param deadlines: The time (in ns) each of the particles expires at.
+        """
+        self.heap.extend(zip(deadlines, indices))
+        heapify(self.heap)
+
+    def rebuild(self, indices, deadlines):
+        """
+        Replace every entry, e.g. after the lifetime of every particle has changed.
+
+        :param indices: The indices of the particles with a limited lifetime.
+        :param deadlines: The time (in ns) each of the particles expires at.
+        """
+        self.heap = list(zip(deadlines, indices))
+        heapify(self.heap)
+
+    def pop_expired(self, now, deadline):
+        """
+        Pop every entry whose deadline has passed.
+
+        :param now: The current time in ns.
+        :param deadline: A callable returning the current deadline (in ns) of the
+            particle at the given index, or `None` if it does not expire. Entries
+            which do not match it are stale, and are dropped.
+        :returns: A list of the indices of the particles that expired.
+        """
+        expired = []
+        heap = self.heap
+        while heap and heap[0][0] <= now:
+            (due, index) = heappop(heap)
+            if deadline(index) == due:
+                expired.append(index)
+
+        return expired
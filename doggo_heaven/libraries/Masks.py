@@ -0,0 +1,58 @@
+"""
+Author: Marios Yiannakou
+
+Pixel-accurate collisions between the particles and the player.
+
+A `pygame.mask.Mask` is built once for every image of the player, and convolved
+with the mask of the particle image. The result is kept as a `numpy` array of every
+offset (of the particle's top-left corner from the player's) at which an opaque
+pixel of the particle lands on an opaque pixel of the player. Testing a particle is
+then a single lookup into that array, so no mask is built or compared while the
+game runs (see `Particle_System.collide_rect`).
+"""
+import pygame
+
+
+def hit_offsets(image, particle):
+    """
+    :param image: The image (e.g. of the player) the particles collide with.
+    :param particle: The image of the particles.
+    :returns: A boolean array, of shape (width, height) of `image` plus those of
+        `particle` minus 1, which is True at (x, y) if a particle drawn at
+        (x - particle width + 1, y - particle height + 1) from the top-left corner
+        of `image` overlaps it.
+    """
+    mask = pygame.mask.from_surface(image)
+    # The bit at (x, y) is set if the particle overlaps with its bottom-right
+    # corner at (x, y)
+    hits = mask.convolve(pygame.mask.from_surface(particle))
+
+    return pygame.surfarray.array_red(hits.to_surface()) > 0
+
+
+class Collision_Masks:
+    """
+    Represents a cache of the offsets at which a particle hits each image of a
+    sprite (see `hit_offsets`), keyed by image.
+
+    :param particle: The image of the particles.
+    :param images: The images to build the offsets of straight away.
+    """
+
+    def __init__(self, particle, images=()):
+        self.particle = particle
+        self.offsets = {}
+        for image in images:
+            self.get(image)
+
+    def get(self, image):
+        """
+        :param image: An image of the sprite.
+        :returns: The offsets at which a particle hits the image. Only built the
+            first time an image is asked for.
+        """
+        offsets = self.offsets.get(image)
+        if offsets is None:
+            offsets = self.offsets[image] = hit_offsets(image, self.particle)
+
+        return offsets
@@ -0,0 +1,261 @@
+"""
+Author: Marios Yiannakou
+
+A multi-process backend for the particle physics.
+
+The window is split into vertical strips, one per worker process. The particle
+arrays live in `multiprocessing.shared_memory`, so every worker can read and write
+them without copying, and each worker applies gravity, drag and wall bounces to
+the particles in its own strip. Particles that move into another strip are handed
+over to that strip's worker for the next step. Handovers are written to a second
+strip array, and only take effect once every worker has finished, so that no
+particle is stepped twice.
+
+Since every particle is updated independently of the others, the results are the
+same as those of the single-process `Particle_System.step`.
+"""
+import numpy as np
+import os
+
+from libraries.globals import *
+from libraries.Particles import Particle_System, apply_gravity, bounce
+from multiprocessing import Pool
+from multiprocessing.shared_memory import SharedMemory
+
+# Shared memory blocks attached to by a worker process, by name, and the
+# generation (see `Parallel_Particle_System.generation`) they belong to
+_attached = {}
+_generation = [None]
+
+
+def _detach():
+    """Close every shared memory block attached to by a worker process."""
+    for block in _attached.values():
+        block.close()
+    _attached.clear()
+
+
+def _attach(name, capacity, dtype, generation):
+    """
+    Attach to a shared memory block from a worker process. Blocks of an older
+    generation (freed since by the store growing) are closed first.
+
+    :param name: The name of the shared memory block.
+    :param capacity: The number of elements in the block.
+    :param dtype: The type of the elements.
+    :param generation: The generation of the store's blocks.
+    :returns: A `numpy` array backed by the block.
+    """
+    if generation != _generation[0]:
+        _detach()
+        _generation[0] = generation
+    if name not in _attached:
+        _attached[name] = SharedMemory(name)
+
+    return np.ndarray(capacity, dtype=dtype, buffer=_attached[name].buf)
+
+
+def _step_strip(task):
+    """
+    Step every particle awake in one strip. Run by the worker processes.
+
+    :param task: A tuple of the shared memory block names (by array name) and
+        their generation, the capacity and slot count of the store, the strip to
+        step, the number of strips, the gravity magnitude and the particle height.
+    :returns: A tuple of the number of particles stepped, and the number of them
+        handed over to another strip.
+    """
+    (names, generation, capacity, count, strip, strips, gravity, height) = task
+    arrays = {
+        name: _attach(
+            block, capacity, Parallel_Particle_System.ARRAYS[name], generation
+        )[:count]
+        for name, block in names.items()
+    }
+
+    awake = arrays["alive"] & ~arrays["asleep"]
+    indices = np.flatnonzero(awake & (arrays["strip"] == strip))
+    x = arrays["x"][indices]
+    y = arrays["y"][indices]
+    vx = arrays["vx"][indices]
+    vy = arrays["vy"][indices]
+    arrays["prev_x"][indices] = x
+    arrays["prev_y"][indices] = y
+
+    apply_gravity(x, y, vx, vy, gravity)
+    bounce(x, y, vx, vy, arrays["elasticity"][indices], height)
+
+    arrays["x"][indices] = x
+    arrays["y"][indices] = y
+    arrays["vx"][indices] = vx
+    arrays["vy"][indices] = vy
+
+    # Hand the particles that left the strip over to their new strip
+    new_strip = strip_of(x, strips)
+    arrays["next_strip"][indices] = new_strip
+
+    return (indices.shape[0], int(np.count_nonzero(new_strip != strip)))
+
+
+def strip_of(x, strips):
+    """
+    :param x: The x-coordinates of the particles.
+    :param strips: The number of strips the window is split into.
+    :returns: The strip each x-coordinate falls into.
+    """
+    strip = (np.asarray(x) * strips // WINDOW_WIDTH).astype(np.int32)
+    return np.clip(strip, 0, strips - 1)
+
+
+class Parallel_Particle_System(Particle_System):
+    """
+    Represents a `Particle_System` whose arrays live in shared memory, and whose
+    `step` is split across a pool of worker processes, one vertical strip each.
+
+    Everything other than `step` (adding, removing, collisions, expiry) still runs
+    in the calling process, on the same shared arrays. Call `close` once done, to
+    stop the workers and free the shared memory.
+
+    :param capacity: The number of particles to preallocate space for.
+    :param width: The width (in pixels) of every particle.
+    :param height: The height (in pixels) of every particle.
+    :param workers: The number of worker processes (and strips). Defaults to the
+        number of CPUs.
+    """
+
+    # The strip every particle belongs to on this step, and on the next one
+    ARRAYS = {**Particle_System.ARRAYS, "strip": np.int32, "next_strip": np.int32}
+
+    def __init__(
+        self,
+        capacity=NUM_OF_BALLS,
+        width=BALL_WIDTH,
+        height=BALL_HEIGHT,
+        workers=None,
+    ):
+        self.workers = workers or os.cpu_count() or 1
+        self.blocks = {}
+        # Bumped whenever the blocks are replaced, so that the workers let go of
+        # the old ones
+        self.generation = 0
+        self.pool = None
+        # Total number of particles handed over between strips
+        self.handovers = 0
+        super().__init__(capacity, width, height)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _allocate(self, name, capacity, dtype):
+        """
+        Allocate one of the per-particle arrays in shared memory, freeing the block
+        it replaces (if any).
+        """
+        block = SharedMemory(
+            create=True, size=max(1, capacity * np.dtype(dtype).itemsize)
+        )
+        array = np.ndarray(capacity, dtype=dtype, buffer=block.buf)
+        array[:] = 0
+
+        if name in self.blocks:
+            self._release(name)
+        self.blocks[name] = block
+
+        return array
+
+    def _release(self, name):
+        """
+        Free the shared memory block of an array.
+
+        :param name: The name of the array.
+        """
+        block = self.blocks.pop(name)
+        # The array viewing the block has to go before the block can be closed
+        setattr(self, name, None)
+        block.close()
+        block.unlink()
+
+    def _grow(self):
+        """Double the capacity of every array in the store."""
+        capacity = self.capacity * 2
+        self.generation += 1
+        for name, dtype in self.ARRAYS.items():
+            old = getattr(self, name).copy()
+            new = self._allocate(name, capacity, dtype)
+            new[: old.shape[0]] = old
+            setattr(self, name, new)
+
+    def add(self, x_coord, y_coord, *args, **kwargs):
+        index = super().add(x_coord, y_coord, *args, **kwargs)
+        self.strip[index] = self.next_strip[index] = strip_of(x_coord, self.workers)
+
+        return index
+
+    def add_many(self, x_coords, y_coords, *args, **kwargs):
+        indices = super().add_many(x_coords, y_coords, *args, **kwargs)
+        self.strip[indices] = self.next_strip[indices] = strip_of(
+            x_coords, self.workers
+        )
+
+        return indices
+
+    def restore(self, state, gravity=None):
+        super().restore(state, gravity)
+        select = self._select()
+        self.strip[select] = self.next_strip[select] = strip_of(
+            self.x[select], self.workers
+        )
+
+    def step(self, gravity):
+        """
+        Advance every particle that is awake by one frame (gravity, drag and wall
+        bounces), with each worker process stepping the particles in its strip, and
+        put the ones that have come to rest to sleep.
+
+        :param gravity: The magnitude of the gravity vector.
+        """
+        if gravity != self.gravity:
+            self.wake()
+            self.gravity = gravity
+        if self.pool is None:
+            self.pool = Pool(self.workers)
+
+        # Particles that are not stepped (e.g. asleep) stay in their strip
+        select = self._select()
+        self.next_strip[select] = self.strip[select]
+
+        names = {name: block.name for name, block in self.blocks.items()}
+        tasks = [
+            (
+                names,
+                self.generation,
+                self.capacity,
+                self.count,
+                strip,
+                self.workers,
+                gravity,
+                self.height,
+            )
+            for strip in range(self.workers)
+        ]
+        for _, handovers in self.pool.map(_step_strip, tasks):
+            self.handovers += handovers
+        # Swap the strip arrays (and their blocks), so the handovers take effect
+        (self.strip, self.next_strip) = (self.next_strip, self.strip)
+        (self.blocks["strip"], self.blocks["next_strip"]) = (
+            self.blocks["next_strip"],
+            self.blocks["strip"],
+        )
+        self.settle(gravity, self.awake() if self.sleeping() else None)
+
+    def close(self):
+        """Stop the worker processes and free the shared memory."""
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+        for name in list(self.blocks):
+            self._release(name)
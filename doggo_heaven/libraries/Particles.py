@@ -0,0 +1,858 @@
+"""
+Author: Marios Yiannakou
+
+A structure-of-arrays particle store for the 'Doggo Heaven' game.
+
+Rather than every tennis ball owning its own `pygame.Rect` and calling
+`add_vectors` once per frame, all particle state lives in `numpy` arrays and the
+gravity, drag and bounce logic is applied to every particle in a single batched
+step. `Tennis_Ball` sprites are thin views over a slot in this store.
+
+Slots are preallocated and recycled through a free list, so spawning and removing
+particles does not allocate any Python objects, and the memory used per particle is
+fixed (see `Particle_System.nbytes`).
+
+Velocities are stored as (vx, vy) components, in pixels per step with y pointing
+down, and positions as floats, so that stepping the physics needs no trigonometry
+and no rounding to the pixel grid. The angle and speed the rest of the game uses
+are only calculated when asked for.
+
+Particles that come to rest (e.g. on the floor) are put to sleep, and are left out
+of the physics step until a moving particle or the player touches them, or the
+gravity or elasticity changes.
+"""
+import numpy as np
+
+from libraries.globals import *
+from libraries.Lifetimes import Expiry_Scheduler
+from time import time_ns
+
+# The per-particle state saved to (and restored from) a snapshot, with a fixed
+# byte order so that snapshots can be moved between machines
+STATE = np.dtype(
+    [
+        ("x", "<f8"),
+        ("y", "<f8"),
+        ("vx", "<f8"),
+        ("vy", "<f8"),
+        ("elasticity", "<f8"),
+        ("lifetime", "<f8"),
+        ("born", "<i8"),
+        ("asleep", "?"),
+        ("still", "<i4"),
+    ]
+)
+
+
+def apply_gravity(x, y, vx, vy, gravity):
+    """
+    Applies a gravity vector to particles, updating the given arrays in-place. This
+    is the batched equivalent of `Sprite.apply_gravity`.
+
+    :param x: The x-coordinates of the particles.
+    :param y: The y-coordinates of the particles.
+    :param vx: The horizontal velocities of the particles.
+    :param vy: The vertical velocities of the particles (positive being down).
+    :param gravity: The magnitude of the gravity vector.
+    """
+    vx += GRAVITY_X * gravity
+    vy += GRAVITY_Y * gravity
+    x += vx
+    y += vy
+    vx *= DRAG
+    vy *= DRAG
+
+
+def bounce(x, y, vx, vy, elasticity, height):
+    """
+    Handle the bouncing logic for particles colliding with any screen edges,
+    updating the given arrays in-place. This is the batched equivalent of
+    `Tennis_Ball.bounce`.
+
+    :param x: The x-coordinates of the particles.
+    :param y: The y-coordinates of the particles.
+    :param vx: The horizontal velocities of the particles.
+    :param vy: The vertical velocities of the particles (positive being down).
+    :param elasticity: The elasticities of the particles.
+    :param height: The height (in pixels) of the particles.
+    """
+    right = x >= WINDOW_WIDTH
+    left = x <= 0
+    x[right] = 2 * WINDOW_WIDTH - x[right]
+    x[left] = -x[left]
+    horizontal = right | left
+    vx[horizontal] *= -elasticity[horizontal]
+    vy[horizontal] *= elasticity[horizontal]
+
+    bottom = y >= (WINDOW_HEIGHT - height)
+    top = ~bottom & (y <= 0)
+    y[bottom] = 2 * WINDOW_HEIGHT - (y[bottom] + height)
+    y[top] = -y[top]
+    vertical = bottom | top
+    vx[vertical] *= elasticity[vertical]
+    vy[vertical] *= -elasticity[vertical]
+
+
+class Particle:
+    """
+    Represents a handle to a single particle in a `Particle_System`.
+
+    A handle only holds the store and the index of the particle in it, and every
+    attribute is read from and written to the store directly. Do not use a handle
+    after its particle has been removed, as the slot may since have been reused.
+
+    :param particles: The `Particle_System` the particle is stored in.
+    :param index: The index of the particle in the store.
+    """
+
+    __slots__ = ("particles", "index", "heading")
+
+    def __init__(self, particles, index):
+        self.particles = particles
+        self.index = index
+        # The angle last set while the particle was at rest, which its velocity
+        # cannot hold
+        self.heading = None
+
+    @property
+    def x(self):
+        return float(self.particles.x[self.index])
+
+    @x.setter
+    def x(self, x):
+        self.particles.x[self.index] = x
+
+    @property
+    def y(self):
+        return float(self.particles.y[self.index])
+
+    @y.setter
+    def y(self, y):
+        self.particles.y[self.index] = y
+
+    @property
+    def vx(self):
+        return float(self.particles.vx[self.index])
+
+    @vx.setter
+    def vx(self, vx):
+        self.particles.vx[self.index] = vx
+
+    @property
+    def vy(self):
+        return float(self.particles.vy[self.index])
+
+    @vy.setter
+    def vy(self, vy):
+        self.particles.vy[self.index] = vy
+
+    @property
+    def angle(self):
+        (angle, speed) = to_polar(self.vx, self.vy)
+        if speed == 0 and self.heading is not None:
+            return self.heading
+        return angle
+
+    @angle.setter
+    def angle(self, angle):
+        self.set_polar(angle, self.speed)
+
+    @property
+    def speed(self):
+        return to_polar(self.vx, self.vy)[1]
+
+    @speed.setter
+    def speed(self, speed):
+        self.set_polar(self.angle, speed)
+
+    def set_polar(self, angle, speed):
+        """
+        Set the velocity of the particle from an angle and a speed at once. Setting
+        `angle` and `speed` one after the other works too, but goes through the
+        velocity in between.
+
+        :param angle: The angle (in radians) the particle moves towards. 0 being up,
+            math.pi down.
+        :param speed: The speed of the particle.
+        """
+        (self.vx, self.vy) = to_cartesian(angle, speed)
+        self.heading = angle if speed == 0 else None
+
+    @property
+    def elasticity(self):
+        return float(self.particles.elasticity[self.index])
+
+    @elasticity.setter
+    def elasticity(self, elasticity):
+        self.particles.elasticity[self.index] = elasticity
+
+    @property
+    def lifetime(self):
+        return float(self.particles.lifetime[self.index])
+
+    @lifetime.setter
+    def lifetime(self, lifetime):
+        self.particles.lifetime[self.index] = lifetime
+        self.particles.schedule(self.index)
+
+    @property
+    def born(self):
+        return int(self.particles.born[self.index])
+
+    @born.setter
+    def born(self, born):
+        self.particles.born[self.index] = born
+        self.particles.schedule(self.index)
+
+    def is_alive(self, now=None):
+        """
+        :param now: The current time in ns. Defaults to now.
+        :returns: True if the particle is alive, False otherwise.
+        """
+        return self.particles.is_alive(self.index, now)
+
+    def despawn(self):
+        """Remove the particle from its store."""
+        self.particles.remove(self.index)
+
+
+class Particle_System:
+    """
+    Represents a collection of equally sized particles (e.g. tennis balls).
+
+    A particle consists of:
+        - A position (top-left corner, in pixels)
+        - A velocity (vx and vy, in pixels per step)
+        - An elasticity
+        - A lifetime (in seconds) and the time (in ns) it was born
+        - An alive flag
+        - An asleep flag, and the number of steps it has been (nearly) still for
+
+    Particles never move between slots, so the index returned by `add` can be used
+    to refer to the same particle for as long as it is alive. Once removed, its slot
+    is put on a free list and handed out again by a later `add`.
+
+    :param capacity: The number of particles to preallocate space for. The store
+        grows automatically if more particles are added.
+    :param width: The width (in pixels) of every particle.
+    :param height: The height (in pixels) of every particle.
+    """
+
+    # Names and types of the per-particle arrays. `prev_x` and `prev_y` hold the
+    # position before the last step, used to interpolate when drawing.
+    ARRAYS = {
+        "x": np.float64,
+        "y": np.float64,
+        "prev_x": np.float64,
+        "prev_y": np.float64,
+        "vx": np.float64,
+        "vy": np.float64,
+        "elasticity": np.float64,
+        "lifetime": np.float64,
+        "born": np.int64,
+        "alive": bool,
+        "asleep": bool,
+        "still": np.int32,
+    }
+
+    def __init__(self, capacity=NUM_OF_BALLS, width=BALL_WIDTH, height=BALL_HEIGHT):
+        self.width = width
+        self.height = height
+        # High-water mark of used slots
+        self.count = 0
+        # Removed slots below `count`, ready to be reused
+        self.free = []
+        # Deadlines of the particles with a limited lifetime
+        self.expiry = Expiry_Scheduler()
+        # Gravity magnitude of the last step, to wake every particle when it changes
+        self.gravity = None
+
+        capacity = max(1, capacity)
+        for name, dtype in self.ARRAYS.items():
+            setattr(self, name, self._allocate(name, capacity, dtype))
+
+    def __len__(self):
+        """
+        :returns: The number of particles currently alive.
+        """
+        return self.count - len(self.free)
+
+    def __getitem__(self, index):
+        """
+        :param index: The index of a particle.
+        :returns: A `Particle` handle to the particle.
+        """
+        return Particle(self, index)
+
+    @property
+    def capacity(self):
+        """
+        :returns: The number of slots currently allocated.
+        """
+        return self.x.shape[0]
+
+    @property
+    def angle(self):
+        """
+        :returns: An array of the angle (in radians) of every particle's velocity.
+            0 being up, math.pi down.
+        """
+        return np.arctan2(self.vx, -self.vy)
+
+    @property
+    def speed(self):
+        """
+        :returns: An array of the speed of every particle.
+        """
+        return np.hypot(self.vx, self.vy)
+
+    @property
+    def nbytes(self):
+        """
+        :returns: The number of bytes used by the per-particle arrays.
+        """
+        return sum(getattr(self, name).nbytes for name in self.ARRAYS)
+
+    def _allocate(self, name, capacity, dtype):
+        """
+        Allocate one of the per-particle arrays.
+
+        :param name: The name of the array (a key of `ARRAYS`).
+        :param capacity: The number of particles the array holds.
+        :param dtype: The type of the array's elements.
+        :returns: A zeroed `numpy` array.
+        """
+        return np.zeros(capacity, dtype=dtype)
+
+    def _grow(self):
+        """Double the capacity of every array in the store."""
+        capacity = self.capacity * 2
+        for name, dtype in self.ARRAYS.items():
+            old = getattr(self, name)
+            new = self._allocate(name, capacity, dtype)
+            new[: old.shape[0]] = old
+            setattr(self, name, new)
+
+    def indices(self):
+        """
+        :returns: An array of the indices of every alive particle.
+        """
+        return np.flatnonzero(self.alive[: self.count])
+
+    def awake(self):
+        """
+        :returns: An array of the indices of every alive particle that is not
+            asleep.
+        """
+        select = self._select()
+        return np.flatnonzero(self.alive[select] & ~self.asleep[select])
+
+    def sleeping(self):
+        """
+        :returns: The number of particles currently asleep.
+        """
+        return int(np.count_nonzero(self.asleep[: self.count]))
+
+    def _select(self, index=None):
+        """
+        :param index: The index of a single particle, or `None` for all of them.
+        :returns: A slice selecting the requested particles, so that the arrays can
+            be updated in-place through views.
+        """
+        if index is None:
+            return slice(0, self.count)
+        return slice(index, index + 1)
+
+    def add(
+        self,
+        x_coord,
+        y_coord,
+        angle=0,
+        speed=GRAVITY_MAGN,
+        elasticity=0.8,
+        lifetime=0,
+        born=None,
+    ):
+        """
+        Add a new particle to the store.
+
+        :param x_coord: The x-coordinate of the particles top-left corner.
+        :param y_coord: The y-coordinate of the particles top-left corner.
+        :param angle: The initial angle (in radians) of the particle. 0 being up,
+            math.pi down.
+        :param speed: The initial speed of the particle.
+        :param elasticity: The multiplier applied to the particles speed each time
+            it reaches a boundary position.
+        :param lifetime: The amount of time (in seconds) the particle remains alive.
+            If zero, the particle does not expire.
+        :param born: The time (in ns) the particle was created. Defaults to now.
+        :returns: The index of the new particle.
+        """
+        if self.free:
+            index = self.free.pop()
+        else:
+            if self.count == self.capacity:
+                self._grow()
+            index = self.count
+            self.count += 1
+        self.x[index] = self.prev_x[index] = x_coord
+        self.y[index] = self.prev_y[index] = y_coord
+        (self.vx[index], self.vy[index]) = to_cartesian(angle, speed)
+        self.elasticity[index] = elasticity
+        self.lifetime[index] = lifetime
+        self.born[index] = time_ns() if born is None else born
+        self.alive[index] = True
+        self.asleep[index] = False
+        self.still[index] = 0
+        self.schedule(index)
+
+        return index
+
+    def add_many(
+        self, x_coords, y_coords, vx, vy, elasticity=0.8, lifetime=0, born=None
+    ):
+        """
+        Add a batch of particles to the store in one go. This is the batched
+        equivalent of `add`, except that the velocities are given as components.
+
+        :param x_coords: An array of the x-coordinates of the particles top-left
+            corners.
+        :param y_coords: An array of the y-coordinates of the particles top-left
+            corners.
+        :param vx: The horizontal velocity (in pixels per step) of every particle, as
+            an array or a single value.
+        :param vy: The vertical velocity (in pixels per step, pointing down) of every
+            particle, as an array or a single value.
+        :param elasticity: The elasticity of every particle, as an array or a single
+            value.
+        :param lifetime: The lifetime (in seconds) of every particle, as an array or
+            a single value. Zero for particles that do not expire.
+        :param born: The time (in ns) the particles were created. Defaults to now.
+        :returns: An array of the indices of the new particles.
+        """
+        count = len(x_coords)
+        indices = np.empty(count, dtype=np.intp)
+        # Reuse the free slots first, in the same order `add` would
+        reused = min(count, len(self.free))
+        if reused:
+            indices[:reused] = self.free[: -reused - 1 : -1]
+            del self.free[-reused:]
+        new = count - reused
+        while self.count + new > self.capacity:
+            self._grow()
+        indices[reused:] = np.arange(self.count, self.count + new)
+        self.count += new
+
+        self.x[indices] = self.prev_x[indices] = x_coords
+        self.y[indices] = self.prev_y[indices] = y_coords
+        self.vx[indices] = vx
+        self.vy[indices] = vy
+        self.elasticity[indices] = elasticity
+        self.lifetime[indices] = lifetime
+        self.born[indices] = time_ns() if born is None else born
+        self.alive[indices] = True
+        self.asleep[indices] = False
+        self.still[indices] = 0
+
+        expiring = indices[self.lifetime[indices] != 0]
+        if expiring.shape[0]:
+            deadlines = self.born[expiring] + (
+                self.lifetime[expiring] * 1000 * 1000 * 1000
+            ).astype(np.int64)
+            self.expiry.schedule_many(expiring.tolist(), deadlines.tolist())
+            if len(self.expiry) > 2 * len(self) + 64:
+                self.reschedule()
+
+        return indices
+
+    def remove(self, index):
+        """
+        Mark a particle as dead, and free its slot for reuse.
+
+        :param index: The index of the particle to remove.
+        """
+        if self.alive[index]:
+            self.alive[index] = False
+            self.asleep[index] = False
+            self.free.append(index)
+
+    def remove_newest(self):
+        """
+        Remove the most recently born particle, if any.
+
+        :returns: The index of the removed particle, or `None` if there are none.
+        """
+        if len(self) == 0:
+            return None
+
+        select = self._select()
+        born = np.where(self.alive[select], self.born[select], np.iinfo(np.int64).min)
+        # Latest birth time, and the highest index amongst equally old particles
+        index = self.count - 1 - int(np.argmax(born[::-1]))
+        self.remove(index)
+
+        return index
+
+    def clear(self):
+        """Remove every particle, keeping the allocated slots."""
+        self.alive[: self.count] = False
+        self.asleep[: self.count] = False
+        self.count = 0
+        self.free = []
+        self.expiry.clear()
+
+    def state(self):
+        """
+        :returns: A structured array (of type `STATE`) with the state of every
+            alive particle, in slot order.
+        """
+        indices = self.indices()
+        state = np.empty(indices.shape[0], dtype=STATE)
+        for name in STATE.names:
+            state[name] = getattr(self, name)[indices]
+
+        return state
+
+    def restore(self, state, gravity=None):
+        """
+        Replace every particle with the ones of a saved state. The particles are
+        packed into the first slots, so their indices may differ from when the
+        state was saved.
+
+        :param state: A structured array of type `STATE`, as returned by `state`.
+        :param gravity: The gravity magnitude the particles were last stepped with,
+            so that particles asleep stay asleep. `None` wakes them on the next step.
+        """
+        self.clear()
+        count = state.shape[0]
+        while self.capacity < count:
+            self._grow()
+
+        select = slice(0, count)
+        for name in STATE.names:
+            getattr(self, name)[select] = state[name]
+        self.prev_x[select] = state["x"]
+        self.prev_y[select] = state["y"]
+        self.alive[select] = True
+        self.count = count
+        self.gravity = gravity
+        self.reschedule()
+
+    def apply_gravity(self, gravity, index=None):
+        """
+        Applies a gravity vector to the particles. This is the batched equivalent of
+        `Sprite.apply_gravity`.
+
+        :param gravity: The magnitude of the gravity vector.
+        :param index: The index of a single particle, or `None` for all of them.
+        """
+        select = self._select(index)
+        apply_gravity(
+            self.x[select], self.y[select], self.vx[select], self.vy[select], gravity
+        )
+
+    def bounce(self, index=None):
+        """
+        Handle the bouncing logic for particles colliding with any screen edges.
+        This is the batched equivalent of `Tennis_Ball.bounce`.
+
+        :param index: The index of a single particle, or `None` for all of them.
+        """
+        select = self._select(index)
+        bounce(
+            self.x[select],
+            self.y[select],
+            self.vx[select],
+            self.vy[select],
+            self.elasticity[select],
+            self.height,
+        )
+
+    def collide(self, first, second):
+        """
+        Apply the collision response between pairs of particles (e.g. the pairs
+        found by `Spatial_Hash.pairs`). The first particle of each pair takes the
+        sum of both velocities, scaled down by their elasticity, and the second one
+        is sent in the opposite direction.
+
+        Like `pygame.sprite.spritecollideany`, a particle only responds to the first
+        pair it takes part in.
+
+        A particle asleep is woken if the other particle of the pair is moving.
+        Otherwise the pair is ignored, and the particle stays asleep.
+
+        :param first: The indices of the first particle of each pair.
+        :param second: The indices of the second particle of each pair.
+        """
+        if self.sleeping():
+            # A particle asleep is only woken by a moving one, and otherwise the
+            # pair is left alone
+            threshold = SLEEP_SPEED * (self.gravity or 0)
+            moving_1 = np.hypot(self.vx[first], self.vy[first]) >= threshold
+            moving_2 = np.hypot(self.vx[second], self.vy[second]) >= threshold
+            asleep_1 = self.asleep[first]
+            asleep_2 = self.asleep[second]
+            self.wake(first[asleep_1 & moving_2])
+            self.wake(second[asleep_2 & moving_1])
+            keep = ~(asleep_1 & ~moving_2) & ~(asleep_2 & ~moving_1)
+            (first, second) = (first[keep], second[keep])
+
+        (_, keep) = np.unique(first, return_index=True)
+        (first, second) = (first[keep], second[keep])
+        (_, keep) = np.unique(second, return_index=True)
+        (first, second) = (first[keep], second[keep])
+        keep = ~np.isin(second, first)
+        (first, second) = (first[keep], second[keep])
+        if first.shape[0] == 0:
+            return
+
+        elasticity_1 = self.elasticity[first]
+        elasticity_2 = self.elasticity[second]
+        vx = self.vx[first] * elasticity_1 + self.vx[second] * elasticity_2
+        vy = self.vy[first] * elasticity_1 + self.vy[second] * elasticity_2
+        self.vx[first] = vx
+        self.vy[first] = vy
+
+        # Explosion !!\*o*/!!
+        # The second particle keeps its (damped) speed, in the direction of the sum
+        # mirrored horizontally. A sum of zero sends it to the left.
+        total = np.hypot(vx, vy)
+        still = total == 0
+        scale = np.hypot(self.vx[second], self.vy[second]) * elasticity_2
+        scale /= np.where(still, 1, total)
+        self.vx[second] = np.where(still, -1, -vx) * scale
+        self.vy[second] = np.where(still, 0, vy) * scale
+
+    def collide_rect(self, rect, angle, speed, offsets=None):
+        """
+        Apply the collision response between the particles and a rectangle (e.g.
+        the player). Overlapping particles have the rectangle's velocity added to
+        their own.
+
+        :param rect: The `pygame.Rect` (or x, y, width, height tuple) to collide
+            with.
+        :param angle: The angle (in radians) the rectangle is moving towards.
+        :param speed: The speed of the rectangle.
+        :param offsets: The offsets at which a particle hits the image drawn in the
+            rectangle (see `libraries.Masks.hit_offsets`), for pixel-accurate
+            collisions. `None` to collide with the whole rectangle.
+        """
+        (rect_x, rect_y, rect_width, rect_height) = rect
+        select = self._select()
+        hit = np.flatnonzero(
+            self.alive[select]
+            & (self.x[select] < rect_x + rect_width)
+            & (rect_x < self.x[select] + self.width)
+            & (self.y[select] < rect_y + rect_height)
+            & (rect_y < self.y[select] + self.height)
+        )
+        if hit.shape[0] != 0 and offsets is not None:
+            # Only the particles overlapping the rectangle are tested pixel by pixel,
+            # at the pixel they are drawn at
+            column = np.floor(self.x[hit]).astype(np.intp)
+            column += self.width - 1 - rect_x
+            row = np.floor(self.y[hit]).astype(np.intp)
+            row += self.height - 1 - rect_y
+            inside = (
+                (column >= 0)
+                & (column < offsets.shape[0])
+                & (row >= 0)
+                & (row < offsets.shape[1])
+            )
+            hit = hit[inside]
+            hit = hit[offsets[column[inside], row[inside]]]
+        if hit.shape[0] == 0:
+            return
+
+        self.wake(hit)
+        (vx, vy) = to_cartesian(angle, speed)
+        self.vx[hit] += vx
+        self.vy[hit] += vy
+
+    def step(self, gravity):
+        """
+        Advance every particle that is awake by one frame (gravity, drag and wall
+        bounces), and put the ones that have come to rest to sleep.
+
+        :param gravity: The magnitude of the gravity vector.
+        """
+        if gravity != self.gravity:
+            self.wake()
+            self.gravity = gravity
+
+        if not self.sleeping():
+            select = self._select()
+            self.prev_x[select] = self.x[select]
+            self.prev_y[select] = self.y[select]
+            self.apply_gravity(gravity)
+            self.bounce()
+            self.settle(gravity)
+            return
+
+        # Only gather, step and scatter back the particles that are awake
+        select = self.awake()
+        if select.shape[0] == 0:
+            return
+        x = self.prev_x[select] = self.x[select]
+        y = self.prev_y[select] = self.y[select]
+        vx = self.vx[select]
+        vy = self.vy[select]
+        apply_gravity(x, y, vx, vy, gravity)
+        bounce(x, y, vx, vy, self.elasticity[select], self.height)
+        self.x[select] = x
+        self.y[select] = y
+        self.vx[select] = vx
+        self.vy[select] = vy
+        self.settle(gravity, select)
+
+    def settle(self, gravity, select=None):
+        """
+        Count how many steps in a row every particle has been slower than
+        `SLEEP_SPEED`, and put the ones that have been for `SLEEP_FRAMES` to sleep.
+
+        :param gravity: The magnitude of the gravity vector.
+        :param select: The indices of the particles to check, or `None` for all of
+            them.
+        """
+        if select is None:
+            select = self._select()
+
+        slow = np.hypot(self.vx[select], self.vy[select]) < SLEEP_SPEED * gravity
+        still = np.where(slow, self.still[select] + 1, 0)
+        np.minimum(still, SLEEP_FRAMES, out=still)
+        self.still[select] = still
+
+        tired = still >= SLEEP_FRAMES
+        tired &= self.alive[select]
+        if not tired.any():
+            return
+
+        if isinstance(select, slice):
+            select = np.arange(select.start, select.stop)
+        tired = select[tired]
+        self.asleep[tired] = True
+        self.vx[tired] = 0
+        self.vy[tired] = 0
+        self.prev_x[tired] = self.x[tired]
+        self.prev_y[tired] = self.y[tired]
+
+    def wake(self, indices=None):
+        """
+        Wake particles up, so that they are stepped again.
+
+        :param indices: The indices of the particles to wake, or `None` for all of
+            them.
+        """
+        if indices is None:
+            indices = self._select()
+        self.asleep[indices] = False
+        self.still[indices] = 0
+
+    def interpolate(self, alpha):
+        """
+        Calculate the position of every particle part-way between the last two
+        steps, for drawing in between physics steps.
+
+        :param alpha: How far (as a float between 0 and 1) to interpolate between
+            the previous position and the current one.
+        :returns: A tuple of the x and y coordinate arrays.
+        """
+        select = self._select()
+        x = self.prev_x[select] + (self.x[select] - self.prev_x[select]) * alpha
+        y = self.prev_y[select] + (self.y[select] - self.prev_y[select]) * alpha
+
+        return (x, y)
+
+    def is_alive(self, index, now=None):
+        """
+        Calculates if a particle should still be rendered or not.
+
+        :param index: The index of the particle.
+        :param now: The current time in ns. Defaults to now.
+        :returns: False if the particle has been removed, or if its lifetime is
+            non-zero and has elapsed. True otherwise.
+        """
+        if not self.alive[index]:
+            return False
+        if self.lifetime[index] == 0:
+            return True
+
+        now = time_ns() if now is None else now
+        return (now - self.born[index]) < (self.lifetime[index] * 1000 * 1000 * 1000)
+
+    def deadline(self, index):
+        """
+        :param index: The index of the particle.
+        :returns: The time (in ns) the particle expires at, or `None` if it has
+            been removed or does not expire.
+        """
+        if not self.alive[index] or self.lifetime[index] == 0:
+            return None
+
+        return int(self.born[index]) + int(self.lifetime[index] * 1000 * 1000 * 1000)
+
+    def schedule(self, index):
+        """
+        Schedule a particle to expire at its current deadline. Needs to be called
+        whenever the lifetime or "born" time of a single particle changes.
+
+        :param index: The index of the particle.
+        """
+        deadline = self.deadline(index)
+        if deadline is None:
+            return
+
+        # Stale entries pile up as particles are removed or rescheduled
+        if len(self.expiry) > 2 * len(self) + 64:
+            self.reschedule()
+        else:
+            self.expiry.schedule(index, deadline)
+
+    def reschedule(self):
+        """
+        Schedule every particle to expire at its current deadline, discarding any
+        previously scheduled deadlines.
+        """
+        select = self._select()
+        lifetime = self.lifetime[select]
+        indices = np.flatnonzero(self.alive[select] & (lifetime != 0))
+        deadlines = self.born[indices] + (
+            lifetime[indices] * 1000 * 1000 * 1000
+        ).astype(np.int64)
+        self.expiry.rebuild(indices.tolist(), deadlines.tolist())
+
+    def expire(self, now=None):
+        """
+        Remove every particle whose lifetime has elapsed. Only the particles due to
+        expire are looked at.
+
+        :param now: The current time in ns. Defaults to now.
+        :returns: The indices of the particles that expired.
+        """
+        now = time_ns() if now is None else now
+        expired = self.expiry.pop_expired(now, self.deadline)
+        for index in expired:
+            self.remove(index)
+
+        return np.array(expired, dtype=np.intp)
+
+    def set_elasticity(self, elasticity):
+        """
+        Update the elasticity of every particle.
+
+        :param elasticity: The new elasticity.
+        """
+        self.elasticity[: self.count] = elasticity
+        self.wake()
+
+    def set_lifetime(self, lifetime, now=None):
+        """
+        Update the lifetime of every particle, and sets their "born" time to the
+        time the lifetime was updated.
+
+        :param lifetime: The new lifetime in seconds.
+        :param now: The current time in ns. Defaults to now.
+        """
+        self.lifetime[: self.count] = lifetime
+        self.born[: self.count] = time_ns() if now is None else now
+        self.reschedule()
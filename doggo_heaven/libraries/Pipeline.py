@@ -0,0 +1,91 @@
+"""
+Author: Marios Yiannakou
+
+Double-buffered frame state, for drawing one frame while the physics of the next
+one runs on another thread.
+
+A `Frame_State` is a read-only copy of everything drawn that the physics changes:
+the (interpolated) positions of the alive tennis balls, how many of them are
+asleep, and the player's image, position and hitbox. The pipelined game loop (see
+`main.Doggo_Heaven`) keeps two of them. The front one is drawn by the main thread,
+while the physics thread steps the world and fills the back one at the end of its
+frame. The two are swapped once both threads are done, so neither thread ever reads
+what the other one is writing.
+
+A `Frame_State` is drawn the same way as a `Particle_System` (see
+`Renderer.draw_particles`).
+"""
+import numpy as np
+import pygame
+
+
+class Frame_State:
+    """
+    Represents the state of the game drawn on a frame.
+
+    :param width: The width of a tennis ball.
+    :param height: The height of a tennis ball.
+    """
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        # Positions of the alive tennis balls, in the first `count` elements
+        self.x = np.empty(0)
+        self.y = np.empty(0)
+        self.count = 0
+        self.asleep = 0
+        self.player_image = None
+        self.player_rect = pygame.Rect(0, 0, 0, 0)
+        self.player_hitbox = [0, 0, 0, 0]
+
+    def __len__(self):
+        """
+        :returns: The number of tennis balls alive.
+        """
+        return self.count
+
+    def fill(self, world):
+        """
+        Copy the state of a world, with the tennis balls interpolated between its
+        last two physics steps.
+
+        :param world: The `World` to copy.
+        """
+        particles = world.particles
+        alive = particles.indices()
+        count = alive.shape[0]
+        if count > self.x.shape[0]:
+            # Grow geometrically, so that spawning does not reallocate every frame
+            self.x = np.empty(max(count, 2 * self.x.shape[0]))
+            self.y = np.empty(self.x.shape[0])
+
+        (x, y) = particles.interpolate(world.timestep.alpha)
+        np.take(x, alive, out=self.x[:count])
+        np.take(y, alive, out=self.y[:count])
+        self.count = count
+        self.asleep = particles.sleeping()
+
+        player = world.player
+        self.player_image = player.image
+        self.player_rect = pygame.Rect(player.rect)
+        self.player_hitbox = list(player.hitbox)
+
+    def indices(self):
+        """
+        :returns: An array of the indices of every alive tennis ball.
+        """
+        return np.arange(self.count)
+
+    def sleeping(self):
+        """
+        :returns: The number of tennis balls asleep.
+        """
+        return self.asleep
+
+    def interpolate(self, alpha):
+        """
+        :param alpha: Ignored, as the positions were interpolated when copied.
+        :returns: A tuple of the x and y coordinate arrays.
+        """
+        return (self.x[: self.count], self.y[: self.count])
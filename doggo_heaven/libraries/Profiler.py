@@ -0,0 +1,212 @@
+"""
+Author: Marios Yiannakou
+
+A frame profiler, measuring how long each phase of a frame takes.
+
+The game loop marks the end of each phase (e.g. polling events, stepping the
+physics, drawing the HUD) with `lap`, and the time since the previous lap is added
+to that phase. Every frame's timings are kept in a fixed-size ring buffer, drawn as
+a stacked bar chart over the game, and can be streamed to a CSV file for analysis.
+
+While disabled, `frame` and `lap` return straight away, so leaving the calls in the
+game loop costs next to nothing.
+"""
+import csv
+import numpy as np
+import pygame
+
+from libraries import colors
+from libraries.globals import *
+from libraries.HUD import HUD
+from time import perf_counter_ns
+
+# The phases of a frame, in the order they are drawn in the overlay (bottom up)
+PHASES = (
+    "wait",
+    "events",
+    "player",
+    "physics",
+    "collisions",
+    "background",
+    "draw",
+    "hud",
+    "flip",
+    "capture",
+)
+PHASE_COLORS = (
+    (160, 160, 160),
+    colors.BLUE,
+    colors.PURPLE,
+    colors.GREEN,
+    colors.RED,
+    colors.BROWN,
+    colors.SKY,
+    colors.YELLOW,
+    colors.TURQUOISE,
+    colors.DARK_BROWN,
+)
+
+
+class Frame_Profiler:
+    """
+    Represents a per-phase frame profiler.
+
+    Call `frame` at the start of every frame, and `lap` at the end of every phase.
+    A phase can be lapped more than once per frame (e.g. once per physics step), in
+    which case its timings are added up.
+
+    :param font: The `pygame.font.Font` to draw the overlay's legend with.
+    :param frames: The number of frames kept in the ring buffer (and drawn).
+    :param position: The (x, y) position of the top-left corner of the overlay.
+    :param height: The height (in pixels) of the overlay's bar chart.
+    :param budget_ms: The frame time (in ms) marked by a line on the bar chart.
+    """
+
+    def __init__(
+        self,
+        font,
+        frames=PROFILER_FRAMES,
+        position=(WINDOW_WIDTH - PROFILER_FRAMES - 160, 5),
+        height=100,
+        budget_ms=1000 / GOLDEN_FPS,
+    ):
+        self.enabled = False
+        self.position = position
+        self.height = height
+        self.budget_ms = budget_ms
+        self.phases = {phase: column for column, phase in enumerate(PHASES)}
+
+        # Ring buffer of the timings (in ns) of the last `frames` frames, one phase
+        # per column. `count` is the number of frames recorded so far.
+        self.timings = np.zeros((frames, len(PHASES)), dtype=np.int64)
+        self.count = 0
+        self.current = [0] * len(PHASES)
+        self.last = None
+
+        self.csv_file = None
+        self.csv_writer = None
+
+        self.legend = HUD(font, colors.BLACK, (position[0] + frames + 20, position[1]))
+        self.legend.set("title", "Frame (avg. ms)")
+        for line in ("total", *PHASES):
+            self.legend.set(line, line)
+            self.legend.throttle(line, HUD_FPS_UPDATES)
+        self.chart = pygame.Surface((frames, height))
+
+    @property
+    def frames(self):
+        """
+        :returns: The number of frames kept in the ring buffer.
+        """
+        return self.timings.shape[0]
+
+    def toggle(self):
+        """Enable or disable the profiler. Disabling it also stops any CSV file."""
+        self.enabled = not self.enabled
+        self.last = None
+        if not self.enabled:
+            self.stop_csv()
+
+    def frame(self):
+        """
+        Start a new frame, recording the timings of the previous one.
+        """
+        if not self.enabled:
+            return
+
+        if self.last is not None:
+            self.timings[self.count % self.frames] = self.current
+            if self.csv_writer is not None:
+                self.csv_writer.writerow((self.count, sum(self.current), *self.current))
+            self.count += 1
+        self.current = [0] * len(PHASES)
+        self.last = perf_counter_ns()
+
+    def lap(self, phase):
+        """
+        Add the time since the previous lap (or the start of the frame) to a phase.
+
+        :param phase: The name of the phase (one of `PHASES`) that just ended.
+        """
+        if self.last is None:
+            return
+
+        now = perf_counter_ns()
+        self.current[self.phases[phase]] += now - self.last
+        self.last = now
+
+    def recent(self):
+        """
+        :returns: An array of the timings (in ns) of the recorded frames, oldest
+            first, with one row per frame and one column per phase.
+        """
+        if self.count < self.frames:
+            return self.timings[: self.count]
+
+        return np.roll(self.timings, -(self.count % self.frames), axis=0)
+
+    def start_csv(self, path=PROFILER_CSV):
+        """
+        Stream the timings of every frame from now on to a CSV file, one row per
+        frame, with the total and per-phase timings in ns.
+
+        :param path: The path of the CSV file. Overwritten if it exists.
+        """
+        self.stop_csv()
+        self.csv_file = open(path, "w", newline="")
+        self.csv_writer = csv.writer(self.csv_file)
+        self.csv_writer.writerow(
+            ("frame", "total_ns", *(f"{phase}_ns" for phase in PHASES))
+        )
+
+    def stop_csv(self):
+        """Stop streaming to, and close, the CSV file (if any)."""
+        if self.csv_file is not None:
+            self.csv_file.close()
+        self.csv_file = None
+        self.csv_writer = None
+
+    def draw(self, window):
+        """
+        Draw the overlay: a stacked bar per recorded frame, and a legend with the
+        average timing of each phase.
+
+        :param window: The surface to draw the overlay on.
+        :returns: A list of the rectangles drawn to.
+        """
+        timings = self.recent()
+        # Pixels per ns, so that twice the budget fills the chart
+        scale = self.height / (2 * self.budget_ms * 1000 * 1000)
+        tops = np.cumsum(timings, axis=1) * scale
+
+        # The phase drawn at every pixel of every bar (one past the last for none),
+        # counting pixel rows from the bottom of the chart
+        rows = np.arange(self.height)
+        phase = (rows[None, :, None] >= tops[:, None, :]).sum(axis=2)
+        palette = np.array((*PHASE_COLORS, colors.WHITE), dtype=np.uint8)
+        pixels = np.full((self.frames, self.height, 3), 255, dtype=np.uint8)
+        pixels[self.frames - timings.shape[0] :] = palette[phase]
+        # Mark the frame budget
+        budget = int(self.budget_ms * 1000 * 1000 * scale)
+        pixels[:, min(budget, self.height - 1)] = colors.BLACK
+        pygame.surfarray.blit_array(self.chart, pixels[:, ::-1])
+
+        rects = [window.blit(self.chart, self.position)]
+
+        if timings.shape[0]:
+            average = timings.mean(axis=0) / (1000 * 1000)
+            self.legend.set("total", f"total {average.sum():6.2f}")
+            for column, phase in enumerate(PHASES):
+                self.legend.set(phase, f"{phase} {average[column]:6.2f}")
+        rects.extend(self.legend.draw(window))
+
+        # Color key next to every phase of the legend
+        (start_x, start_y) = self.legend.position
+        for column, color in enumerate(PHASE_COLORS):
+            # The title and total lines come first
+            line_y = start_y + (column + 2) * self.legend.line_height
+            rects.append(
+                pygame.draw.rect(window, color, (start_x - 12, line_y + 2, 8, 8))
+            )
+
+        return rects
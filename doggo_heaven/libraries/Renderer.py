@@ -0,0 +1,329 @@
+"""
+Author: Marios Yiannakou
+
+Draws the game world to the window.
+
+Every tennis ball is drawn with a single batched `Surface.blits` call straight from
+the positions held by a `Particle_System`, rather than one blit per sprite.
+
+In dirty rectangle mode, rather than redrawing the whole background and flipping
+the whole screen each frame, only the background under whatever was drawn on the
+previous frame is restored, and only the areas drawn to on either frame are
+updated on screen. This is much cheaper when most of the screen is static.
+
+Tennis balls are left on screen from one frame to the next: only the ones that
+moved (or disappeared) have the background restored under where they were, and
+only the ones that moved are drawn again. Balls that stayed are only drawn again
+inside the areas the background was restored over (see `damaged`), so a settled
+pile of balls costs next to nothing to draw.
+"""
+import numpy as np
+import pygame
+
+from itertools import repeat
+
+
+def subtract(rect, other):
+    """
+    :param rect: A `pygame.Rect`.
+    :param other: The `pygame.Rect` to cut out of it.
+    :returns: A list of up to 4 non-overlapping `pygame.Rect`s covering the part of
+        `rect` outside of `other`.
+    """
+    if not rect.colliderect(other):
+        return [rect]
+
+    parts = []
+    if other.top > rect.top:
+        parts.append(pygame.Rect(rect.left, rect.top, rect.width, other.top - rect.top))
+    if other.bottom < rect.bottom:
+        parts.append(
+            pygame.Rect(rect.left, other.bottom, rect.width, rect.bottom - other.bottom)
+        )
+    top = max(rect.top, other.top)
+    height = min(rect.bottom, other.bottom) - top
+    if other.left > rect.left:
+        parts.append(pygame.Rect(rect.left, top, other.left - rect.left, height))
+    if other.right < rect.right:
+        parts.append(pygame.Rect(other.right, top, rect.right - other.right, height))
+
+    return parts
+
+
+def damaged(rects, x, y, width, height, size):
+    """
+    Find the particles that overlap any of a set of rectangles, to within a tile
+    the size of a particle.
+
+    :param rects: A (count, 4) array of the (x, y, width, height) of the
+        rectangles.
+    :param x: The x-coordinates (in pixels) of the particles.
+    :param y: The y-coordinates (in pixels) of the particles.
+    :param width: The width of every particle.
+    :param height: The height of every particle.
+    :param size: The (width, height) of the window.
+    :returns: A boolean array, True for every particle that may overlap one of
+        the rectangles.
+    """
+    if rects.shape[0] == 0 or x.shape[0] == 0:
+        return np.zeros(x.shape[0], dtype=bool)
+
+    # A particle is never larger than a tile, so it covers at most 2x2 tiles
+    tile = max(width, height)
+    columns = size[0] // tile + 1
+    rows = size[1] // tile + 1
+    left = np.clip(rects[:, 0] // tile, 0, columns - 1)
+    right = np.clip((rects[:, 0] + rects[:, 2] - 1) // tile, 0, columns - 1)
+    top = np.clip(rects[:, 1] // tile, 0, rows - 1)
+    bottom = np.clip((rects[:, 1] + rects[:, 3] - 1) // tile, 0, rows - 1)
+    # Mark the tiles under every rectangle, through 2D prefix sums
+    counts = np.zeros((rows + 1, columns + 1), dtype=np.int32)
+    np.add.at(counts, (top, left), 1)
+    np.add.at(counts, (top, right + 1), -1)
+    np.add.at(counts, (bottom + 1, left), -1)
+    np.add.at(counts, (bottom + 1, right + 1), 1)
+    covered = counts.cumsum(axis=0).cumsum(axis=1) > 0
+
+    left = np.clip(x // tile, 0, columns - 1)
+    right = np.clip((x + width - 1) // tile, 0, columns - 1)
+    top = np.clip(y // tile, 0, rows - 1)
+    bottom = np.clip((y + height - 1) // tile, 0, rows - 1)
+
+    return (
+        covered[top, left]
+        | covered[top, right]
+        | covered[bottom, left]
+        | covered[bottom, right]
+    )
+
+
+class Renderer:
+    """
+    Represents a renderer drawing to the game window.
+
+    Call `begin` at the start of every frame, draw with `draw`, `draw_particles` and
+    `mark`, and call `end` to show the frame.
+
+    :param window: The window surface to draw to.
+    :param background: The background surface, drawn under everything else.
+    :param dirty: True to only redraw and update the areas of the screen that have
+        changed (dirty rectangles). False to redraw and flip the whole screen.
+    """
+
+    def __init__(self, window, background, dirty=False):
+        self.window = window
+        self._background = background
+        self._dirty = dirty
+        # Areas drawn to on the previous and current frame, and the areas only
+        # updated on screen this frame (e.g. tennis balls drawn again in place)
+        self.previous_rects = []
+        self.rects = []
+        self.updates = []
+        # Areas the background was restored over this frame
+        self.restored = []
+        # Whether every particle slot was on screen after the last frame, and where
+        self.shown = np.zeros(0, dtype=bool)
+        self.shown_x = np.zeros(0, dtype=int)
+        self.shown_y = np.zeros(0, dtype=int)
+        # Redraw the whole screen on the first frame
+        self.full_redraw = True
+
+    @property
+    def background(self):
+        return self._background
+
+    @background.setter
+    def background(self, background):
+        self._background = background
+        self.full_redraw = True
+
+    @property
+    def dirty(self):
+        return self._dirty
+
+    @dirty.setter
+    def dirty(self, dirty):
+        self._dirty = dirty
+        self.full_redraw = True
+
+    def begin(self):
+        """Clear the window for a new frame."""
+        if not self._dirty or self.full_redraw:
+            self.window.blit(self._background, (0, 0))
+            self.restored = []
+        else:
+            # Restore the background under everything drawn on the last frame
+            self.window.blits(
+                [(self._background, rect, rect) for rect in self.previous_rects],
+                doreturn=False,
+            )
+            self.restored = self.previous_rects
+        self.rects = []
+        self.updates = []
+
+    def mark(self, rects):
+        """
+        Mark areas of the window as drawn to this frame (e.g. by the HUD or by
+        `pygame.draw`), so that they are updated in dirty rectangle mode.
+
+        :param rects: A list of `pygame.Rect`s.
+        """
+        if self._dirty:
+            self.rects.extend(rects)
+
+    def draw(self, image, position):
+        """
+        Draw a single surface.
+
+        :param image: The surface to draw.
+        :param position: The (x, y) position, or `pygame.Rect`, to draw it at.
+        """
+        rect = self.window.blit(image, position)
+        if self._dirty:
+            self.rects.append(rect)
+
+    def draw_particles(self, image, particles, alpha=1.0, stride=1):
+        """
+        Draw every alive particle of a `Particle_System` with a single batched blit.
+
+        :param image: The surface to draw for every particle.
+        :param particles: The `Particle_System` to draw.
+        :param alpha: How far to interpolate between the previous and current
+            position of every particle (see `Particle_System.interpolate`).
+        :param stride: Only draw one in every `stride` particles.
+        """
+        (x, y) = particles.interpolate(alpha)
+        alive = particles.indices()[::stride]
+        column = x[alive].astype(int)
+        row = y[alive].astype(int)
+        if not self._dirty or self.full_redraw:
+            positions = np.stack((column, row), axis=1).tolist()
+            self.window.blits(zip(repeat(image), positions), doreturn=False)
+            if self._dirty:
+                self._show(alive, column, row)
+            return
+
+        (width, height) = image.get_size()
+        size = alive[-1] + 1 if alive.shape[0] else 0
+        self._grow_shown(size)
+        still = (
+            self.shown[alive]
+            & (self.shown_x[alive] == column)
+            & (self.shown_y[alive] == row)
+        )
+        # Restore the background where the balls that moved or went were shown
+        kept = np.zeros(self.shown.shape[0], dtype=bool)
+        kept[alive[still]] = True
+        gone = np.flatnonzero(self.shown & ~kept)
+        gone_rects = np.stack(
+            (
+                self.shown_x[gone],
+                self.shown_y[gone],
+                np.full(gone.shape[0], width),
+                np.full(gone.shape[0], height),
+            ),
+            axis=1,
+        ).tolist()
+        self.window.blits(
+            [(self._background, rect[:2], rect) for rect in gone_rects],
+            doreturn=False,
+        )
+        self.updates.extend(gone_rects)
+
+        # Draw the balls that stayed again, but only where the background was
+        # restored over them, so that no pixel is blended twice
+        restored = [pygame.Rect(rect) for rect in self.restored]
+        restored.extend(pygame.Rect(rect) for rect in gone_rects)
+        rects = np.array([tuple(rect) for rect in restored], dtype=int)
+        near = np.flatnonzero(still)
+        near = near[
+            damaged(
+                rects.reshape(-1, 4),
+                column[near],
+                row[near],
+                width,
+                height,
+                self.window.get_size(),
+            )
+        ]
+        blits = []
+        for index in near.tolist():
+            ball = pygame.Rect(int(column[index]), int(row[index]), width, height)
+            # The parts of the ball restored over, without overlaps
+            areas = []
+            for overlap in ball.collidelistall(restored):
+                parts = [ball.clip(restored[overlap])]
+                for area in areas:
+                    parts = [piece for part in parts for piece in subtract(part, area)]
+                areas.extend(parts)
+            for area in areas:
+                blits.append((image, area, area.move(-ball.x, -ball.y)))
+        self.window.blits(blits, doreturn=False)
+
+        # Draw the balls that moved
+        positions = np.stack((column[~still], row[~still]), axis=1).tolist()
+        self.updates.extend(self.window.blits(zip(repeat(image), positions)))
+        self._show(alive, column, row)
+
+    def _grow_shown(self, size):
+        """
+        Make room to track at least `size` particle slots.
+
+        :param size: The number of slots.
+        """
+        if size <= self.shown.shape[0]:
+            return
+        size = max(size, 2 * self.shown.shape[0])
+        extra = size - self.shown.shape[0]
+        self.shown = np.concatenate((self.shown, np.zeros(extra, dtype=bool)))
+        self.shown_x = np.concatenate((self.shown_x, np.zeros(extra, dtype=int)))
+        self.shown_y = np.concatenate((self.shown_y, np.zeros(extra, dtype=int)))
+
+    def _show(self, alive, column, row):
+        """
+        Remember which particle slots are on screen, and where.
+
+        :param alive: The indices of the particles drawn.
+        :param column: The x-coordinates they were drawn at.
+        :param row: The y-coordinates they were drawn at.
+        """
+        self._grow_shown(alive[-1] + 1 if alive.shape[0] else 0)
+        self.shown[:] = False
+        self.shown[alive] = True
+        self.shown_x[alive] = column
+        self.shown_y[alive] = row
+
+    def end(self):
+        """Finish the frame, and show it."""
+        self.finish()
+        self.show()
+
+    def finish(self):
+        """Nothing to do, as the frame is drawn straight onto the window."""
+
+    def show(self):
+        """Show the frame on screen."""
+        if not self._dirty or self.full_redraw:
+            pygame.display.flip()
+            self.full_redraw = False
+        else:
+            pygame.display.update(self.previous_rects + self.rects + self.updates)
+        self.previous_rects = self.rects
+
+    def read_pixels(self, out=None):
+        """
+        Read back the last frame finished.
+
+        :param out: A (height, width, 3) array to read the pixels into. Defaults to
+            a new array.
+        :returns: A (height, width, 3) array of the RGB pixels of the frame, top row
+            first (`out`).
+        """
+        # A view of the window's pixels, locking it until deleted
+        pixels = pygame.surfarray.pixels3d(self.window).transpose(1, 0, 2)
+        if out is None:
+            out = np.empty(pixels.shape, dtype=np.uint8)
+        np.copyto(out, pixels)
+        del pixels
+
+        return out
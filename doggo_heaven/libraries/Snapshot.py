@@ -0,0 +1,293 @@
+"""
+Author: Marios Yiannakou
+
+Compact binary snapshots of a game, and memory-mapped trajectory files.
+
+A snapshot holds everything needed to carry on a game from where it was saved: the
+state of every particle (see `Particles.STATE`), the player, the settings changed
+with the keyboard, the simulation clock and the state of the random number
+generator. The particle state is written as one raw array, so saving and restoring
+tens of thousands of particles is a single copy either way, rather than pickling a
+sprite per tennis ball.
+
+A trajectory file holds the positions and velocities of the particles on every Nth
+frame of a run. Frames are appended as the game runs, and read back through a
+memory map, so a long run can be analysed one frame at a time without loading the
+whole file.
+
+Snapshot format (little-endian):
+    - `SNAPSHOT_MAGIC`, `HEADER`, the generator state (`RNG`)
+    - The state of every particle, as an array of `Particles.STATE`
+
+Trajectory format (little-endian):
+    - `TRAJECTORY_MAGIC`, the number of frames between recorded frames (uint32)
+    - Per recorded frame: `FRAME_HEADER` (frame number, simulation time in ns and
+      number of particles), followed by an array of `TRAJECTORY`
+"""
+import numpy as np
+import struct
+
+from libraries import colors
+from libraries.globals import *
+from libraries.Particles import STATE
+
+SNAPSHOT_MAGIC = b"DOGGOSNAP1"
+# Simulation time, timestep accumulator, jump and drop start times (-1 for none)
+# (ns), gravity, elasticity, gravity the particles were last stepped with (NaN for
+# none), player angle, lifetime (s), player position, hitbox position (ignored when
+# loading, as the hitbox follows the player) and speed, FPS setting, player
+# direction, flags (see `FLAGS`) and number of particles
+HEADER = struct.Struct("<qqqqddddqiiiidHBBI")
+# The Mersenne Twister state of `random.Random`
+RNG = struct.Struct("<625I")
+# Bits of the flags in the header
+FLAGS = ("is_jumping", "is_dropping", "draw_hitboxes", "dirty_rendering")
+
+TRAJECTORY_MAGIC = b"DOGGOTRAJ1"
+FRAME_HEADER = struct.Struct("<QqI")
+# The per-particle data recorded on every trajectory frame
+TRAJECTORY = np.dtype(
+    [
+        ("index", "<i4"),
+        ("x", "<f4"),
+        ("y", "<f4"),
+        ("vx", "<f4"),
+        ("vy", "<f4"),
+    ]
+)
+
+
+def save_snapshot(world, path=SNAPSHOT_FILE):
+    """
+    Save the state of a game to a file.
+
+    :param world: The `World` to save.
+    :param path: The path of the file. Overwritten if it exists.
+    :returns: The number of bytes written.
+    """
+    player = world.player
+    particles = world.particles
+    state = particles.state()
+    flags = 0
+    for bit, name in enumerate(FLAGS):
+        if getattr(player if name.startswith("is_") else world, name):
+            flags |= 1 << bit
+
+    header = HEADER.pack(
+        world.sim_time,
+        world.timestep.accumulator,
+        -1 if world.time_jump is None else world.time_jump,
+        -1 if world.time_drop is None else world.time_drop,
+        world.gravity,
+        world.elasticity,
+        np.nan if particles.gravity is None else particles.gravity,
+        player.angle,
+        world.lifetime,
+        player.rect.x,
+        player.rect.y,
+        player.hitbox[0],
+        player.hitbox[1],
+        player.speed,
+        world.fps,
+        player.direction,
+        flags,
+        state.shape[0],
+    )
+    (_, rng, _) = world.rng.getstate()
+
+    with open(path, "wb") as file:
+        file.write(SNAPSHOT_MAGIC + header + RNG.pack(*rng))
+        file.write(state.tobytes())
+
+    return len(SNAPSHOT_MAGIC) + HEADER.size + RNG.size + state.nbytes
+
+
+def load_snapshot(world, path=SNAPSHOT_FILE):
+    """
+    Restore the state of a game, in-place, from a file written by `save_snapshot`.
+
+    The file is checked in full before anything is restored, so the world is left
+    as it was if it cannot be read.
+
+    :param world: The `World` to restore.
+    :param path: The path of the file.
+    :raises OSError: If the file cannot be read.
+    :raises ValueError: If the file is not a snapshot, or is truncated or corrupt.
+    """
+    with open(path, "rb") as file:
+        data = file.read()
+    if not data.startswith(SNAPSHOT_MAGIC):
+        raise ValueError(f"'{path}' is not a Doggo Heaven snapshot")
+
+    offset = len(SNAPSHOT_MAGIC)
+    if len(data) < offset + HEADER.size + RNG.size:
+        raise ValueError(f"'{path}' is truncated")
+    (
+        sim_time,
+        accumulator,
+        time_jump,
+        time_drop,
+        gravity,
+        elasticity,
+        stepped_gravity,
+        angle,
+        lifetime,
+        player_x,
+        player_y,
+        hitbox_x,
+        hitbox_y,
+        speed,
+        fps,
+        direction,
+        flags,
+        count,
+    ) = HEADER.unpack_from(data, offset)
+    offset += HEADER.size
+    rng = RNG.unpack_from(data, offset)
+    offset += RNG.size
+    if len(data) - offset != count * STATE.itemsize:
+        raise ValueError(f"'{path}' is truncated")
+    # Raises a ValueError (leaving the generator as it was) if the state is corrupt
+    world.rng.setstate((3, rng, None))
+
+    world.sim_time = sim_time
+    world.timestep.accumulator = accumulator
+    world.time_jump = None if time_jump < 0 else time_jump
+    world.time_drop = None if time_drop < 0 else time_drop
+    world.gravity = gravity
+    world.elasticity = elasticity
+    world.lifetime = lifetime
+    world.fps = fps
+    if gravity <= 0.6:
+        world.background = world.assets.get("bg_space.jpg")
+        world.font_color = colors.WHITE
+    else:
+        world.background = world.assets.get("bg.jpg")
+        world.font_color = colors.BLACK
+
+    player = world.player
+    player.reset(
+        world.player_images["right" if direction == RIGHT else "left"],
+        player_x,
+        player_y,
+        direction,
+    )
+    player.angle = angle
+    player.speed = speed
+    for bit, name in enumerate(FLAGS):
+        setattr(
+            player if name.startswith("is_") else world, name, bool(flags >> bit & 1)
+        )
+
+    world.particles.restore(
+        np.frombuffer(data, dtype=STATE, count=count, offset=offset),
+        None if np.isnan(stepped_gravity) else stepped_gravity,
+    )
+
+
+class Trajectory_Writer:
+    """
+    Represents a trajectory file being written to.
+
+    Call `record` once per frame; only every `every`th frame is written.
+
+    :param path: The path of the file. Overwritten if it exists.
+    :param every: The number of frames between recorded frames.
+    """
+
+    def __init__(self, path, every=TRAJECTORY_EVERY):
+        self.every = max(1, every)
+        self.frames = 0
+        self.file = open(path, "wb")
+        self.file.write(TRAJECTORY_MAGIC + struct.pack("<I", self.every))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def record(self, frame, sim_time, particles):
+        """
+        Append the particles of a frame to the file, if it is one to record.
+
+        :param frame: The number of the frame.
+        :param sim_time: The simulation time (in ns) of the frame.
+        :param particles: The `Particle_System` to record.
+        :returns: True if the frame was recorded, False otherwise.
+        """
+        if frame % self.every:
+            return False
+
+        indices = particles.indices()
+        record = np.empty(indices.shape[0], dtype=TRAJECTORY)
+        record["index"] = indices
+        for name in ("x", "y", "vx", "vy"):
+            record[name] = getattr(particles, name)[indices]
+
+        self.file.write(FRAME_HEADER.pack(frame, sim_time, record.shape[0]))
+        self.file.write(record.tobytes())
+        self.frames += 1
+
+        return True
+
+    def close(self):
+        """Flush and close the file."""
+        self.file.close()
+
+
+class Trajectory:
+    """
+    Represents a trajectory file being read, through a memory map. Only the frame
+    headers are read when opening it; the particles of a frame are read when it is
+    indexed.
+
+    :param path: The path of a file written by `Trajectory_Writer`.
+    """
+
+    def __init__(self, path):
+        self.data = np.memmap(path, dtype=np.uint8, mode="r")
+        if bytes(self.data[: len(TRAJECTORY_MAGIC)]) != TRAJECTORY_MAGIC:
+            raise ValueError(f"'{path}' is not a Doggo Heaven trajectory")
+
+        offset = len(TRAJECTORY_MAGIC)
+        (self.every,) = struct.unpack_from("<I", self.data, offset)
+        offset += 4
+
+        # Frame number, simulation time, and offset and size of the particles of
+        # every frame. A frame cut short (e.g. by a crash) is left out.
+        self.headers = []
+        while offset + FRAME_HEADER.size <= self.data.shape[0]:
+            (frame, sim_time, count) = FRAME_HEADER.unpack_from(self.data, offset)
+            offset += FRAME_HEADER.size
+            if offset + count * TRAJECTORY.itemsize > self.data.shape[0]:
+                break
+            self.headers.append((frame, sim_time, offset, count))
+            offset += count * TRAJECTORY.itemsize
+
+    def __len__(self):
+        """
+        :returns: The number of recorded frames.
+        """
+        return len(self.headers)
+
+    def __getitem__(self, position):
+        """
+        :param position: The position of the recorded frame (not its frame number).
+        :returns: A tuple of the frame number, the simulation time (in ns) and a
+            read-only structured array (of type `TRAJECTORY`) of its particles.
+        """
+        (frame, sim_time, offset, count) = self.headers[position]
+        particles = np.ndarray(count, dtype=TRAJECTORY, buffer=self.data, offset=offset)
+
+        return (frame, sim_time, particles)
+
+    def __iter__(self):
+        for position in range(len(self)):
+            yield self[position]
+
+    def frame_numbers(self):
+        """
+        :returns: An array of the frame number of every recorded frame.
+        """
+        return np.array([header[0] for header in self.headers], dtype=np.int64)
@@ -8,6 +8,7 @@ import pygame
 
 from libraries import colors
 from libraries.globals import *
+from libraries.Particles import Particle, Particle_System
 from math import cos, sin
 from time import time_ns
 
@@ -46,9 +47,6 @@ class Sprite(pygame.sprite.Sprite):
     angle = None
     speed = None
 
-    # Hitbox format: top_left_x, top_left_y, width, height
-    hitbox = None
-
     def __init__(
         self,
         image=None,
@@ -66,15 +64,43 @@ class Sprite(pygame.sprite.Sprite):
             self.image.fill(color)
         else:
             self.image = image
-        self.rect = self.image.get_rect()
-        self.rect.topleft = (x_coord, y_coord)
+        self.move_to(x_coord, y_coord)
         self.color = color if color else colors.WHITE
         self.width = width
         self.height = height
+        self.set_polar(angle, speed)
+
+    def move_to(self, x_coord, y_coord):
+        """
+        Move the sprite's top-left corner to a position.
+
+        :param x_coord: The x-coordinate of the images top-left corner.
+        :param y_coord: The y-coordinate of the images top-left corner.
+        """
+        rect = self.image.get_rect()
+        rect.topleft = (x_coord, y_coord)
+        self.rect = rect
+
+    def set_polar(self, angle, speed):
+        """
+        Set the angle and speed of the sprite at once.
+
+        :param angle: The angle (in radians) of the surface. 0 being up, math.pi
+            down.
+        :param speed: The speed of the surface.
+        """
         self.angle = angle
         self.speed = speed
 
-        self.hitbox = [x_coord - 5, y_coord - 5, width + 5, height + 5]
+    @property
+    def hitbox(self):
+        """
+        :returns: The hitbox drawn around the sprite, as a list of its top-left x
+            and y coordinates, width and height. Follows the sprite's rectangle.
+        """
+        rect = self.rect
+
+        return [rect.x - 5, rect.y - 5, self.width + 5, self.height + 5]
 
     def apply_gravity(self, gravity):
         """
@@ -85,9 +111,7 @@ class Sprite(pygame.sprite.Sprite):
         :param gravity: The magnitude of the gravity vector.
         :returns: The updated rectangle of the sprite after gravity has been applied.
         """
-        (self.angle, self.speed) = add_vectors(
-            self.angle, self.speed, GRAVITY_ANGLE, gravity
-        )
+        self.set_polar(*add_vectors(self.angle, self.speed, GRAVITY_ANGLE, gravity))
         self.rect.x += sin(self.angle) * self.speed
         self.rect.y -= cos(self.angle) * self.speed
         self.speed *= DRAG
@@ -95,7 +119,7 @@ class Sprite(pygame.sprite.Sprite):
         return self.rect
 
 
-class Tennis_Ball(Sprite):
+class Tennis_Ball(Particle, Sprite):
     """
     Represents a tennis ball sprite.
 
@@ -105,6 +129,15 @@ class Tennis_Ball(Sprite):
         - Collision capabilities with other particles (excluding background)
         - Lifetime
 
+    The ball's position, velocity, elasticity and lifetime are not stored on the
+    sprite itself, but in a slot of a `Particle_System` (see `Particle`). This allows
+    every ball in the store to be updated at once through `Particle_System.step`,
+    while the sprite keeps working as before (e.g. for `pygame.sprite.Group.draw`).
+
+    Unlike other sprites, the ball's `rect` is a read-only copy of its position in
+    the store: changing it in-place (e.g. `ball.rect.x += 5`) does not move the
+    ball. Use `move_to` instead.
+
     :param image: An image loaded using `pygame.image.load`, or `None` if drawing a
         simple, filled rectangle. This is effectively the sprites surface.
     :param width: The width of the surface (hitbox).
@@ -124,12 +157,13 @@ class Tennis_Ball(Sprite):
     :param lifetime: The amount of time (in seconds) the ball remains in the game.
         An integer greater than zero. If zero, the ball does not disappear
         (i.e. infinite liftime).
+    :param particles: The `Particle_System` to store the ball in. Its particle size
+        should match the `width` and `height` of the ball. If `None`, the ball is
+        given a store of its own.
+    :param born: The time (in ns) the ball was created, on the same clock later
+        passed to `alive`. Defaults to now.
     """
 
-    elasticity = None
-    born = None
-    lifetime = 0
-
     def __init__(
         self,
         image=None,
@@ -141,11 +175,52 @@ class Tennis_Ball(Sprite):
         speed=GRAVITY_MAGN,
         elasticity=0.8,
         lifetime=0,
+        particles=None,
+        born=None,
     ):
-        super().__init__(image, width, height, x_coord, y_coord, angle, speed)
-        self.elasticity = float(elasticity)
-        self.lifetime = lifetime
-        self.born = time_ns()
+        if particles is None:
+            particles = Particle_System(1, width, height)
+        self.particles = particles
+        self.index = particles.add(
+            x_coord, y_coord, angle, speed, float(elasticity), lifetime, born
+        )
+        self.heading = None
+        Sprite.__init__(self, image, width, height, x_coord, y_coord, angle, speed)
+
+    @property
+    def rect(self):
+        """
+        :returns: A new `pygame.Rect` of the ball's position and size. Changing it
+            does not move the ball (see `move_to`).
+        """
+        return pygame.Rect(
+            int(self.particles.x[self.index]),
+            int(self.particles.y[self.index]),
+            self.width,
+            self.height,
+        )
+
+    def move_to(self, x_coord, y_coord):
+        """
+        Move the ball's top-left corner to a position, in its store.
+
+        :param x_coord: The x-coordinate of the images top-left corner.
+        :param y_coord: The y-coordinate of the images top-left corner.
+        """
+        self.particles.x[self.index] = x_coord
+        self.particles.y[self.index] = y_coord
+
+    def apply_gravity(self, gravity):
+        """
+        Applies a gravity vector to the tennis ball.
+
+        :param gravity: The magnitude of the gravity vector.
+        :returns: The updated rectangle of the tennis ball after gravity has been
+            applied.
+        """
+        self.particles.apply_gravity(gravity, self.index)
+
+        return self.rect
 
     def bounce(self):
         """
@@ -153,40 +228,25 @@ class Tennis_Ball(Sprite):
 
         :returns: The updated rectangle of the tennis ball.
         """
-        if self.rect.x >= WINDOW_WIDTH:
-            self.rect.x = 2 * WINDOW_WIDTH - self.rect.x
-            self.angle = -self.angle
-            self.speed *= self.elasticity
-        elif self.rect.x <= 0:
-            self.rect.x -= 2 * self.rect.x
-            self.angle = -self.angle
-            self.speed *= self.elasticity
-
-        if self.rect.y >= (WINDOW_HEIGHT - self.height):
-            self.rect.y = 2 * WINDOW_HEIGHT - (self.rect.y + self.height)
-            self.angle = pi - self.angle
-            self.speed *= self.elasticity
-        elif self.rect.y <= 0:
-            self.rect.y -= 2 * self.rect.y
-            self.angle = pi - self.angle
-            self.speed *= self.elasticity
+        self.particles.bounce(self.index)
 
         return self.rect
 
-    def alive(self):
+    def alive(self, now=None):
         """
         Calculates if a tennis ball sprite should be rendered or not.
 
+        :param now: The current time in ns. Defaults to now.
         :returns: True if `lifetime` is set to 0, or if `lifetime` is less than the
             difference between the creation of the sprite and the current time in ns.
             False otherwise.
         """
-        if self.lifetime == 0:
-            return True
+        return self.particles.is_alive(self.index, now)
 
-        while time_ns() - self.born < (self.lifetime * 1000 * 1000 * 1000):
-            return True
-        return False
+    def kill(self):
+        """Remove the tennis ball from all groups, and free it from its store."""
+        super().kill()
+        self.despawn()
 
     def set_lifetime(self, lifetime):
         """
@@ -256,7 +316,6 @@ class Player(Sprite):
         self.speed = offset
         if self.rect.y > MAX_UP:
             self.rect.top -= offset
-            self.hitbox[1] -= offset
 
     def move_down(self, offset=5):
         """
@@ -268,7 +327,6 @@ class Player(Sprite):
         self.speed = offset
         if self.rect.y < (MAX_DOWN - self.rect.height):
             self.rect.bottom += offset
-            self.hitbox[1] += offset
 
     def move_right(self, offset=5):
         """
@@ -281,7 +339,6 @@ class Player(Sprite):
         self.direction = RIGHT
         if self.rect.x < (MAX_RIGHT - self.rect.width):
             self.rect.right += offset
-            self.hitbox[0] += offset
 
     def move_left(self, offset=5):
         """
@@ -294,15 +351,35 @@ class Player(Sprite):
         self.direction = LEFT
         if self.rect.x > MAX_LEFT:
             self.rect.left -= offset
-            self.hitbox[0] -= offset
+
+    def reset(self, image, x_coord, y_coord, direction=LEFT):
+        """
+        Move the player back to its starting state, in-place.
+
+        :param image: The image to show.
+        :param x_coord: The x-coordinate of the images top-left corner.
+        :param y_coord: The y-coordinate of the images top-left corner.
+        :param direction: The direction the player is facing towards.
+        """
+        self.image = image
+        self.rect.size = image.get_size()
+        self.rect.topleft = (x_coord, y_coord)
+        self.angle = -(pi / 2)
+        self.speed = 0
+        self.direction = direction
+        self.is_jumping = False
+        self.is_dropping = False
+
+        self.width = image.get_width()
+        self.height = image.get_height()
 
     def update_width_height(self):
         """
-        Updates the players hitbox dimensions.
+        Updates the players rectangle (and hitbox) dimensions, keeping its top-left
+        corner in place.
 
         Use this right after updating the players sprite to ensure accurate collisions.
         """
         self.width = self.image.get_width()
         self.height = self.image.get_height()
-        self.hitbox[2] = self.width + 5
-        self.hitbox[3] = self.height + 5
+        self.rect.size = (self.width, self.height)
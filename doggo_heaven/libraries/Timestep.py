@@ -0,0 +1,54 @@
+"""
+Author: Marios Yiannakou
+
+A fixed timestep accumulator, which decouples the physics rate from the frame rate.
+
+The physics are always stepped by the same amount of (simulated) time, however many
+frames are rendered per second. A slow frame results in more physics steps being
+run before the next draw, and a fast frame in fewer (possibly none), with the
+leftover time used to interpolate positions between the last two physics steps.
+"""
+from libraries.globals import *
+
+
+class Fixed_Timestep:
+    """
+    Represents a fixed timestep accumulator.
+
+    Call `advance` once per frame with the time elapsed since the previous frame, run
+    the returned number of physics steps, and draw using `alpha` to interpolate.
+
+    :param rate: The number of physics steps per (simulated) second.
+    :param max_steps: The maximum number of physics steps run per frame. Any time
+        left over beyond this is dropped, so that a very slow frame does not result
+        in ever more physics steps being queued up.
+    """
+
+    def __init__(self, rate=PHYSICS_FPS, max_steps=MAX_SUBSTEPS):
+        self.rate = rate
+        self.max_steps = max_steps
+        self.step_ns = (1000 * 1000 * 1000) // rate
+        self.accumulator = 0
+
+    @property
+    def alpha(self):
+        """
+        :returns: How far (as a float between 0 and 1) the current frame is between
+            the last physics step and the next one.
+        """
+        return self.accumulator / self.step_ns
+
+    def advance(self, elapsed_ns):
+        """
+        Add the time elapsed since the last frame to the accumulator.
+
+        :param elapsed_ns: The time (in ns) elapsed since the last frame.
+        :returns: The number of physics steps that should be run this frame.
+        """
+        self.accumulator += elapsed_ns
+        steps = self.accumulator // self.step_ns
+        self.accumulator -= steps * self.step_ns
+        if steps > self.max_steps:
+            steps = self.max_steps
+
+        return int(steps)
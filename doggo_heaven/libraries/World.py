@@ -0,0 +1,113 @@
+"""
+Author: Marios Yiannakou
+
+The state of a single game of 'Doggo Heaven'.
+
+Everything that resetting the game puts back to its starting value (the tennis
+balls, the player, the simulation clock and the settings changed with the keyboard)
+lives on one `World`. A reset restores it in-place, reusing the particle store, the
+player sprite and the images, rather than building the game up again from scratch.
+
+Every random choice in the game is drawn from the world's seeded `rng`, so that the
+same seed and input always play out the same way (see `libraries.Input`).
+"""
+from libraries import colors
+from libraries.Broadphase import Spatial_Hash
+from libraries.Emitters import Area_Emitter, Line_Emitter
+from libraries.globals import *
+from libraries.Masks import Collision_Masks
+from libraries.Particles import Particle_System
+from libraries.Sprites import Player
+from libraries.Timestep import Fixed_Timestep
+from random import Random
+
+# Where the player starts
+PLAYER_START = (850, 500)
+
+
+class World:
+    """
+    Represents the state of a game.
+
+    :param assets: The `Asset_Manager` to get the images from.
+    :param capacity: The number of particle slots to preallocate.
+    :param seed: The seed of the random number generator. Every reset starts from
+        the same seed.
+    """
+
+    def __init__(self, assets, capacity=PARTICLE_CAPACITY, seed=None):
+        self.assets = assets
+        self.seed = seed
+        self.rng = Random(seed)
+        self.tennis_ball_img = assets.get(
+            "models/tennis_ball/tennis_ball_25x25.png", alpha=True
+        )
+        self.player_images = {
+            name: assets.get(f"models/dog/dog_{name}.png", alpha=True)
+            for name in (
+                "left",
+                "right",
+                "jump_left",
+                "jump_right",
+                "drop_left",
+                "drop_right",
+            )
+        }
+
+        # Where the tennis balls hit each image of the player, built once up front
+        self.player_masks = Collision_Masks(
+            self.tennis_ball_img, self.player_images.values()
+        )
+
+        (width, height) = self.tennis_ball_img.get_size()
+        self.particles = Particle_System(capacity, width, height)
+        self.broadphase = Spatial_Hash(max(width, height))
+        player_left = self.player_images["left"]
+        self.player = Player(
+            player_left,
+            player_left.get_width(),
+            player_left.get_height(),
+            *PLAYER_START,
+        )
+        self.timestep = Fixed_Timestep()
+        # Spawns the tennis balls added with the '+' key, near the top of the window
+        self.spawner = Area_Emitter(
+            (width, height, WINDOW_WIDTH - 2 * width, 200 - height), rate=SPAWN_RATE
+        )
+        # Spawns the row of tennis balls the game starts with
+        self.starter = Line_Emitter(
+            (width, 200),
+            (width + WINDOW_WIDTH, 200),
+            evenly=True,
+            speed=GRAVITY_MAGN,
+            lifetime=LIFETIME,
+        )
+
+        self.reset()
+
+    def reset(self):
+        """Put the world back to its starting state, in-place."""
+        # Settings
+        self.fps = GOLDEN_FPS
+        self.draw_hitboxes = False
+        self.dirty_rendering = DIRTY_RENDERING
+        self.gravity = GRAVITY_MAGN
+        self.lifetime = LIFETIME
+        self.elasticity = 0.8
+        self.background = self.assets.get("bg.jpg")
+        self.font_color = colors.BLACK
+
+        self.rng.seed(self.seed)
+
+        # Simulation clock (in ns), and the times the current jump and drop started
+        self.sim_time = 0
+        self.timestep.accumulator = 0
+        self.time_jump = None
+        self.time_drop = None
+
+        self.player.reset(self.player_images["left"], *PLAYER_START)
+
+        # The slots (and capacity) of the particle store are kept
+        self.particles.clear()
+        self.spawner.owed = 0.0
+        self.starter.emit(self.particles, NUM_OF_BALLS, self.rng, self.sim_time)
@@ -4,17 +4,58 @@ Author: Marios Yiannakou
 Helper library to keep all global variables such as screen size,
 enumerated keys (e.g. UP, DOWN, LEFT, RIGHT) accessible.
 """
+
 from math import atan2, cos, hypot, pi, sin
 
 WINDOW_WIDTH = 1280
 WINDOW_HEIGHT = 720
 SCREEN = (WINDOW_WIDTH, WINDOW_HEIGHT)
 NUM_OF_BALLS = 20
+BALL_WIDTH = 25
+BALL_HEIGHT = 25
+# Number of particle slots preallocated on start
+PARTICLE_CAPACITY = 1024
 
 LOW_FPS = 30
 GOLDEN_FPS = 60
 MAX_FPS = 120
 
+# Physics steps per (simulated) second, independent of the FPS setting
+PHYSICS_FPS = 60
+# Maximum number of physics steps run per rendered frame
+MAX_SUBSTEPS = 5
+# Number of times per second a held movement key moves the player
+KEY_REPEAT_RATE = 100
+# Number of tennis balls added (or removed) per second while '+' (or '-') is held
+SPAWN_RATE = 100
+# Number of tennis balls blown out of the player by the 'b' key, and the range of
+# their speed (in pixels per step) and lifetime (in seconds)
+BURST_SIZE = 250
+BURST_SPEED = (2.0, 8.0)
+BURST_LIFETIME = (1.0, 3.0)
+# Maximum number of times per second the FPS counter in the HUD is redrawn
+HUD_FPS_UPDATES = 4
+# Number of frames the quality governor averages before changing the quality, the
+# fraction of the frame budget frames have to stay under for it to raise the
+# quality again, and how often the changing HUD lines are redrawn while degraded
+GOVERNOR_WINDOW = 30
+GOVERNOR_HEADROOM = 0.6
+GOVERNOR_HUD_UPDATES = 1
+# Only redraw the areas of the screen that changed (toggled with the 'u' key)
+DIRTY_RENDERING = False
+# Number of frames kept (and drawn) by the frame profiler (toggled with the 'p' key)
+PROFILER_FRAMES = 240
+# File the frame profiler streams to (toggled with the 'CTRL + p' keys)
+PROFILER_CSV = "profile.csv"
+# File the game is saved to and loaded from (with the 'F5' and 'F9' keys)
+SNAPSHOT_FILE = "snapshot.dhs"
+# Only every Nth frame is appended to a trajectory file
+TRAJECTORY_EVERY = 10
+# Number of frames a capture can hold before the game waits for (or drops) frames,
+# and number of threads encoding them
+CAPTURE_SLOTS = 8
+CAPTURE_WORKERS = 2
+
 UP = 0
 DOWN = 1
 LEFT = 2
@@ -30,10 +71,34 @@ MAX_RIGHT = 1280
 GRAVITY_ANGLE = pi  # Gravity angle in radians
 GRAVITY_MAGN = 1.0  # Gravity magnitude
 DRAG = 0.99  # Multiplier for drag. Drag applied = 1 - `DRAG`
+# Unit gravity vector in screen coordinates (y pointing down)
+GRAVITY_X = sin(GRAVITY_ANGLE)
+GRAVITY_Y = -cos(GRAVITY_ANGLE)
+
+# Player jump
+JUMP_DURATION = 0.5  # Jump (and drop) duration in seconds at a gravity of 1.0
+JUMP_OFFSET = 3  # Pixels moved per physics step while jumping or dropping
 
 # Tennis ball lifetime in seconds
 LIFETIME = 0
 
+# Particles slower than this (relative to the gravity magnitude) for `SLEEP_FRAMES`
+# physics steps in a row are put to sleep, until something touches them
+SLEEP_SPEED = 1.0
+SLEEP_FRAMES = 30
+
+# Images (relative to `assets/images`) decoded in the background on start
+BACKGROUNDS = ("bg.jpg", "bg_space.jpg")
+MODELS = (
+    "models/tennis_ball/tennis_ball_25x25.png",
+    "models/dog/dog_left.png",
+    "models/dog/dog_right.png",
+    "models/dog/dog_jump_left.png",
+    "models/dog/dog_jump_right.png",
+    "models/dog/dog_drop_left.png",
+    "models/dog/dog_drop_right.png",
+)
+
 
 def add_vectors(angle_1, magn_1, angle_2, magn_2):
     """
@@ -53,3 +118,28 @@ def add_vectors(angle_1, magn_1, angle_2, magn_2):
     angle = 0.5 * pi - atan2(y, x)
 
     return (angle, magnitude)
+
+
+def to_cartesian(angle, magn):
+    """
+    Converts a vector with the given angle and magnitude into its components in
+    screen coordinates, where y points down.
+
+    :param angle: The angle of the vector in radians. 0 being up, math.pi down.
+    :param magn: The magnitude of the vector.
+    :returns: A tuple in the format (float, float) of the x and y components.
+    """
+    return (sin(angle) * magn, -cos(angle) * magn)
+
+
+def to_polar(x, y):
+    """
+    Converts a vector in screen coordinates, where y points down, into its angle and
+    magnitude. The inverse of `to_cartesian`.
+
+    :param x: The x component of the vector.
+    :param y: The y component of the vector.
+    :returns: A tuple in the format (float, float) that represents the angle and
+        magnitude respectively.
+    """
+    return (atan2(x, -y), hypot(x, y))
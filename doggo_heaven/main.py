@@ -3,6 +3,15 @@ Author: Marios Yiannakou
 
 The main instance of the particle system.
 
+Usage:
+    $ python doggo_heaven/main.py
+    $ python doggo_heaven/main.py --record session.rec --seed 42
+    $ python doggo_heaven/main.py --replay session.rec
+    $ python doggo_heaven/main.py --load snapshot.dhs --trajectory run.dht
+    $ python doggo_heaven/main.py --renderer gl
+    $ python doggo_heaven/main.py --replay session.rec --capture frames/
+    $ python doggo_heaven/main.py --pipelined
+
 System used:
 - CPU: AMD Ryzen 7 5700U
 - GPU: AMD (Integrated) Radeon Graphics
@@ -13,30 +22,63 @@ from os import environ
 
 environ["PYGAME_HIDE_SUPPORT_PROMPT"] = "1"
 
-from gc import collect
+import argparse
+import json
 import pygame
 
 from libraries import colors
+from libraries.Assets import Asset_Manager
+from libraries.Capture import Frame_Capture
+from libraries.Emitters import Point_Emitter
+from libraries.Governor import LEVELS, Quality_Governor
 from libraries.globals import *
+from libraries.HUD import HUD
+from libraries.Input import SEEDS, Input_Recorder, Input_Replay, Live_Input
+from libraries.Keymap import Keymap
+from libraries.Pipeline import Frame_State
+from libraries.Profiler import Frame_Profiler
+from libraries.Renderer import Renderer
+from libraries.Snapshot import Trajectory_Writer, load_snapshot, save_snapshot
 from libraries.Sprites import *
-from math import pi
-from random import randint
-from time import time_ns
+from libraries.World import World
+from concurrent.futures import ThreadPoolExecutor
+from math import ceil, pi
+from time import perf_counter
 
 
 class Doggo_Heaven:
-    """A class instance of the game 'Doggo Heaven'"""
+    """
+    A class instance of the game 'Doggo Heaven'
 
-    # Sprite groups
-    background_group = pygame.sprite.Group()
-    player_group = pygame.sprite.Group()
-    tennis_ball_group = pygame.sprite.Group()
+    :param backend: "pygame" to draw with `pygame` blits, or "gl" to draw with
+        OpenGL (see `libraries.GL_Renderer`).
+    :param pipelined: True to step the physics of a frame on another thread while
+        the previous frame is drawn (see `libraries.Pipeline`), False to step and
+        draw each frame in turn.
+    """
 
     # World variables
+    assets = None
+    world = None
+    renderer = None
     clock = None
     window = None
     sys_font = None
-    font_color = colors.BLACK
+    hud = None
+    profiler = None
+    governor = None
+    input = None
+    trajectory = None
+    capture = None
+    keymap = None
+    running = False
+
+    def __init__(self, backend="pygame", pipelined=False):
+        self.backend = backend
+        # Step the physics of a frame on another thread, while drawing the last one
+        self.pipelined = pipelined
+        # Without a display (e.g. when replaying), OpenGL draws offscreen
+        self.offscreen = False
 
     def _initialise(self):
         """
@@ -44,319 +86,309 @@ class Doggo_Heaven:
         clock.
         """
         self.clock = pygame.time.Clock()
-        self.window = pygame.display.set_mode(SCREEN)
+        self.offscreen = pygame.display.get_driver() == "dummy"
+        flags = 0
+        if self.backend == "gl" and not self.offscreen:
+            flags = pygame.OPENGL | pygame.DOUBLEBUF
+        self.window = pygame.display.set_mode(SCREEN, flags)
+        self.assets = Asset_Manager()
+        # Decode the backgrounds and models in the background, while starting up
+        self.assets.prefetch(*BACKGROUNDS, *MODELS)
         self.sys_font = pygame.font.Font(pygame.font.get_default_font(), 14)
+        self.hud = HUD(self.sys_font, colors.BLACK)
+        # Only the FPS counter changes every frame, so limit how often it is redrawn
+        self.hud.throttle("fps", HUD_FPS_UPDATES)
+        self.profiler = Frame_Profiler(self.sys_font)
+        self.governor = Quality_Governor()
         pygame.display.set_caption(f"Doggo Heaven")
-        pygame.display.set_icon(pygame.image.load("assets/images/icon.ico").convert())
+        pygame.display.set_icon(self.assets.get("icon.ico"))
 
     def _reset(self):
-        """Reset the program (Garbage collection)."""
-        del self.clock
-        del self.window
+        """
+        Reset the game in-place. The window, clock, font and images are all kept, so
+        resetting takes the same (short) time however many times it is done.
+        """
+        self.world.reset()
+        self.renderer.background = self.world.background
+        self.renderer.dirty = self.world.dirty_rendering
 
-        for surface in self.background_group:
-            del surface
-        self.background_group.empty()
+    def summary(self):
+        """
+        :returns: A JSON serialisable dictionary of the final state of the game, to
+            compare a recorded session with its replays.
+        """
+        world = self.world
+        alive = world.particles.indices()
+
+        return {
+            "sim_time_ns": world.sim_time,
+            "balls": len(world.particles),
+            "asleep": world.particles.sleeping(),
+            "gravity": world.gravity,
+            "elasticity": world.elasticity,
+            "lifetime": world.lifetime,
+            "player": list(world.player.rect.topleft),
+            "checksum": float(
+                world.particles.x[alive].sum() + world.particles.y[alive].sum()
+            ),
+        }
 
-        for surface in self.tennis_ball_group:
-            del surface
-        self.tennis_ball_group.empty()
+    def _load(self, path=None):
+        """
+        Restore the game, in-place, from a snapshot.
 
-        for surface in self.player_group:
-            del surface
-        self.player_group.empty()
+        :param path: The path of the snapshot, which must be readable. Defaults to
+            `SNAPSHOT_FILE`, which is skipped (leaving the game as it is) if it is
+            missing or cannot be read, e.g. when loading before ever saving.
+        """
+        if path is None:
+            try:
+                load_snapshot(self.world)
+            except (OSError, ValueError):
+                return
+        else:
+            load_snapshot(self.world, path)
+        self.renderer.background = self.world.background
+        self.renderer.dirty = self.world.dirty_rendering
+
+    # Actions bound to keys (see `libraries.Keymap`)
+    def jump(self):
+        """Start a jump, unless the player is already in the air."""
+        player = self.world.player
+        if not player.is_jumping and not player.is_dropping:
+            self.world.time_jump = self.world.sim_time
+            player.is_jumping = True
+
+    def cycle_fps(self):
+        """Switch to the next FPS setting."""
+        world = self.world
+        if world.fps == LOW_FPS:
+            world.fps = GOLDEN_FPS
+        elif world.fps == GOLDEN_FPS:
+            world.fps = MAX_FPS
+        elif world.fps == MAX_FPS:
+            world.fps = LOW_FPS
+
+    def decrease_elasticity(self):
+        """Decrease the elasticity of every tennis ball by 0.1."""
+        world = self.world
+        if world.elasticity > 0.1:
+            world.elasticity = float("{:.1f}".format(world.elasticity - 0.1))
+            world.particles.set_elasticity(world.elasticity)
+
+    def increase_elasticity(self):
+        """Increase the elasticity of every tennis ball by 0.1."""
+        world = self.world
+        if world.elasticity < 0.9:
+            world.elasticity = float("{:.1f}".format(world.elasticity + 0.1))
+            world.particles.set_elasticity(world.elasticity)
+
+    def decrease_gravity(self):
+        """Decrease the gravity by 0.1, switching to space below 0.7."""
+        world = self.world
+        if world.player.is_jumping or world.player.is_dropping:
+            return
+        if world.gravity > 0.1:
+            world.gravity = float("{:.1f}".format(world.gravity - 0.1))
+        if world.gravity <= 0.6:
+            world.background = self.assets.get("bg_space.jpg")
+            self.renderer.background = world.background
+            world.font_color = colors.WHITE
+
+    def increase_gravity(self):
+        """Increase the gravity by 0.1, switching back to earth above 0.6."""
+        world = self.world
+        if world.player.is_jumping or world.player.is_dropping:
+            return
+        world.gravity = float("{:.1f}".format(world.gravity + 0.1))
+        if world.gravity > 0.6:
+            world.background = self.assets.get("bg.jpg")
+            self.renderer.background = world.background
+            world.font_color = colors.BLACK
+
+    def decrease_lifetime(self):
+        """Decrease the lifetime of every tennis ball by a second."""
+        world = self.world
+        if world.lifetime > 0:
+            world.lifetime -= 1
+            world.particles.set_lifetime(world.lifetime, world.sim_time)
+
+    def increase_lifetime(self):
+        """Increase the lifetime of every tennis ball by a second."""
+        world = self.world
+        world.lifetime += 1
+        world.particles.set_lifetime(world.lifetime, world.sim_time)
+
+    def toggle_hitboxes(self):
+        """Show or hide the hitboxes."""
+        self.world.draw_hitboxes = not self.world.draw_hitboxes
+
+    def toggle_profiler(self):
+        """Show or hide the frame profiler."""
+        self.profiler.toggle()
+
+    def toggle_profiler_csv(self):
+        """Start or stop streaming the frame profiler to a CSV file."""
+        profiler = self.profiler
+        if profiler.csv_file is not None:
+            profiler.stop_csv()
+        else:
+            if not profiler.enabled:
+                profiler.toggle()
+            profiler.start_csv()
+
+    def toggle_dirty_rendering(self):
+        """Switch dirty rectangle rendering on or off."""
+        self.world.dirty_rendering = not self.world.dirty_rendering
+        self.renderer.dirty = self.world.dirty_rendering
+
+    def save(self):
+        """Save the game to `SNAPSHOT_FILE`."""
+        save_snapshot(self.world)
+
+    def load(self):
+        """Load the game from `SNAPSHOT_FILE`."""
+        self._load()
+
+    def move_up(self, repeats=1):
+        """
+        :param repeats: The number of times to move the player.
+        """
+        for _ in range(repeats):
+            self.world.player.move_up()
 
-        collect(generation=2)
-        self.main()
+    def move_down(self, repeats=1):
+        """
+        :param repeats: The number of times to move the player.
+        """
+        for _ in range(repeats):
+            self.world.player.move_down()
 
-    def main(self):
-        """Run the program."""
-        self._initialise()
-        FPS = GOLDEN_FPS
-        draw_hitboxes = False
-        # Reset here as the import is done after rendering, hence an `UnboundLocalError`
-        # is raised.
-        GRAVITY_MAGN = 1.0
-        LIFETIME = 0
-        ELASTICITY = 0.8
-
-        # Sprites
-        ## Background
-        background = pygame.image.load("assets/images/bg.jpg").convert()
-
-        ## Tennis ball
-        tennis_ball_img = pygame.image.load(
-            "assets/images/models/tennis_ball/tennis_ball_25x25.png"
-        ).convert_alpha()
-        for i in range(NUM_OF_BALLS):
-            self.tennis_ball_group.add(
-                Tennis_Ball(
-                    tennis_ball_img,
-                    tennis_ball_img.get_width(),
-                    tennis_ball_img.get_height(),
-                    tennis_ball_img.get_width() + i * (WINDOW_WIDTH / NUM_OF_BALLS),
-                    200,
-                    pi,
-                    GRAVITY_MAGN,
-                    0.8,
-                    LIFETIME,
-                )
-            )
+    def move_left(self, repeats=1):
+        """
+        :param repeats: The number of times to move the player.
+        """
+        player = self.world.player
+        player.image = self.world.player_images["left"]
+        for _ in range(repeats):
+            player.move_left()
 
-        ## Player
-        player_left = pygame.image.load(
-            "assets/images/models/dog/dog_left.png"
-        ).convert_alpha()
-        player_right = pygame.image.load(
-            "assets/images/models/dog/dog_right.png"
-        ).convert_alpha()
-        player_jump_right = pygame.image.load(
-            "assets/images/models/dog/dog_jump_right.png"
-        ).convert_alpha()
-        player_jump_left = pygame.image.load(
-            "assets/images/models/dog/dog_jump_left.png"
-        ).convert_alpha()
-        player_drop_right = pygame.image.load(
-            "assets/images/models/dog/dog_drop_right.png"
-        ).convert_alpha()
-        player_drop_left = pygame.image.load(
-            "assets/images/models/dog/dog_drop_left.png"
-        ).convert_alpha()
-        player = Player(
-            player_left, player_left.get_width(), player_left.get_height(), 850, 500
-        )
-        self.player_group.add(player)
-        player_rect = player.rect
+    def move_right(self, repeats=1):
+        """
+        :param repeats: The number of times to move the player.
+        """
+        player = self.world.player
+        player.image = self.world.player_images["right"]
+        for _ in range(repeats):
+            player.move_right()
 
-        # Jump variables
+    def reset(self, repeats=1):
+        """Reset the game."""
+        self._reset()
+
+    def spawn(self, repeats=1):
+        """
+        Add the tennis balls due over the frame from `World.spawner`, at random
+        positions near the top of the window, reusing the slots of removed balls, if
+        there are any. No more than a frame at `LOW_FPS` would get are added, so a
+        stall does not turn into a burst.
+
+        :param repeats: Ignored, as the spawner's rate decides how many balls are
+            due.
         """
-        Jump offset in pixels per FPS setting.
+        world = self.world
+        spawner = world.spawner
+        spawner.speed = world.gravity
+        spawner.lifetime = world.lifetime
+        limit = self.governor.allowed_spawns(
+            ceil(spawner.rate / LOW_FPS), len(world.particles)
+        )
+        spawner.update(
+            world.particles, self.frame_time, world.rng, world.sim_time, limit
+        )
 
-        Since pygame uses internal ticks rather than a real time clock,
-        the more FPS it renders, the more ticks there are in a real time
-        second. This results in a larger number of iterations of the event
-        loop, hence the players total jump height becomes FPS dependent.
+    def burst(self):
+        """Blow `BURST_SIZE` short-lived tennis balls out of the player."""
+        world = self.world
+        (x_coord, y_coord) = world.player.rect.center
+        emitter = Point_Emitter(
+            x_coord - world.particles.width / 2,
+            y_coord - world.particles.height / 2,
+            speed=BURST_SPEED,
+            angle=(0, 2 * pi),
+            lifetime=BURST_LIFETIME,
+        )
+        count = self.governor.allowed_spawns(BURST_SIZE, len(world.particles))
+        emitter.emit(world.particles, count, world.rng, world.sim_time)
 
-        Create a dictionary that uses a different offset (in pixels), based
-        on the current FPS being used
+    def despawn(self, count=1):
         """
-        jump_offset_dict = {
-            30: 6,
-            60: 3,
-            120: 2,
-        }
-        jump_duration = 0.5 * (1000 * 1000 * 1000)  # 0.5 ns
+        Remove the most recently added tennis balls.
 
+        :param count: The number of balls to remove.
         """
-        This line of code is required as it sets the amount of time (in ms) that a key
-        is required to be pressed down, in order for it to be considered pressed and
-        held down. The second parameter is the time between each "KEYDOWN" event that
-        will be executed (in ms) after it's considered to be held down.
+        for _ in range(count):
+            self.world.particles.remove_newest()
+
+    def quit(self, repeats=1):
+        """Stop the game at the end of the current frame's input."""
+        self.running = False
 
-        This is allows the movement keys (W, A, S, D) to be pressed once and executed
-        multiple times, simulating much smoother movement animation.
+    def _simulate(self, frame_time, lap=None, state=None):
         """
-        pygame.key.set_repeat(1, 10)
-        while True:
-            self.clock.tick(FPS)
-            # Keep a track of all tennis ball sprites
-            tennis_balls = self.tennis_ball_group.sprites()
+        Step the physics (ball movement, collisions and jumps) through a frame.
 
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    return
-                # Key Bindings
-                keys = pygame.key.get_pressed()
-
-                # Movement
-                ## Up
-                if keys[pygame.K_w]:
-                    player.move_up()
-                ## Down
-                if keys[pygame.K_s]:
-                    player.move_down()
-                ## Left
-                if keys[pygame.K_a]:
-                    player.image = player_left
-                    player.move_left()
-                ## Right
-                if keys[pygame.K_d]:
-                    player.image = player_right
-                    player.move_right()
-                ## Jump
-                if (
-                    event.type == pygame.KEYUP
-                    and event.key == pygame.K_SPACE
-                    and not player.is_jumping
-                    and not player.is_dropping
-                ):
-                    time_jump = time_ns()
-                    player.is_jumping = True
-
-                # Change video settings (Graphic settings)
-                if (
-                    event.type == pygame.KEYUP
-                    and event.key == pygame.K_f
-                    and not (player.is_jumping or player.is_dropping)
-                ):
-                    if FPS == LOW_FPS:
-                        FPS = GOLDEN_FPS
-                    elif FPS == GOLDEN_FPS:
-                        FPS = MAX_FPS
-                    elif FPS == MAX_FPS:
-                        FPS = LOW_FPS
-
-                ## Elasticity settings
-                # Decrease elasticity
-                if (
-                    event.type == pygame.KEYUP
-                    and pygame.key.get_mods() & pygame.KMOD_SHIFT
-                    and event.key == pygame.K_e
-                ):
-                    if ELASTICITY > 0.1:
-                        ELASTICITY = float("{:.1f}".format(ELASTICITY - 0.1))
-                        for tennis_ball in tennis_balls:
-                            tennis_ball.set_elasticity(ELASTICITY)
-
-                # Increase elasticity
-                if (
-                    event.type == pygame.KEYUP
-                    and pygame.key.get_mods() & pygame.KMOD_CTRL
-                    and event.key == pygame.K_e
-                ):
-                    if ELASTICITY < 0.9:
-                        ELASTICITY = float("{:.1f}".format(ELASTICITY + 0.1))
-                        for tennis_ball in tennis_balls:
-                            tennis_ball.set_elasticity(ELASTICITY)
-
-                ## Gravity settings
-                # Decrease gravity
-                if (
-                    event.type == pygame.KEYUP
-                    and pygame.key.get_mods() & pygame.KMOD_SHIFT
-                    and event.key == pygame.K_g
-                    and not (player.is_jumping or player.is_dropping)
-                ):
-                    if GRAVITY_MAGN > 0.1:
-                        GRAVITY_MAGN = float("{:.1f}".format(GRAVITY_MAGN - 0.1))
-                    if GRAVITY_MAGN <= 0.6:
-                        del background
-                        background = pygame.image.load(
-                            "assets/images/bg_space.jpg"
-                        ).convert()
-                        self.font_color = colors.WHITE
-                # Increase gravity
-                if (
-                    event.type == pygame.KEYUP
-                    and pygame.key.get_mods() & pygame.KMOD_CTRL
-                    and event.key == pygame.K_g
-                    and not (player.is_jumping or player.is_dropping)
-                ):
-                    GRAVITY_MAGN = float("{:.1f}".format(GRAVITY_MAGN + 0.1))
-                    if GRAVITY_MAGN > 0.6:
-                        del background
-                        background = pygame.image.load("assets/images/bg.jpg").convert()
-                        self.font_color = colors.BLACK
-
-                ## Ball lifetime settings
-                # Decrease lifetime
-                if (
-                    event.type == pygame.KEYUP
-                    and pygame.key.get_mods() & pygame.KMOD_SHIFT
-                    and event.key == pygame.K_t
-                ):
-                    if LIFETIME > 0:
-                        LIFETIME -= 1
-                        for tennis_ball in tennis_balls:
-                            tennis_ball.set_lifetime(LIFETIME)
-
-                # Increase lifetime
-                if (
-                    event.type == pygame.KEYUP
-                    and pygame.key.get_mods() & pygame.KMOD_CTRL
-                    and event.key == pygame.K_t
-                ):
-                    LIFETIME += 1
-                    for tennis_ball in tennis_balls:
-                        tennis_ball.set_lifetime(LIFETIME)
-
-                # Toggle hitboxes
-                if event.type == pygame.KEYUP and event.key == pygame.K_h:
-                    draw_hitboxes = not draw_hitboxes
-
-                # Reset and Garbage collection
-                if keys[pygame.K_r]:
-                    # Sprites
-                    del tennis_ball_img
-                    del player_drop_left
-                    del player_drop_right
-                    del player_jump_left
-                    del player_jump_right
-                    del player_left
-                    del player_right
-                    # Models
-                    del player
-                    del background
-                    self._reset()
-
-                # Add tennis balls
-                if keys[pygame.K_PLUS] or keys[pygame.K_EQUALS]:
-                    self.tennis_ball_group.add(
-                        Tennis_Ball(
-                            tennis_ball_img,
-                            tennis_ball_img.get_width(),
-                            tennis_ball_img.get_height(),
-                            randint(
-                                tennis_ball_img.get_width(),
-                                WINDOW_WIDTH - tennis_ball_img.get_width(),
-                            ),
-                            randint(tennis_ball_img.get_height(), 200),
-                            pi,
-                            GRAVITY_MAGN,
-                            0.8,
-                            LIFETIME,
-                        )
-                    )
+        The physics are stepped at a fixed rate of `PHYSICS_FPS`, regardless of the
+        FPS setting. Time is measured on the simulation clock `world.sim_time` (in
+        ns), which only advances by whole physics steps, so a slow frame runs more
+        steps rather than slowing the world down.
 
-                # Remove tennis balls
-                if keys[pygame.K_MINUS]:
-                    tennis_balls = self.tennis_ball_group.sprites()
-                    if len(tennis_balls) > 0:
-                        last_ball = tennis_balls[-1]
-                        self.tennis_ball_group.remove(last_ball)
-                        del last_ball
+        :param frame_time: The time (in ms) elapsed since the previous frame.
+        :param lap: The function to time each phase with (see
+            `Frame_Profiler.lap`). Defaults to not timing them.
+        :param state: The `Frame_State` to copy the world to afterwards, if any.
+        """
+        lap = lap or (lambda phase: None)
+        world = self.world
+        images = world.player_images
+        player = world.player
+        player_rect = player.rect
+        jump_duration = JUMP_DURATION * (1000 * 1000 * 1000)  # In ns
 
-                # Quit
-                if keys[pygame.K_q] or keys[pygame.K_ESCAPE]:
-                    return
+        for _ in range(world.timestep.advance(frame_time * 1000 * 1000)):
+            world.sim_time += world.timestep.step_ns
 
             # Jump movement
             if player.is_jumping:
                 player.image = (
-                    player_jump_left if player.direction == LEFT else player_jump_right
+                    images["jump_left"]
+                    if player.direction == LEFT
+                    else images["jump_right"]
                 )
                 player.update_width_height()
                 player.direction = UP
 
                 # Stop the motion early if out of bounds
                 if player.rect.y <= 0:
-                    time_drop = time_ns()
+                    world.time_drop = world.sim_time
                     player.is_jumping = False
                     player.is_dropping = True
 
-                if (time_ns() - time_jump) <= (jump_duration / GRAVITY_MAGN):
-                    jump_offset = jump_offset_dict[FPS]
-                    player.speed = jump_offset
-                    player_rect.y -= jump_offset
-                    player.hitbox[1] -= jump_offset
+                if (world.sim_time - world.time_jump) <= (
+                    jump_duration / world.gravity
+                ):
+                    player.speed = JUMP_OFFSET
+                    player_rect.y -= JUMP_OFFSET
                 else:
-                    time_drop = time_ns()
+                    world.time_drop = world.sim_time
                     player.is_jumping = False
                     player.is_dropping = True
 
             if player.is_dropping:
                 player.image = (
-                    player_drop_left if player.direction == LEFT else player_drop_right
+                    images["drop_left"]
+                    if player.direction == LEFT
+                    else images["drop_right"]
                 )
                 player.update_width_height()
                 player.direction = DOWN
@@ -366,101 +398,395 @@ class Doggo_Heaven:
                     player.is_dropping = False
                     player.is_jumping = False
 
-                if (time_ns() - time_drop) <= (jump_duration / GRAVITY_MAGN):
-                    jump_offset = jump_offset_dict[FPS]
-                    player.speed = jump_offset
-                    player_rect.y += jump_offset
-                    player.hitbox[1] += jump_offset
+                if (world.sim_time - world.time_drop) <= (
+                    jump_duration / world.gravity
+                ):
+                    player.speed = JUMP_OFFSET
+                    player_rect.y += JUMP_OFFSET
                 else:
-                    del time_drop
+                    world.time_drop = None
                     player.is_dropping = False
                     player.is_jumping = False
 
             if not player.is_jumping and not player.is_dropping:
-                player.image = player_left if player.direction == LEFT else player_right
+                player.image = (
+                    images["left"] if player.direction == LEFT else images["right"]
+                )
                 player.update_width_height()
+            lap("player")
+
+            # Tennis ball movement (Gravity)
+            world.particles.step(world.gravity)
+            world.particles.expire(world.sim_time)
+            lap("physics")
+
+            ## Collisions
+            # Tennis ball with player
+            world.particles.collide_rect(
+                player_rect,
+                player.angle,
+                player.speed,
+                world.player_masks.get(player.image),
+            )
+            # Tennis ball with tennis ball
+            step = world.sim_time // world.timestep.step_ns
+            if step % self.governor.collision_every == 0:
+                world.broadphase.rebuild(world.particles)
+                world.particles.collide(*world.broadphase.pairs())
+            lap("collisions")
 
-            # Tennis ball movement
-            for tennis_ball in tennis_balls:
-                if not tennis_ball.alive():
-                    self.tennis_ball_group.remove(tennis_ball)
-                    del tennis_ball
-                    continue
-                # Gravity
-                tennis_ball.rect = tennis_ball.apply_gravity(GRAVITY_MAGN)
-                tennis_ball.rect = tennis_ball.bounce()
-                ## Collisions
-                # Tennis ball with player
-                if tennis_ball.rect.colliderect(player_rect):
-                    (tennis_ball.angle, tennis_ball.speed) = add_vectors(
-                        player.angle, player.speed, tennis_ball.angle, tennis_ball.speed
-                    )
-                collided_tennis_ball = pygame.sprite.spritecollideany(
-                    tennis_ball, self.tennis_ball_group
-                )
-                # Tennis ball with tennis ball
-                if collided_tennis_ball and collided_tennis_ball != tennis_ball:
-                    (tennis_ball.angle, tennis_ball.speed) = add_vectors(
-                        tennis_ball.angle,
-                        (tennis_ball.speed * tennis_ball.elasticity),
-                        collided_tennis_ball.angle,
-                        (collided_tennis_ball.speed * collided_tennis_ball.elasticity),
-                    )
-                    # Explosion !!\*o*/!!
-                    collided_tennis_ball.angle = -tennis_ball.angle
-                    collided_tennis_ball.speed *= collided_tennis_ball.elasticity
-
-            # Draw the game
-            self.window.blit(background, (0, 0))
-            # self.background_group.draw(self.window)
-            self.tennis_ball_group.draw(self.window)
-            self.window.blit(player.image, player_rect)
-            # Draw the HUD
-            HUD = {
-                "exit": f"Exit the game by pressing the Q or Esc keys.",
-                "fps": f"FPS: {int(self.clock.get_fps())} - Switch between FPS settings with the 'f' key",
-                "move": f"Move: W, A, S, D -- Jump: Space",
-                "tennis_balls": f"Tennis Balls: {len(tennis_balls)} - Add/Remove balls with the '+' and '-' keys",
-                "elasticity": f"Elasticity: {ELASTICITY} - Increase by pressing 'CTRL + e', or decrease by pressing the 'SHIFT + e' keys",
-                "gravity": f"Gravity: {GRAVITY_MAGN} - Increase by pressing 'CTRL + g', or decrease by pressing the 'SHIFT + g' keys",
-                "lifetime": f"Lifetime: {LIFETIME}s - Increase by pressing 'CTRL + t', or decrease by pressing the 'SHIFT + t' keys",
-                "lifetime_2": f"                        Set to 0 for infinite lifetime",
-                "hitboxes": f"Toggle hitboxes with the 'h' key",
-            }
-            start_x = 10
-            start_y = 5
-            for key in HUD.keys():
-                self.window.blit(
-                    self.sys_font.render(
-                        HUD[key],
-                        True,
-                        self.font_color,
+        if state is not None:
+            state.fill(world)
+
+    def _draw(self, balls, alpha, player_image, player_rect, player_hitbox):
+        """
+        Draw a frame and show it.
+
+        :param balls: The `Particle_System` (or `Frame_State`) of the tennis balls.
+        :param alpha: How far to interpolate the tennis balls between the last two
+            physics steps.
+        :param player_image: The image of the player.
+        :param player_rect: The `pygame.Rect` of the player.
+        :param player_hitbox: The hitbox of the player.
+        """
+        world = self.world
+        renderer = self.renderer
+        profiler = self.profiler
+        governor = self.governor
+
+        renderer.begin()
+        profiler.lap("background")
+        # Draw the tennis balls part-way between the last two physics steps
+        renderer.draw_particles(
+            world.tennis_ball_img, balls, alpha, governor.draw_stride
+        )
+        renderer.draw(player_image, player_rect)
+        profiler.lap("draw")
+        # Draw the HUD (only lines that changed are rendered again)
+        self.hud.color = world.font_color
+        self.hud.set("exit", f"Exit the game by pressing the Q or Esc keys.")
+        self.hud.set(
+            "fps",
+            f"FPS: {int(self.clock.get_fps())} - Switch between FPS settings with the 'f' key",
+        )
+        self.hud.set("move", f"Move: W, A, S, D -- Jump: Space")
+        self.hud.set(
+            "tennis_balls",
+            f"Tennis Balls: {len(balls)} ({balls.sleeping()} asleep) - Add/Remove balls with the '+' and '-' keys",
+        )
+        self.hud.set(
+            "elasticity",
+            f"Elasticity: {world.elasticity} - Increase by pressing 'CTRL + e', or decrease by pressing the 'SHIFT + e' keys",
+        )
+        self.hud.set(
+            "gravity",
+            f"Gravity: {world.gravity} - Increase by pressing 'CTRL + g', or decrease by pressing the 'SHIFT + g' keys",
+        )
+        self.hud.set(
+            "lifetime",
+            f"Lifetime: {world.lifetime}s - Increase by pressing 'CTRL + t', or decrease by pressing the 'SHIFT + t' keys",
+        )
+        self.hud.set(
+            "lifetime_2", f"                        Set to 0 for infinite lifetime"
+        )
+        self.hud.set("hitboxes", f"Toggle hitboxes with the 'h' key")
+        self.hud.set(
+            "burst",
+            f"Burst {BURST_SIZE} tennis balls out of the dog with the 'b' key",
+        )
+        self.hud.set(
+            "snapshot",
+            f"Save the game to '{SNAPSHOT_FILE}' with the 'F5' key, and load it with the 'F9' key",
+        )
+        self.hud.set(
+            "profiler",
+            f"Frame profiler: {'On' if profiler.enabled else 'Off'} - Toggle with the 'p' key, or record to '{PROFILER_CSV}' with 'CTRL + p'",
+        )
+        self.hud.set(
+            "rendering",
+            f"Dirty rectangle rendering: {'On' if world.dirty_rendering else 'Off'} - Toggle with the 'u' key",
+        )
+        self.hud.set(
+            "quality",
+            f"Quality: {LEVELS[governor.level]} ({governor.level}/{len(LEVELS) - 1}){' - DEGRADED to hold ' + str(world.fps) + ' FPS' if governor.degraded else ''}",
+        )
+        renderer.mark(self.hud.draw(renderer.window))
+        profiler.lap("hud")
+
+        # Draw the hitboxes
+        if world.draw_hitboxes and governor.hitboxes:
+            renderer.mark(
+                [pygame.draw.rect(renderer.window, colors.RED, player_hitbox, 2)]
+            )
+            for index in balls.indices():
+                hitbox = pygame.draw.rect(
+                    renderer.window,
+                    colors.BLACK,
+                    (
+                        balls.x[index] - 5,
+                        balls.y[index] - 5,
+                        balls.width + 5,
+                        balls.height + 5,
                     ),
-                    (start_x, start_y),
+                    2,
+                )
+                renderer.mark([hitbox])
+        profiler.lap("draw")
+
+        # Draw the frame profiler
+        if profiler.enabled:
+            profiler.legend.color = world.font_color
+            renderer.mark(profiler.draw(renderer.window))
+            profiler.lap("hud")
+
+        renderer.finish()
+        if self.capture is not None:
+            # Before the buffers are swapped, while the frame is in the back buffer
+            self.capture.capture(renderer)
+            profiler.lap("capture")
+        # Swap buffers
+        renderer.show()
+        profiler.lap("flip")
+
+    def main(self, source=None, snapshot=None, trajectory=None, capture=None):
+        """
+        Run the program.
+
+        :param source: The source of the input of every frame (see
+            `libraries.Input`). Defaults to the player's input.
+        :param snapshot: The path of a snapshot to start the game from.
+        :param trajectory: The `Trajectory_Writer` to append the particles of every
+            frame to.
+        :param capture: The `Frame_Capture` to capture every frame shown with.
+        """
+        self._initialise()
+        self.input = source or Live_Input()
+        self.trajectory = trajectory
+        self.capture = capture
+        self.keymap = Keymap()
+        self.world = world = World(self.assets, seed=self.input.seed)
+        if self.backend == "gl":
+            # Only loaded when asked for, as OpenGL takes a while (and a fair amount
+            # of memory) to load
+            from libraries.GL_Renderer import GL_Renderer
+
+            renderer = GL_Renderer(
+                SCREEN, world.background, world.dirty_rendering, self.offscreen
+            )
+        else:
+            renderer = Renderer(self.window, world.background, world.dirty_rendering)
+        self.renderer = renderer
+        if snapshot is not None:
+            self._load(snapshot)
+        # Convert the alternate background now, not on the frame the gravity changes
+        self.assets.get("bg_space.jpg")
+
+        player = world.player
+        # The state drawn on the current frame, and the one filled by the physics
+        # thread, when pipelined
+        (width, height) = world.tennis_ball_img.get_size()
+        front = Frame_State(width, height)
+        back = Frame_State(width, height)
+        front.fill(world)
+        worker = ThreadPoolExecutor(1) if self.pipelined else None
+
+        self.keymap.allow_events()
+        profiler = self.profiler
+        frame_number = 0
+        self.running = True
+        while True:
+            profiler.frame()
+            frame = self.input.poll(self.clock, world.fps)
+            frame_time = self.frame_time = frame.frame_time
+            profiler.lap("wait")
+            # Trade quality for speed while frames run over the FPS setting's budget
+            governor = self.governor
+            if governor.update(frame.busy_time, 1000 / world.fps, len(world.particles)):
+                self.hud.throttle("fps", governor.hud_updates)
+                # The ball count is only throttled while the quality is lowered
+                self.hud.throttle(
+                    "tennis_balls", governor.hud_updates if governor.degraded else 0
                 )
-                start_y += 15
-
-            # Draw the hitboxes
-            if draw_hitboxes:
-                pygame.draw.rect(self.window, colors.RED, player.hitbox, 2)
-                for tennis_ball in tennis_balls:
-                    pygame.draw.rect(
-                        self.window,
-                        colors.BLACK,
-                        (
-                            tennis_ball.rect.topleft[0] - 5,
-                            tennis_ball.rect.topleft[1] - 5,
-                            tennis_ball.width + 5,
-                            tennis_ball.height + 5,
-                        ),
-                        2,
+            # Key Bindings (see `libraries.Keymap`). Key releases act once per event,
+            # and held keys once per frame.
+            for event in frame.events:
+                if event.type == pygame.QUIT:
+                    self.quit()
+                elif event.type == pygame.KEYUP:
+                    action = self.keymap.released(event.key, frame.mods)
+                    if action is not None:
+                        getattr(self, action)()
+            for action, repeats in self.keymap.held(frame.keys, frame_time):
+                getattr(self, action)(repeats)
+            if not self.running:
+                profiler.stop_csv()
+                if worker is not None:
+                    worker.shutdown()
+                return
+            profiler.lap("events")
+
+            if worker is not None:
+                # Step the physics of this frame on the worker, while drawing the
+                # last one from its (read-only) state
+                pending = worker.submit(self._simulate, frame_time, None, back)
+                self._draw(
+                    front,
+                    1.0,
+                    front.player_image,
+                    front.player_rect,
+                    front.player_hitbox,
+                )
+                pending.result()
+                # The time waited for the physics to finish
+                profiler.lap("physics")
+                (front, back) = (back, front)
+                if self.trajectory is not None:
+                    self.trajectory.record(
+                        frame_number, world.sim_time, world.particles
                     )
+            else:
+                self._simulate(frame_time, profiler.lap)
+                if self.trajectory is not None:
+                    self.trajectory.record(
+                        frame_number, world.sim_time, world.particles
+                    )
+                self._draw(
+                    world.particles,
+                    world.timestep.alpha,
+                    player.image,
+                    player.rect,
+                    player.hitbox,
+                )
+            frame_number += 1
+
+
+def parse_seed(text):
+    """
+    :param text: The seed given on the command line.
+    :returns: The seed, as an integer that fits in a recording (see
+        `libraries.Input`).
+    """
+    try:
+        seed = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid seed: '{text}'")
+    if not 0 <= seed < SEEDS:
+        raise argparse.ArgumentTypeError(
+            f"the seed must be between 0 and {SEEDS - 1}, not {seed}"
+        )
 
-            # Swap buffers
-            pygame.display.flip()
-
+    return seed
+
+
+def parse_args(args=None):
+    """
+    Parse the command line arguments of the game.
+
+    :param args: The list of arguments to parse. Defaults to `sys.argv`.
+    :returns: The parsed arguments as an `argparse.Namespace`.
+    """
+    parser = argparse.ArgumentParser(description="Play Doggo Heaven.")
+    parser.add_argument(
+        "--seed",
+        type=parse_seed,
+        default=None,
+        help="Seed of the random number generator.",
+    )
+    parser.add_argument(
+        "--record", default=None, help="File to record the seed and input to."
+    )
+    parser.add_argument(
+        "--replay",
+        default=None,
+        help="Recording to replay as fast as possible, without a window.",
+    )
+    parser.add_argument(
+        "--renderer",
+        choices=("pygame", "gl"),
+        default="pygame",
+        help="Draw with pygame blits, or with OpenGL.",
+    )
+    parser.add_argument(
+        "--pipelined",
+        action="store_true",
+        help="Step the physics on another thread, while drawing the previous frame.",
+    )
+    parser.add_argument("--load", default=None, help="Snapshot to start the game from.")
+    parser.add_argument(
+        "--trajectory",
+        default=None,
+        help="File to append the tennis balls of every Nth frame to.",
+    )
+    parser.add_argument(
+        "--trajectory-every",
+        type=int,
+        default=TRAJECTORY_EVERY,
+        help="Number of frames between the frames appended to the trajectory.",
+    )
+
+    parser.add_argument(
+        "--capture",
+        default=None,
+        help="Directory to write every frame shown to, as numbered PNG files.",
+    )
+    parser.add_argument(
+        "--capture-raw",
+        action="store_true",
+        help="Write the frames to a single raw frame file at the --capture path.",
+    )
+    parser.add_argument(
+        "--capture-drop",
+        action="store_true",
+        help="Drop frames while the capture is behind, rather than wait for it.",
+    )
+
+    return parser.parse_args(args)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.replay:
+        environ["SDL_VIDEODRIVER"] = "dummy"
+        source = Input_Replay(args.replay)
+    elif args.record:
+        source = Input_Recorder(args.record, args.seed)
+    else:
+        source = Live_Input(args.seed)
+
+    pygame.init()
+    trajectory = None
+    if args.trajectory:
+        trajectory = Trajectory_Writer(args.trajectory, args.trajectory_every)
+    capture = None
+    if args.capture:
+        capture = Frame_Capture(
+            args.capture, raw=args.capture_raw, drop=args.capture_drop
+        )
 
-pygame.init()
-Doggo_Heaven().main()
-pygame.quit()
-quit()
+    game = Doggo_Heaven(args.renderer, args.pipelined)
+    start = perf_counter()
+    try:
+        game.main(source, args.load, trajectory, capture)
+    finally:
+        source.close()
+        if trajectory is not None:
+            trajectory.close()
+        if capture is not None:
+            capture.close()
+        if game.backend == "gl" and game.renderer is not None:
+            game.renderer.close()
+    elapsed = perf_counter() - start
+
+    if args.replay or args.record:
+        report = {
+            "seed": source.seed,
+            "frames": source.frames,
+            "seconds": elapsed,
+            "fps": source.frames / max(elapsed, 1e-9),
+            **game.summary(),
+        }
+        print(json.dumps(report))
+    if capture is not None:
+        print(json.dumps({"capture": capture.report()}))
+    pygame.quit()
+    quit()
@@ -0,0 +1,358 @@
+"""
+Author: Marios Yiannakou
+
+End-to-end performance scenarios for 'Doggo Heaven', gated against a baseline.
+
+Every scenario plays the full game (input, physics, collisions, drawing and the
+HUD) for a fixed number of frames, with a dummy SDL video driver so that no window
+is opened. Its input comes from a script rather than the keyboard, and frames are
+not waited for, so the time between two frames is the time the game spent on one.
+Each scenario runs in a fresh process, so that its peak memory use is its own.
+
+The first frames of a scenario (while images are converted and caches fill up) are
+left out of its frame times. Every scenario is played several times, and the median
+of each measurement over the runs is kept, so that a single run slowed down by the
+rest of the machine does not fail the gate.
+
+The frame-time percentiles and peak memory of every scenario are compared with a
+baseline file, and the run fails if any scenario got slower, or uses more memory,
+by more than a tolerance. Frame times may also grow by a few tenths of a
+millisecond on top of it, as that much is lost to noise on a frame of a
+millisecond or two.
+
+Usage:
+    $ python doggo_heaven/scenarios.py
+    $ python doggo_heaven/scenarios.py --scenarios default dense_pile --tolerance 0.5
+    $ python doggo_heaven/scenarios.py --runs 5 --update
+"""
+# Never open a window, and remove the pygame welcome message ...
+from os import environ
+
+environ["SDL_VIDEODRIVER"] = "dummy"
+environ["PYGAME_HIDE_SUPPORT_PROMPT"] = "1"
+
+import argparse
+import json
+import numpy as np
+import os
+import platform
+import pygame
+import resource
+import sys
+
+from concurrent.futures import ProcessPoolExecutor
+from libraries.Emitters import Area_Emitter
+from libraries.globals import *
+from libraries.Input import KEY_INDICES, Frame_Input, Key_State
+from main import Doggo_Heaven
+from multiprocessing import get_context
+from time import perf_counter_ns
+
+BASELINE = "doggo_heaven/scenarios_baseline.json"
+# Frame-time percentiles recorded, and the ones compared with the baseline
+PERCENTILES = (50, 90, 95, 99)
+GATED = ("p50_ms", "p95_ms")
+# Frames left out of the frame times at the start of every scenario
+WARMUP_FRAMES = 60
+# Times every scenario is played
+RUNS = 3
+
+
+def crowd_jump(frame):
+    """
+    Run the player back and forth through the crowd, jumping every second.
+
+    :param frame: The number of the frame.
+    :returns: A tuple of the keys held down, and the keys released.
+    """
+    held = (pygame.K_d,) if (frame // 120) % 2 == 0 else (pygame.K_a,)
+    released = (pygame.K_SPACE,) if frame % 60 == 0 else ()
+
+    return (held, released)
+
+
+def spawn_spam(frame):
+    """
+    Hold down the '+' key for the first half of the scenario.
+
+    :param frame: The number of the frame.
+    :returns: A tuple of the keys held down, and the keys released.
+    """
+    return ((pygame.K_EQUALS,) if frame < 300 else (), ())
+
+
+# The settings of every scenario. Omitted settings take the game's defaults.
+SCENARIOS = {
+    "default": {"frames": 600, "balls": NUM_OF_BALLS, "gravity": GRAVITY_MAGN},
+    "low_gravity_5k": {"frames": 360, "balls": 5000, "gravity": 0.3, "lifetime": 5},
+    "dense_pile": {"frames": 600, "balls": 1000, "elasticity": 0.1},
+    "crowd_jump": {"frames": 600, "balls": 400, "script": crowd_jump},
+    "spawn_spam": {"frames": 600, "balls": NUM_OF_BALLS, "script": spawn_spam},
+}
+
+
+class Scenario_Input:
+    """
+    Represents the input of a scenario, generated by a script one frame at a time.
+
+    The first poll sets the scenario up on the game's world. Every frame is given
+    the same frame time (one physics step) and no busy time, so that the quality
+    governor never steps in, and the game quits after the last frame.
+
+    :param game: The `Doggo_Heaven` game playing the scenario.
+    :param settings: The settings of the scenario (see `SCENARIOS`).
+    :param seed: The seed of the game's random number generator.
+    """
+
+    def __init__(self, game, settings, seed=0):
+        self.game = game
+        self.settings = settings
+        self.seed = seed
+        self.frames = 0
+        # Time (in ns) between every two frames
+        self.times = np.zeros(settings["frames"], dtype=np.int64)
+        self.last = None
+
+    def setup(self):
+        """Put the scenario's tennis balls and settings in the game's world."""
+        world = self.game.world
+        settings = self.settings
+        world.gravity = settings.get("gravity", world.gravity)
+        world.elasticity = settings.get("elasticity", world.elasticity)
+        world.lifetime = settings.get("lifetime", world.lifetime)
+
+        world.particles.clear()
+        (width, height) = world.tennis_ball_img.get_size()
+        emitter = Area_Emitter(
+            (0, 0, WINDOW_WIDTH - width, WINDOW_HEIGHT - height),
+            speed=world.gravity,
+            angle=(0, 2 * pi),
+            lifetime=world.lifetime,
+            elasticity=world.elasticity,
+        )
+        emitter.emit(world.particles, settings["balls"], world.rng, world.sim_time)
+
+    def poll(self, clock, fps):
+        """
+        :param clock: The `pygame.time.Clock` of the game.
+        :param fps: Ignored, as frames are not waited for.
+        :returns: The `Frame_Input` of the next frame.
+        """
+        now = perf_counter_ns()
+        if self.last is None:
+            self.setup()
+        else:
+            self.times[self.frames - 1] = now - self.last
+        self.last = perf_counter_ns()
+
+        if self.frames == self.settings["frames"]:
+            return Frame_Input(0, 0, Key_State(), 0, [pygame.event.Event(pygame.QUIT)])
+
+        (held, released) = self.settings.get("script", lambda frame: ((), ()))(
+            self.frames
+        )
+        mask = 0
+        for key in held:
+            mask |= 1 << KEY_INDICES[key]
+        events = [pygame.event.Event(pygame.KEYUP, key=key) for key in released]
+        self.frames += 1
+
+        return Frame_Input(round(1000 / PHYSICS_FPS), 0, Key_State(mask), 0, events)
+
+    def close(self):
+        """Stop the scenario."""
+
+
+def run_scenario(name):
+    """
+    Play a scenario, and measure its frame times and peak memory use. Meant to be
+    run in a fresh process.
+
+    :param name: The name of the scenario (a key of `SCENARIOS`).
+    :returns: A JSON serialisable dictionary of the results.
+    """
+    settings = SCENARIOS[name]
+    pygame.init()
+    game = Doggo_Heaven()
+    source = Scenario_Input(game, settings)
+    game.main(source)
+    balls = len(game.world.particles)
+    pygame.quit()
+
+    times = source.times[WARMUP_FRAMES:] / (1000 * 1000)
+    result = {
+        "frames": settings["frames"],
+        "warmup_frames": WARMUP_FRAMES,
+        "balls_start": settings["balls"],
+        "balls_end": balls,
+        "mean_ms": float(times.mean()),
+        "max_ms": float(times.max()),
+        # Peak resident set size, in kB on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+    for percentile, value in zip(PERCENTILES, np.percentile(times, PERCENTILES)):
+        result[f"p{percentile}_ms"] = float(value)
+
+    return result
+
+
+def run_scenarios(name, runs):
+    """
+    Play a scenario several times, each in a fresh process (see `run_scenario`).
+
+    :param name: The name of the scenario (a key of `SCENARIOS`).
+    :param runs: The number of times to play it.
+    :returns: A JSON serialisable dictionary of the results, with the median of
+        each measurement over the runs.
+    """
+    results = []
+    for _ in range(runs):
+        # A fresh process per run, so that peak memory use is not shared
+        with ProcessPoolExecutor(1, mp_context=get_context("spawn")) as executor:
+            results.append(executor.submit(run_scenario, name).result())
+
+    result = {**results[0], "runs": runs}
+    percentiles = [f"p{percentile}_ms" for percentile in PERCENTILES]
+    for key in ("mean_ms", "max_ms", "peak_rss_mb", *percentiles):
+        result[key] = float(np.median([run[key] for run in results]))
+
+    return result
+
+
+def compare(results, baseline, tolerance, memory_tolerance, slack=0):
+    """
+    Compare the results of the scenarios with their baseline.
+
+    :param results: A dictionary of the results of every scenario.
+    :param baseline: A dictionary of the baseline results of every scenario.
+    :param tolerance: The fraction the gated frame times may grow by.
+    :param memory_tolerance: The fraction the peak memory use may grow by.
+    :param slack: The time (in ms) the gated frame times may grow by on top of the
+        tolerance.
+    :returns: A list of messages, one per regression.
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            print(f"{name:<16} no baseline")
+            continue
+
+        limits = {key: (tolerance, slack) for key in GATED}
+        limits["peak_rss_mb"] = (memory_tolerance, 0)
+        for key, (limit, extra) in limits.items():
+            allowed = baseline[name][key] * (1 + limit) + extra
+            ratio = result[key] / max(baseline[name][key], 1e-9)
+            status = "REGRESSED" if result[key] > allowed else "ok"
+            print(
+                f"{name:<16} {key:<12} {result[key]:10.3f} vs "
+                f"{baseline[name][key]:10.3f} ({ratio:5.2f}x) {status}"
+            )
+            if result[key] > allowed:
+                regressions.append(
+                    f"{name}: {key} {ratio:.2f}x the baseline "
+                    f"(allowed {allowed:.3f})"
+                )
+
+    return regressions
+
+
+def main(args=None):
+    """
+    Run the scenarios, and compare them with (or write them as) the baseline.
+
+    :param args: The list of command line arguments. Defaults to `sys.argv`.
+    :returns: The exit status: 1 if a scenario regressed, 0 otherwise.
+    """
+    parser = argparse.ArgumentParser(
+        description="Run the Doggo Heaven performance scenarios."
+    )
+    parser.add_argument(
+        "--scenarios",
+        nargs="+",
+        choices=list(SCENARIOS),
+        default=list(SCENARIOS),
+        help="The scenarios to run.",
+    )
+    parser.add_argument(
+        "--baseline", default=BASELINE, help="The baseline file to compare with."
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="Fraction the median and 95th percentile frame times may grow by.",
+    )
+    parser.add_argument(
+        "--slack",
+        type=float,
+        default=0.3,
+        help="Time (in ms) the frame times may grow by on top of the tolerance.",
+    )
+    parser.add_argument(
+        "--runs",
+        type=int,
+        default=RUNS,
+        help="Times every scenario is played, keeping the median measurements.",
+    )
+    parser.add_argument(
+        "--memory-tolerance",
+        type=float,
+        default=0.25,
+        help="Fraction the peak memory use may grow by.",
+    )
+    parser.add_argument(
+        "--update",
+        action="store_true",
+        help="Write the results to the baseline file instead of comparing.",
+    )
+    parser.add_argument(
+        "--output", default=None, help="File to write the JSON results to."
+    )
+    args = parser.parse_args(args)
+    if args.runs < 1:
+        parser.error("--runs must be at least 1")
+
+    results = {}
+    for name in args.scenarios:
+        result = results[name] = run_scenarios(name, args.runs)
+        print(
+            f"{name:<16} {result['frames']:>4} frames: p50 {result['p50_ms']:7.3f} ms, "
+            f"p95 {result['p95_ms']:7.3f} ms, peak {result['peak_rss_mb']:6.1f} MB"
+        )
+
+    report = {
+        "python": platform.python_version(),
+        "pygame": pygame.version.ver,
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "drag": DRAG,
+        "scenarios": results,
+    }
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+
+    if args.update:
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as file:
+                # Keep the baselines of the scenarios that were not run
+                results = {**json.load(file)["scenarios"], **results}
+        with open(args.baseline, "w") as file:
+            json.dump({**report, "scenarios": results}, file, indent=2)
+            file.write("\n")
+        return 0
+
+    with open(args.baseline) as file:
+        baseline = json.load(file)["scenarios"]
+    regressions = compare(
+        results, baseline, args.tolerance, args.memory_tolerance, args.slack
+    )
+    for regression in regressions:
+        print(f"Regression: {regression}")
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())